@@ -1,13 +1,65 @@
-from flask import Flask, render_template, request, jsonify, redirect, session
+from flask import Flask, render_template, request, jsonify, redirect, session, g, has_request_context
 from flask_cors import CORS
-import mysql.connector
-import pickle
-import numpy as np
 import os 
+import hashlib
+import importlib
+import json
+import math
+import time
+import threading
+import logging
+import contextvars
+from db import ConnectionPool
+from cache import TTLCache, LRUCache, SQLiteCache
+from model_registry import ModelRegistry
+from app_logging import setup_logging
+from metrics import Metrics, render_gauge, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from passwords import PasswordHasher, PasswordHasherBusy
+
+# numpy, mysql.connector, pickle and the modules built on them (models,
+# features, catalog index, product snapshot) are imported inside the
+# functions that use them, so a worker can serve pages, logins and
+# /ready before they are loaded; see warm_up() further down.
+
+# LOG_LEVEL=DEBUG logs every prediction; LOG_SAMPLE_RATE keeps a fraction
+# of DEBUG/INFO records; LOG_FORMAT=text for human-readable lines
+logger = setup_logging(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    fmt=os.environ.get('LOG_FORMAT', 'json'),
+    sample_rate=float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+)
+
+# Per-route and per-stage latency histograms served on /metrics;
+# METRICS_ENABLED=0 turns every timer into a no-op
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+metrics = Metrics(METRICS_ENABLED)
+request_seconds = metrics.histogram('app_http_request_duration_seconds',
+                                    'Request latency by route', ('route', 'method', 'status'))
+stage_seconds = metrics.histogram('app_stage_duration_seconds',
+                                  'Time spent in each stage of a request', ('route', 'stage'))
+
+# Route label for requests served outside Flask's request context (asgi.py)
+route_context = contextvars.ContextVar('route', default='')
+
+def current_route():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return route_context.get()
+
+def stage(name):
+    """Timer for one stage of the current request"""
+    if not metrics.enabled:
+        return metrics.timer(stage_seconds)
+    return metrics.timer(stage_seconds, current_route(), name)
+
+def observe_stage(name, seconds):
+    metrics.observe(stage_seconds, seconds, current_route(), name)
+
+CORS_ORIGINS = ['http://localhost:5000']
 
 app = Flask(__name__)
 app.secret_key = 'App_login_data'  
-CORS(app, supports_credentials=True, origins=['http://localhost:5000'])  
+CORS(app, supports_credentials=True, origins=CORS_ORIGINS)  
 # Add these lines:
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['SESSION_COOKIE_SECURE'] = False 
@@ -20,67 +72,617 @@ DB_CONFIG = {
     'database': 'project_smart' 
 } 
 
+# Connection pool settings (per process: with gunicorn the server may see
+# workers x size connections, keep that under MySQL's max_connections)
+DB_POOL_CONFIG = {
+    'size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    'health_check': os.environ.get('DB_POOL_HEALTH_CHECK', '1') == '1',
+    'recycle': int(os.environ.get('DB_POOL_RECYCLE', 3600))
+}
+
+db_pool = ConnectionPool(DB_CONFIG, observer=observe_stage if METRICS_ENABLED else None,
+                         **DB_POOL_CONFIG)
+
 def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG) 
-
-discount_model = None
-discount_scaler = None
-discount_features = None
-platform_model = None
-platform_scaler = None 
-platform_features = None
-label_encoders = None
-model_metadata = None
-models_loaded = False
-
-try:
-    # Load discount prediction model
-    if os.path.exists('discount_model.pkl'):
-        with open('discount_model.pkl', 'rb') as f:
-            discount_model = pickle.load(f)
-    
-    if os.path.exists('discount_scaler.pkl'):
-        with open('discount_scaler.pkl', 'rb') as f:
-            discount_scaler = pickle.load(f)
-    
-    if os.path.exists('discount_features.pkl'):
-        with open('discount_features.pkl', 'rb') as f:
-            discount_features = pickle.load(f)
-    
-    # Load platform prediction model
-    if os.path.exists('platform_model.pkl'):
-        with open('platform_model.pkl', 'rb') as f:
-            platform_model = pickle.load(f)    
-    if os.path.exists('platform_scaler.pkl'):
-        with open('platform_scaler.pkl', 'rb') as f:
-            platform_scaler = pickle.load(f)
-    
-    if os.path.exists('platform_features.pkl'):
-        with open('platform_features.pkl', 'rb') as f:
-            platform_features = pickle.load(f)
-    
-    # Load label encoders
-    if os.path.exists('label_encoders.pkl'):
-        with open('label_encoders.pkl', 'rb') as f:
-            label_encoders = pickle.load(f)
-    
-    # Load metadata
-    if os.path.exists('model_metadata.pkl'):
-        with open('model_metadata.pkl', 'rb') as f:
-            model_metadata = pickle.load(f)
-    
-    if all([discount_model, discount_scaler, discount_features, 
-            platform_model, platform_scaler, platform_features, label_encoders]):
-        models_loaded = True
+    """Borrow a pooled connection; close() returns it to the pool"""
+    return db_pool.get_connection()
+
+# Passwords are stored as salted scrypt hashes. PASSWORD_HASH_N/R/P set the
+# cost (raising them re-hashes each user on their next login); hashing runs
+# on PASSWORD_HASH_WORKERS threads with at most PASSWORD_HASH_MAX_PENDING
+# hashes in flight, and a login that waits PASSWORD_HASH_TIMEOUT seconds
+# for a slot gets a 503 rather than queueing behind a peak.
+password_hasher = PasswordHasher(
+    n=int(os.environ.get('PASSWORD_HASH_N', 2 ** 14)),
+    r=int(os.environ.get('PASSWORD_HASH_R', 8)),
+    p=int(os.environ.get('PASSWORD_HASH_P', 1)),
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None,
+    max_pending=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 0)) or None,
+    timeout=float(os.environ.get('PASSWORD_HASH_TIMEOUT', 2.0))
+)
+
+def busy_response():
+    response = jsonify({'success': False, 'error': 'Server busy, please try again'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+# Category/platform lists change rarely but are read on every page load.
+# Touch VOCAB_STAMP_FILE (or call invalidate_vocabularies) after changing
+# products to refresh them in every worker on this host.
+VOCAB_CACHE_TTL = int(os.environ.get('VOCAB_CACHE_TTL', 3600))
+VOCAB_STAMP_FILE = os.environ.get('VOCAB_STAMP_FILE', 'vocabulary.stamp')
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Where category/platform lists come from: 'encoders' serves the classes the
+# models were trained on straight from label_encoders.pkl (no DB needed, and
+# every value is one the models accept); 'db' reads products. The DB is also
+# the fallback when the encoders are not loaded. VOCAB_CHECK_DB=1 compares
+# the two and prints a warning when they differ.
+VOCAB_SOURCE = os.environ.get('VOCAB_SOURCE', 'encoders')
+VOCAB_CHECK_DB = os.environ.get('VOCAB_CHECK_DB', '0') == '1'
+
+vocab_cache = TTLCache(ttl=VOCAB_CACHE_TTL, stamp_file=VOCAB_STAMP_FILE)
+
+# Lookup tables filled by migration_001_indexes.sql (one row per name, kept
+# current by triggers); without them we fall back to scanning products
+VOCAB_TABLES = {'category': 'categories', 'platform': 'platforms'}
+
+def load_vocabulary(column):
+    """Read the category or platform names, sorted"""
+    import mysql.connector
+    
+    if column not in VOCAB_TABLES:
+        raise ValueError(f"Unknown vocabulary: {column}")
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT name FROM {VOCAB_TABLES[column]} ORDER BY name")
+        except mysql.connector.ProgrammingError as e:
+            print(f"⚠️ {VOCAB_TABLES[column]} table unavailable ({e}), scanning products")
+            cursor.close()
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT DISTINCT {column} FROM products ORDER BY {column}")
+        values = [row[0] for row in cursor.fetchall() if row[0] is not None]
+        cursor.close()
+    return values
+
+def get_vocabulary(column):
+    """Vocabulary as (values, last_modified timestamp)"""
+    if VOCAB_SOURCE == 'encoders':
+        ensure_models_loaded()
+    
+    model_set = models
+    if VOCAB_SOURCE == 'encoders' and model_set.label_encoders is not None:
+        values = sorted(str(v) for v in model_set.label_encoders[column].classes_)
+        if VOCAB_CHECK_DB:
+            report_vocabulary_differences(column)
+        return values, model_set.loaded_at
+    
+    return vocab_cache.get(column, lambda: load_vocabulary(column))
+
+def vocabulary_differences(column):
+    """Compare encoder classes with the (cached) DB contents for one column"""
+    model_values = set(str(v) for v in models.label_encoders[column].classes_)
+    db_values, _ = vocab_cache.get(column, lambda: load_vocabulary(column))
+    return {
+        'not_in_db': sorted(model_values - set(db_values)),
+        'unknown_to_model': sorted(set(db_values) - model_values)
+    }
+
+_reported_differences = {}
+
+def report_vocabulary_differences(column):
+    """Print a warning when encoder classes and DB contents drift apart"""
+    try:
+        diff = vocabulary_differences(column)
+    except Exception as e:
+        print(f"⚠️ Could not compare {column} vocabulary with DB: {e}")
+        return
+    
+    # Only report each distinct difference once
+    if diff != _reported_differences.get(column):
+        _reported_differences[column] = diff
+        if diff['not_in_db'] or diff['unknown_to_model']:
+            print(f"⚠️ {column} vocabulary differs from DB: "
+                  f"not in DB {diff['not_in_db']}, unknown to model {diff['unknown_to_model']}")
+
+def invalidate_vocabularies():
+    """Force every worker to reload categories and platforms on next read"""
+    vocab_cache.invalidate()
+
+def vocabulary_etag(values):
+    return hashlib.md5(json.dumps(values).encode()).hexdigest()
+
+def vocabulary_response(key, values, modified_at):
+    """JSON response with ETag/Last-Modified so browsers can revalidate"""
+    response = jsonify({'success': True, key: values})
+    response.set_etag(vocabulary_etag(values))
+    response.last_modified = int(modified_at)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Model artifacts. When model_registry/ exists (see model_registry.py), the
+# version named in its CURRENT file is served and hot-swapped whenever that
+# changes; otherwise models.bundle (or the eight legacy pickles) in the
+# working directory is used. Loading is lazy (first request that needs a
+# model). The bundle's arrays are mmap'ed read-only, so forked workers share
+# the same page-cache pages.
+MODEL_REGISTRY_PATH = os.environ.get('MODEL_REGISTRY', 'model_registry')
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 5))
+MODEL_BUNDLE_PATH = os.environ.get('MODEL_BUNDLE', 'models.bundle')
+
+# Evaluate the bundle's flat arrays with inference.py instead of unpickling
+# the sklearn/xgboost estimators (same results, no sklearn import needed)
+NATIVE_INFERENCE = os.environ.get('NATIVE_INFERENCE', '1') == '1'
+
+# Answer /api/predict from prediction_table.npz when it covers the budget,
+# unless the trainer measured its answers to be further than this many
+# discount points from the models' (see prediction_lookup.py)
+USE_PREDICTION_TABLE = True
+PREDICTION_TABLE_MAX_ERROR = float(os.environ.get('PREDICTION_TABLE_MAX_ERROR', 0.05))
+
+model_registry = ModelRegistry(MODEL_REGISTRY_PATH)
+
+# Cache of /api/predict results keyed on (model version, category, budget,
+# platform). PREDICTION_CACHE_BACKEND=sqlite shares one cache between all
+# workers on the host through a file (on tmpfs by default); 0 size disables it.
+# Only the models' answer is cached: matching products come from this
+# worker's catalog index and are attached after the lookup.
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+PREDICTION_CACHE_TTL = int(os.environ.get('PREDICTION_CACHE_TTL', 600))
+PREDICTION_CACHE_BACKEND = os.environ.get('PREDICTION_CACHE_BACKEND', 'memory')
+PREDICTION_CACHE_PATH = os.environ.get(
+    'PREDICTION_CACHE_PATH',
+    '/dev/shm/prediction_cache.sqlite' if os.path.isdir('/dev/shm') else 'prediction_cache.sqlite'
+)
+
+if PREDICTION_CACHE_SIZE <= 0:
+    prediction_cache = None
+elif PREDICTION_CACHE_BACKEND == 'sqlite':
+    prediction_cache = SQLiteCache(PREDICTION_CACHE_PATH, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+else:
+    prediction_cache = LRUCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+
+# Real products returned with each prediction: the RECOMMENDATION_COUNT best
+# rated/discounted in-stock products of the category within the budget,
+# looked up in an in-memory CatalogIndex. Each worker builds it in the
+# background on first use and rebuilds it every CATALOG_REFRESH_INTERVAL
+# seconds, or within CATALOG_STAMP_CHECK seconds of VOCAB_STAMP_FILE being
+# touched (model/ingest_products.py does that). 0 products disables it.
+RECOMMENDATION_COUNT = int(os.environ.get('RECOMMENDATION_COUNT', 5))
+CATALOG_REFRESH_INTERVAL = float(os.environ.get('CATALOG_REFRESH_INTERVAL', 600))
+CATALOG_STAMP_CHECK = float(os.environ.get('CATALOG_STAMP_CHECK', 5))
+
+catalog_index = None
+_catalog_pid = None
+
+def load_catalog_index():
+    """Build a CatalogIndex from products, then fetch details for the products it can return"""
+    from catalog_index import CatalogIndex, INDEX_COLUMNS, DETAIL_COLUMNS
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(INDEX_COLUMNS)} FROM products WHERE stock > 0")
+        index = CatalogIndex(cursor.fetchall(), RECOMMENDATION_COUNT)
+        cursor.close()
+    
+    product_ids = index.product_ids()
+    details = []
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        for start in range(0, len(product_ids), 1000):
+            chunk = product_ids[start:start + 1000]
+            cursor.execute(f"SELECT {', '.join(DETAIL_COLUMNS)} FROM products "
+                           f"WHERE product_id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            details += cursor.fetchall()
+        cursor.close()
+    index.set_details(details)
+    return index
+
+def refresh_catalog_index():
+    global catalog_index
+    try:
+        catalog_index = load_catalog_index()
+        stats = catalog_index.stats()
+        print(f"Catalog index built: {stats['products']} products in {stats['build_seconds']} s")
+    except Exception as e:
+        print(f"❌ Error building catalog index: {e}")
+
+def stamp_mtime():
+    try:
+        return os.stat(VOCAB_STAMP_FILE).st_mtime
+    except OSError:
+        return 0.0
+
+def start_catalog_refresher():
+    """Start (once per process) the thread that builds and refreshes catalog_index"""
+    global _catalog_pid
+    
+    if RECOMMENDATION_COUNT <= 0 or _catalog_pid == os.getpid():
+        return
+    _catalog_pid = os.getpid()
+    threading.Thread(target=refresh_catalog, name='catalog-refresher', daemon=True).start()
+
+def refresh_catalog():
+    while True:
+        built_at = time.time()
+        refresh_catalog_index()
+        while True:
+            time.sleep(CATALOG_STAMP_CHECK)
+            if time.time() - built_at >= CATALOG_REFRESH_INTERVAL or stamp_mtime() > built_at:
+                break
+
+# /api/compare answers from an in-memory ProductSnapshot, built on first use.
+# Every COMPARE_REFRESH_INTERVAL seconds the rows whose updated_at moved
+# (see migration_001_indexes.sql) are applied to it; every
+# COMPARE_FULL_REFRESH_INTERVAL seconds (and every refresh without an
+# updated_at column) it is rebuilt, which also drops deleted products.
+COMPARE_REFRESH_INTERVAL = float(os.environ.get('COMPARE_REFRESH_INTERVAL', 60))
+COMPARE_FULL_REFRESH_INTERVAL = float(os.environ.get('COMPARE_FULL_REFRESH_INTERVAL', 3600))
+COMPARE_MAX_PER_PLATFORM = int(os.environ.get('COMPARE_MAX_PER_PLATFORM', 5))
+
+product_snapshot = None
+_snapshot_lock = threading.Lock()
+_snapshot_pid = None
+
+def query_snapshot_rows(since=None):
+    """(rows, has_change_column) for all products, or those changed since `since`"""
+    import mysql.connector
+    from product_snapshot import SNAPSHOT_COLUMNS, CHANGE_COLUMN
+    
+    columns = ', '.join(SNAPSHOT_COLUMNS)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if since is None:
+                cursor.execute(f"SELECT {columns}, {CHANGE_COLUMN} FROM products")
+            else:
+                # >= as updated_at has one-second resolution; re-applying a row is harmless
+                cursor.execute(f"SELECT {columns}, {CHANGE_COLUMN} FROM products "
+                               f"WHERE {CHANGE_COLUMN} >= %s", (since,))
+            has_change_column = True
+        except mysql.connector.ProgrammingError:
+            cursor.close()
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {columns} FROM products")
+            has_change_column = False
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows, has_change_column
+
+def refresh_product_snapshot(full=False):
+    """Apply changed rows to product_snapshot (or rebuild it) and swap it in"""
+    global product_snapshot
+    from product_snapshot import ProductSnapshot
+    
+    snapshot = product_snapshot
+    if full or snapshot is None or snapshot.high_water_mark is None:
+        rows, has_change_column = query_snapshot_rows()
+        product_snapshot = ProductSnapshot.from_rows(rows, has_change_column)
+        return
+    
+    rows, has_change_column = query_snapshot_rows(snapshot.high_water_mark)
+    if has_change_column:
+        product_snapshot = snapshot.apply_changes(rows)
+    else:
+        product_snapshot = ProductSnapshot.from_rows(rows, has_change_column)
+
+def ensure_product_snapshot():
+    """Build the snapshot on first use; safe to call from concurrent requests"""
+    if product_snapshot is None:
+        with _snapshot_lock:
+            if product_snapshot is None:
+                refresh_product_snapshot(full=True)
+    start_snapshot_refresher()
+    return product_snapshot
+
+def start_snapshot_refresher():
+    """Start (once per process) the thread that keeps product_snapshot current"""
+    global _snapshot_pid
+    
+    if COMPARE_REFRESH_INTERVAL <= 0 or _snapshot_pid == os.getpid():
+        return
+    _snapshot_pid = os.getpid()
+    threading.Thread(target=refresh_snapshot, name='snapshot-refresher', daemon=True).start()
+
+def refresh_snapshot():
+    full_at = time.time()
+    while True:
+        time.sleep(COMPARE_REFRESH_INTERVAL)
+        try:
+            full = time.time() - full_at >= COMPARE_FULL_REFRESH_INTERVAL
+            refresh_product_snapshot(full)
+            if full:
+                full_at = time.time()
+        except Exception as e:
+            print(f"❌ Error refreshing product snapshot: {e}")
+
+class ModelSet:
+    """Everything one model version needs to serve predictions.
+    
+    A ModelSet is never modified after loading. Reloading builds a new one
+    and swaps the module-level `models` reference, so a request that took a
+    reference keeps using one consistent version until it finishes.
+    """
+    
+    def __init__(self, objects, prediction_table=None, version=None):
+        self.discount_model = objects.get('discount_model')
+        self.discount_scaler = objects.get('discount_scaler')
+        self.discount_features = objects.get('discount_features')
+        # Quantile variants for the p10/p50/p90 interval (see intervals.py)
+        self.discount_quantile_models = objects.get('discount_quantile_models')
+        self.platform_model = objects.get('platform_model')
+        self.platform_scaler = objects.get('platform_scaler')
+        self.platform_features = objects.get('platform_features')
+        self.label_encoders = objects.get('label_encoders')
+        self.model_metadata = objects.get('model_metadata')
+        self.prediction_table = prediction_table
+        self.version = version
+        self.loaded_at = time.time()
+        self.ready = all([self.discount_model, self.discount_scaler, self.discount_features,
+                          self.platform_model, self.platform_scaler, self.platform_features,
+                          self.label_encoders])
+
+models = ModelSet({})
+previous_models = None
+
+_models_lock = threading.Lock()
+_models_attempted = False
+_watcher_pid = None
+
+def load_legacy_pickles(directory='.'):
+    """Read the separate .pkl files written by older versions of the trainer"""
+    import pickle
+    from model_bundle import LEGACY_PICKLES
+    
+    objects = {}
+    for name in LEGACY_PICKLES:
+        path = os.path.join(directory, f'{name}.pkl')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                objects[name] = pickle.load(f)
+    return objects
+
+def load_prediction_table(path, label_encoders, model_version=None, require_version=False):
+    """Load a compiled prediction table if it matches the models and label encoders.
+    
+    model_version is the version of the models being served. A table that
+    records another version is ignored. With require_version, a table
+    recording none is ignored too: only the registry publishes a table
+    and a bundle as a pair, so anywhere else it may be left over from an
+    older training run. So is a table whose measured lookup error is above
+    PREDICTION_TABLE_MAX_ERROR, or that records none.
+    """
+    import numpy as np
+    
+    if not USE_PREDICTION_TABLE or not os.path.exists(path):
+        return None
+    
+    with np.load(path) as table:
+        prediction_table = {key: table[key] for key in table.files}
+    
+    table_version = str(prediction_table.pop('model_version')) if 'model_version' in prediction_table else None
+    if model_version is not None:
+        if table_version is not None and table_version != model_version:
+            print(f"⚠️ {path} was compiled for models {table_version}, not {model_version}, ignoring it")
+            return None
+        if table_version is None and require_version:
+            print(f"⚠️ {path} does not record which models it was compiled for, ignoring it "
+                  f"(rebuild it with model/model_traning.py --compile-only)")
+            return None
+    
+    if 'interpolation_error' not in prediction_table:
+        print(f"⚠️ {path} does not record its lookup error, ignoring it "
+              f"(rebuild it with model/model_traning.py --compile-only)")
+        return None
+    max_error = prediction_table.pop('interpolation_error')[1]
+    if max_error > PREDICTION_TABLE_MAX_ERROR:
+        print(f"⚠️ {path} answers up to {max_error:.3f} discount points off the models "
+              f"(PREDICTION_TABLE_MAX_ERROR is {PREDICTION_TABLE_MAX_ERROR}), ignoring it")
+        return None
+    
+    # A table compiled for other encoders would map indices to the wrong labels
+    if (list(prediction_table['categories']) != list(label_encoders['category'].classes_) or
+            list(prediction_table['platforms']) != list(label_encoders['platform'].classes_)):
+        print(f"⚠️ {path} does not match label encoders, ignoring it")
+        return None
+    
+    print("Prediction table loaded ! ")
+    return prediction_table
+
+def load_model_set(directory=None):
+    """Load one model version from a registry directory (or the working directory)"""
+    from model_bundle import read_bundle, load_pickled_objects, legacy_pickles_version
+    from inference import load_native_models
+    
+    if directory is None:
+        bundle_path, table_path, pickle_dir = MODEL_BUNDLE_PATH, 'prediction_table.npz', '.'
+    else:
+        bundle_path = os.path.join(directory, 'models.bundle')
+        table_path = os.path.join(directory, 'prediction_table.npz')
+        pickle_dir = directory
+    
+    version = os.path.basename(directory) if directory else None
+    if os.path.exists(bundle_path):
+        header, arrays = read_bundle(bundle_path)
+        # What a prediction table must have been compiled for
+        model_version = header['model_version']
+        if NATIVE_INFERENCE:
+            objects = load_native_models(header, arrays)
+        else:
+            objects = load_pickled_objects(arrays)
+        version = version or header['model_version']
+        print(f"Model bundle {version} loaded ! ")
+    else:
+        objects = load_legacy_pickles(pickle_dir)
+        model_version = legacy_pickles_version(pickle_dir)
+        version = version or model_version
+    
+    model_set = ModelSet(objects, version=version)
+    if model_set.ready:
         print("All files loaded ! ") 
+        model_set.prediction_table = load_prediction_table(table_path, model_set.label_encoders,
+                                                           model_version, require_version=directory is None)
     else:
         print("⚠️ Some model files are missing!")
-        
-except Exception as e:
-    print(f"❌ Error loading models: {e}")
-    import traceback
-    traceback.print_exc()
+    return model_set
+
+def load_models():
+    """Load the current model version and swap it in for new requests"""
+    global models, previous_models
+    
+    directory = model_registry.current_dir() if model_registry.exists() else None
+    version = os.path.basename(directory) if directory else None
+    
+    try:
+        if previous_models is not None and version and previous_models.version == version:
+            # Rolling back to the version we just replaced: no need to reload
+            new_models = previous_models
+        else:
+            new_models = load_model_set(directory)
+    except Exception as e:
+        print(f"❌ Error loading models: {e}")
+        import traceback
+        traceback.print_exc()
+        return models.ready
+    
+    # Never replace a working model set with a broken one
+    if not new_models.ready and models.ready:
+        print(f"⚠️ Model version {version} is incomplete, still serving {models.version}")
+        return models.ready
+    
+    replaced_version = models.version if models.ready else None
+    if models.ready:
+        previous_models = models
+    models = new_models
     
+    # Cached results are keyed on the model version, so old entries can no
+    # longer be hit; drop them instead of waiting for them to age out. Not
+    # on a worker's first load: with the sqlite backend that would wipe the
+    # entries other workers just added for this same version.
+    if prediction_cache is not None and replaced_version not in (None, models.version):
+        prediction_cache.clear()
+    return models.ready
+
+def preload():
+    """Load models now without starting any background thread.
+    
+    wsgi.py calls this in the gunicorn master so forked workers share the
+    loaded models; each worker starts its own watcher threads on first use.
+    """
+    global _models_attempted
+    
+    import_serving_modules()
+    with _models_lock:
+        if not _models_attempted:
+            load_models()
+            _models_attempted = True
+    return models.ready
+
+def ensure_models_loaded():
+    """Load models on first use; safe to call from concurrent requests"""
+    global _models_attempted
+    
+    if not _models_attempted:
+        with _models_lock:
+            if not _models_attempted:
+                load_models()
+                _models_attempted = True
+    start_model_watcher()
+    start_catalog_refresher()
+    return models.ready
+
+def start_model_watcher():
+    """Start (once per process) the thread that follows model_registry/CURRENT"""
+    global _watcher_pid
+    
+    # Threads do not survive fork, so every gunicorn worker starts its own
+    if MODEL_WATCH_INTERVAL <= 0 or _watcher_pid == os.getpid():
+        return
+    _watcher_pid = os.getpid()
+    threading.Thread(target=watch_models, name='model-watcher', daemon=True).start()
+
+def watch_models():
+    """Reload models whenever the registry's current version changes"""
+    failed_version = None
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            version = model_registry.current_version()
+            if not version or version == models.version or version == failed_version:
+                continue
+            
+            print(f"🔄 Model version changed to {version}, reloading...")
+            with _models_lock:
+                load_models()
+            failed_version = None if models.version == version else version
+        except Exception as e:
+            print(f"❌ Error watching model registry: {e}")
+
+# Warm-up: as soon as a worker starts (gunicorn.conf.py's post_worker_init,
+# asgi.py's lifespan startup, or else its first request of any kind) a
+# background thread imports numpy and the model code, loads the models,
+# runs one prediction through the table and the model path and builds the
+# product snapshot, while pages and logins are already being served. /ready
+# answers 503 until the models are warm, so a load balancer can keep the
+# worker out of rotation until then. WARMUP=0 skips the thread: everything
+# loads on the first request that needs it, /ready included.
+WARMUP = os.environ.get('WARMUP', '1') == '1'
+
+warmup_state = {'started_at': None, 'finished_at': None, 'seconds': None, 'error': None}
+_warmup_pid = None
+
+# Imported by warm_up() (and preload(), so forked workers share them)
+SERVING_MODULES = ('numpy', 'mysql.connector', 'features', 'intervals', 'model_bundle',
+                   'inference', 'catalog_index', 'product_snapshot')
+
+def import_serving_modules():
+    for name in SERVING_MODULES:
+        importlib.import_module(name)
+
+def warmup_queries(model_set):
+    """One query answered from the prediction table and one scored by the models"""
+    category = str(model_set.label_encoders['category'].classes_[0])
+    table = model_set.prediction_table
+    if table is None:
+        return [{'category': category, 'budget': 5000}]
+    grid = table['budgets']
+    return [{'category': category, 'budget': float(grid[len(grid) // 2])},
+            {'category': category, 'budget': float(grid[-1]) * 2}]
+
+def warm_up():
+    """Load and exercise everything /api/predict and /api/compare need"""
+    start = time.perf_counter()
+    warmup_state['started_at'] = time.time()
+    token = route_context.set('warmup')
+    try:
+        import_serving_modules()
+        if ensure_models_loaded():
+            predict_many(warmup_queries(models))
+        try:
+            ensure_product_snapshot()
+        except Exception as e:
+            print(f"⚠️ Product snapshot not built during warm-up: {e}")
+    except Exception as e:
+        warmup_state['error'] = str(e)
+        print(f"❌ Error warming up: {e}")
+    finally:
+        route_context.reset(token)
+        warmup_state['seconds'] = round(time.perf_counter() - start, 3)
+        warmup_state['finished_at'] = time.time()
+    print(f"🔥 Worker {os.getpid()} warmed up in {warmup_state['seconds']} s")
+
+def start_warmup():
+    """Start (once per process) the warm-up thread"""
+    global _warmup_pid
+    
+    if not WARMUP or _warmup_pid == os.getpid():
+        return
+    _warmup_pid = os.getpid()
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
 # Add this new route
 @app.route('/signup')
 def signup_page():
@@ -120,17 +722,8 @@ def predict_page():
         return redirect('/login')
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT DISTINCT category FROM products ORDER BY category")
-        categories = [row[0] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT DISTINCT platform FROM products ORDER BY platform")
-        platforms = [row[0] for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
+        categories, _ = get_vocabulary('category')
+        platforms, _ = get_vocabulary('platform')
         
         return render_template('predict.html', categories=categories, platforms=platforms)
     except Exception as e:
@@ -187,6 +780,78 @@ def contact():
             'error': str(e)
         }), 400
 
+# Account helpers shared by the Flask routes and asgi.py (blocking: DB I/O)
+def find_user(email, columns=('id', 'password')):
+    """The given columns of the users row for email as a dict, or None"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"SELECT {', '.join(columns)} FROM users WHERE email = %s", (email,))
+        user = cursor.fetchone()
+        cursor.close()
+    return user
+
+def check_credentials(email, password):
+    """True if password is right for email; upgrades plaintext or outdated hashes"""
+    user = find_user(email)
+    if not user:
+        password_hasher.dummy_verify(password)
+        return False
+    with stage('password_verify'):
+        ok, needs_rehash = password_hasher.verify(password, user['password'])
+    if ok and needs_rehash:
+        upgrade_password_hash(user, password)
+    return ok
+
+def upgrade_password_hash(user, password):
+    """Replace a legacy plaintext (or weaker) password with a current hash"""
+    try:
+        with stage('password_hash'):
+            new_hash = password_hasher.hash(password)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Only if unchanged since we read it, so a concurrent reset wins
+            cursor.execute("UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                           (new_hash, user['id'], user['password']))
+            conn.commit()
+            cursor.close()
+    except Exception as e:
+        # The login itself succeeded; the next one will try again
+        logger.warning(f"Could not upgrade password hash for user {user['id']}: {e}")
+
+def create_user(name, email, password):
+    """Insert a new user; returns False if the email is already registered"""
+    import mysql.connector
+    
+    if find_user(email, columns=('id',)):
+        return False
+
+    # Hash without holding a pooled connection
+    with stage('password_hash'):
+        password_hash = password_hasher.hash(password)
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
+                (name, email, password_hash)
+            )
+        except mysql.connector.IntegrityError:
+            # Registered by a concurrent signup since the check above
+            cursor.close()
+            return False
+        conn.commit()
+        cursor.close()
+    return True
+
+def login_payload(email):
+    token = "demo_token_" + email
+    return {
+        'success': True,
+        'token': token,
+        'user': {'email': email}
+    }
+
 @app.route('/api/login', methods=['POST'])
 def login():
     try:
@@ -201,31 +866,20 @@ def login():
                 'error': 'Email and password are required'
             }), 400
         
-        # Check database for user
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if user and user['password'] == password:  # In production, use hashed passwords!
+        if check_credentials(email, password):
             session.permanent = True  # Add this line
             session['user_email'] = email
             session['logged_in'] = True
             
-            token = "demo_token_" + email
-            return jsonify({
-                'success': True,
-                'token': token,
-                'user': {'email': email}
-            })
+            return jsonify(login_payload(email))
         else:
             return jsonify({
                 'success': False,
                 'error': 'Invalid email or password'
             }), 401
             
+    except PasswordHasherBusy:
+        return busy_response()
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
@@ -243,29 +897,12 @@ def signup():
                 'error': 'All fields are required'
             }), 400
         
-        # Check if user already exists
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT email FROM users WHERE email = %s", (email,))
-        existing_user = cursor.fetchone()
-        
-        if existing_user:
-            cursor.close()
-            conn.close()
+        if not create_user(name, email, password):
             return jsonify({
                 'success': False,
                 'error': 'Email already registered'
             }), 400
         
-        # Insert new user (Note: In production, hash the password!)
-        cursor.execute(
-            "INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
-            (name, email, password)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
         # Auto-login after signup
         session.permanent = True  # THIS IS THE NEW LINE
         session['user_email'] = email
@@ -276,121 +913,150 @@ def signup():
             'message': 'Account created successfully'
         })
             
+    except PasswordHasherBusy:
+        return busy_response()
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/api/predict', methods=['POST'])
-def predict():
-    # Check if user is logged in
-    if 'user_email' not in session:
-        return jsonify({
-            'success': False,
-            'error': 'User not authenticated'
-        }), 401
-    
-    print("\n" + "="*50)
-    print("📮 NEW PREDICTION REQUEST")
-    print("="*50)
-    
-    if not models_loaded:
-        error_msg = 'Models not loaded. Please run model_training.py first.'
-        print(f"❌ {error_msg}")
-        return jsonify({
-            'success': False,
-            'error': error_msg
-        }), 500
+# Upper bound on queries accepted by /api/predict/batch in one request
+MAX_BATCH_SIZE = 500
+
+MODELS_NOT_LOADED = 'Models not loaded. Please run model_training.py first.'
+
+def parse_prediction_query(data):
+    """Extract and validate (category, budget, platform) from a request payload"""
+    if not isinstance(data, dict):
+        raise ValueError("Each query must be a JSON object")
     
+    # Extract user inputs
+    category = data.get('category', 'Electronics')
     try:
-        data = request.json
-        print(f"📥 Received data: {data}")
-        
-        # Extract user inputs
-        category = data.get('category', 'Electronics')
         budget = float(data.get('budget', 5000))
-        preferred_platform = data.get('platform', None)
-        
-        # Validate category
-        if not category:
-            raise ValueError("Category is required")
-        
-        # Encode category
-        category_encoded = label_encoders['category'].transform([category])[0]
-        
-        # Calculate price range
-        if budget < 1000:
-            price_range = 0
-        elif budget < 5000:
-            price_range = 1
-        elif budget < 15000:
-            price_range = 2
-        elif budget < 30000:
-            price_range = 3
-        else:
-            price_range = 4
-        
-        # Default values
-        rating_preference = 4.0
-        stock_estimate = 200
-        stock_status = 2
-        
-        # Rating category
-        if rating_preference <= 3.5:
-            rating_category = 0
-        elif rating_preference <= 4.0:
-            rating_category = 1
-        elif rating_preference <= 4.5:
-            rating_category = 2
-        else:
-            rating_category = 3
-        
-        # Predict best platform if not specified
-        if preferred_platform:
-            platform_encoded = label_encoders['platform'].transform([preferred_platform])[0]
-            best_platform = preferred_platform
-            platform_confidence = 100.0
-        else:
-            discount_estimate = 15
-            discount_effectiveness = 0.15
-            
-            platform_features_vector = np.array([[
-                category_encoded,
-                budget,
-                discount_estimate,
-                rating_preference,
-                stock_estimate,
-                price_range,
-                discount_effectiveness
-            ]])
-            
-            platform_features_scaled = platform_scaler.transform(platform_features_vector)
-            platform_encoded = platform_model.predict(platform_features_scaled)[0]
-            platform_proba = platform_model.predict_proba(platform_features_scaled)[0]
+    except (TypeError, ValueError):
+        raise ValueError("Budget must be a number")
+    # float() also accepts "nan" and "inf", which would end up as bare
+    # NaN/Infinity in the JSON response
+    if not (math.isfinite(budget) and budget > 0):
+        raise ValueError("Budget must be a positive number")
+    preferred_platform = data.get('platform', None)
+    
+    # Validate category
+    if not category:
+        raise ValueError("Category is required")
+    
+    return category, budget, preferred_platform
+
+def predict_many(queries):
+    """Score a list of (category, budget, platform) queries.
+    
+    Builds one feature matrix for the whole list so every scaler and model
+    is called once per batch instead of once per query. Queries answered
+    before by the same model version come from prediction_cache. Returns one
+    dict per query, in order; invalid queries get {'success': False, 'error': ...}.
+    """
+    import numpy as np
+    from intervals import QUANTILES, finish
+    
+    results = [None] * len(queries)
+    cache_keys = {}
+    
+    # Hold on to one model version for the whole batch, even if a reload
+    # swaps in a new one meanwhile
+    model_set = models
+    label_encoders = model_set.label_encoders
+    cache_version = model_set.version
+    catalog = catalog_index
+    
+    category_index = {c: i for i, c in enumerate(label_encoders['category'].classes_)}
+    platform_index = {p: i for i, p in enumerate(label_encoders['platform'].classes_)}
+    
+    # Validate and encode every query up front (the 'encode' stage also
+    # covers the cache lookups)
+    with stage('encode'):
+        rows = []
+        for i, query in enumerate(queries):
+            try:
+                category, budget, preferred_platform = parse_prediction_query(query)
+                if category not in category_index:
+                    raise ValueError(f"Unknown category: {category}")
+                if preferred_platform and preferred_platform not in platform_index:
+                    raise ValueError(f"Unknown platform: {preferred_platform}")
             
-            best_platform = label_encoders['platform'].inverse_transform([platform_encoded])[0]
-            platform_confidence = float(platform_proba.max() * 100)
+                if prediction_cache is not None:
+                    # Key on the parsed values: "5000", 5000 and 5000.0 are one entry
+                    key = (cache_version, category, budget, preferred_platform or '')
+                    cached = prediction_cache.get(key)
+                    if cached is not None:
+                        results[i] = with_products(cached, catalog, category, budget, preferred_platform)
+                        continue
+                    cache_keys[i] = key
             
-            print(f"🎯 Predicted Platform: {best_platform} ({platform_confidence:.1f}% confidence)")
-        
-        # Predict discount percentage
-        stock_estimate = 200
-        
-        discount_features_vector = np.array([[
-            platform_encoded,
-            category_encoded,
-            budget,
-            rating_preference,
-            stock_estimate,
-            price_range,
-            rating_category,
-            stock_status
-        ]])
-        
-        discount_features_scaled = discount_scaler.transform(discount_features_vector)
-        predicted_discount = float(discount_model.predict(discount_features_scaled)[0])
-        
-        predicted_discount = max(0, min(50, predicted_discount))
-        
-        print(f"💰 Predicted Discount: {predicted_discount:.1f}%")
+                rows.append((i, category, budget, preferred_platform))
+            except (ValueError, TypeError) as e:
+                results[i] = {'success': False, 'error': str(e)}
+    
+    if not rows:
+        return results
+    
+    n = len(rows)
+    category_encoded = np.array([category_index[r[1]] for r in rows])
+    budgets = np.array([r[2] for r in rows], dtype=float)
+    
+    platform_encoded = np.zeros(n, dtype=int)
+    platform_confidence = np.full(n, 100.0)
+    predicted_discounts = np.zeros(n)
+    # p10/p50/p90 per row; NaN where the models give no interval
+    discount_quantiles = np.full((n, len(QUANTILES)), np.nan)
+    
+    # Preferred platforms are taken as given
+    given = np.array([bool(r[3]) for r in rows])
+    for j, r in enumerate(rows):
+        if r[3]:
+            platform_encoded[j] = platform_index[r[3]]
+    
+    # Answer from the compiled table where it covers the budget,
+    # fall back to the models for everything else
+    in_table = np.zeros(n, dtype=bool)
+    if model_set.prediction_table is not None:
+        grid = model_set.prediction_table['budgets']
+        in_table = (budgets >= grid[0]) & (budgets <= grid[-1])
+    
+    idx = np.flatnonzero(in_table)
+    if len(idx):
+        with stage('table_lookup'):
+            (platform_encoded[idx], platform_confidence[idx], predicted_discounts[idx],
+             discount_quantiles[idx]) = lookup_prediction_table(model_set, category_encoded[idx], budgets[idx],
+                                                                platform_encoded[idx], given[idx])
+    
+    # score_with_models times its own scaler/model stages
+    idx = np.flatnonzero(~in_table)
+    if len(idx):
+        (platform_encoded[idx], platform_confidence[idx], predicted_discounts[idx],
+         discount_quantiles[idx]) = score_with_models(
+            model_set, category_encoded[idx], budgets[idx], platform_encoded[idx], given[idx]
+        )
+    
+    predicted_discounts = np.clip(predicted_discounts, 0, 50)
+    discount_quantiles = finish(discount_quantiles, predicted_discounts)
+    
+    best_platforms = label_encoders['platform'].classes_[platform_encoded]
+    model_metadata = model_set.model_metadata
+    model_used = model_metadata['discount_model_name'] if model_metadata else 'ML Model'
+    
+    with stage('recommendations'):
+        build_responses(rows, results, cache_keys, predicted_discounts, best_platforms,
+                        platform_confidence, model_used, catalog, discount_quantiles)
+    
+    return results
+
+def build_responses(rows, results, cache_keys, predicted_discounts, best_platforms,
+                    platform_confidence, model_used, catalog=None, discount_quantiles=None):
+    """Fill results with the response dict (and recommendations) for each scored row"""
+    from intervals import interval_dict
+    
+    for j, (i, category, budget, preferred_platform) in enumerate(rows):
+        predicted_discount = float(predicted_discounts[j])
+        best_platform = str(best_platforms[j])
         
         # Calculate discounted price
         discounted_price = budget * (1 - predicted_discount / 100)
@@ -401,31 +1067,172 @@ def predict():
             predicted_discount, best_platform, category, budget
         )
         
-        response = {
+        results[i] = {
             'success': True,
             'predicted_discount': round(predicted_discount, 1),
+            'discount_interval': interval_dict(discount_quantiles[j]) if discount_quantiles is not None else None,
             'best_platform': best_platform,
-            'platform_confidence': round(platform_confidence, 1),
+            'platform_confidence': round(float(platform_confidence[j]), 1),
             'estimated_price': round(budget, 2),
             'discounted_price': round(discounted_price, 2),
             'savings': round(savings, 2),
             'category': category,
             'recommendations': recommendations,
-            'model_used': model_metadata['discount_model_name'] if model_metadata else 'ML Model'
+            'model_used': model_used
         }
+        if i in cache_keys:
+            prediction_cache.set(cache_keys[i], results[i])
+        results[i] = with_products(results[i], catalog, category, budget, preferred_platform)
+
+def with_products(result, catalog, category, budget, preferred_platform):
+    """Copy of a model result with the catalog's current products for the query"""
+    products = catalog.top_k(category, budget, preferred_platform) if catalog is not None else []
+    return {**result, 'products': products}
+
+def score_with_models(model_set, category_encoded, budgets, platform_encoded, given):
+    """Run the scalers and models once over a batch of encoded queries"""
+    import numpy as np
+    import features
+    from intervals import QUANTILES, predict_with_quantiles
+    
+    n = len(budgets)
+    platform_encoded = platform_encoded.copy()
+    platform_confidence = np.full(n, 100.0)
+    
+    # Predict best platform where none was given in a single forest pass;
+    # predict() is argmax of predict_proba, so one call gives both
+    auto = np.flatnonzero(~given)
+    if len(auto):
+        with stage('platform_scale'):
+            platform_features_matrix = features.feature_matrix(
+                model_set.platform_features,
+                features.serving_columns(category_encoded[auto], budgets[auto]),
+                len(auto)
+            )
+            platform_features_scaled = model_set.platform_scaler.transform(platform_features_matrix)
         
-        print(f"📤 Response: {response}")
-        print("="*50 + "\n")
-        
-        return jsonify(response)
+        with stage('platform_predict'):
+            platform_proba = model_set.platform_model.predict_proba(platform_features_scaled)
+        platform_encoded[auto] = model_set.platform_model.classes_[platform_proba.argmax(axis=1)]
+        platform_confidence[auto] = platform_proba.max(axis=1) * 100
+    
+    # Predict discount percentage for every row at once
+    with stage('discount_scale'):
+        discount_features_matrix = features.feature_matrix(
+            model_set.discount_features,
+            features.serving_columns(category_encoded, budgets, platform_encoded),
+            n
+        )
+        discount_features_scaled = model_set.discount_scaler.transform(discount_features_matrix)
+    
+    # The interval comes out of the same model pass as the point prediction
+    with stage('discount_predict'):
+        predicted_discounts, discount_quantiles = predict_with_quantiles(
+            model_set.discount_model, model_set.discount_quantile_models, discount_features_scaled)
+    if discount_quantiles is None:
+        discount_quantiles = np.full((n, len(QUANTILES)), np.nan)
+    
+    return platform_encoded, platform_confidence, predicted_discounts, discount_quantiles
+
+def lookup_prediction_table(model_set, category_encoded, budgets, platform_encoded, given):
+    """Answer a batch of encoded queries from the compiled prediction table"""
+    from prediction_lookup import lookup
+    return lookup(model_set.prediction_table, category_encoded, budgets, platform_encoded, given)
+
+@app.route('/api/predict', methods=['POST'])
+def predict():
+    # Check if user is logged in
+    if 'user_email' not in session:
+        return jsonify({
+            'success': False,
+            'error': 'User not authenticated'
+        }), 401
+    
+    if not ensure_models_loaded():
+        logger.error(MODELS_NOT_LOADED)
+        return jsonify({
+            'success': False,
+            'error': MODELS_NOT_LOADED
+        }), 500
+    
+    data = None
+    try:
+        data = request.json
+        return jsonify(predict_one(data))
         
     except Exception as e:
-        print(f"❌ Error in prediction: {e}")
-        import traceback
-        traceback.print_exc()
-        print("="*50 + "\n")
+        log_prediction_error(e, data)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+def predict_one(data):
+    """Response dict for one /api/predict payload; raises ValueError for bad input"""
+    response = predict_many([data])[0]
+    if not response['success']:
+        raise ValueError(response['error'])
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('prediction', extra={'fields': {
+            'request': data,
+            'best_platform': response['best_platform'],
+            'platform_confidence': response['platform_confidence'],
+            'predicted_discount': response['predicted_discount'],
+            'response': response
+        }})
+    return response
+
+def log_prediction_error(e, data):
+    # Bad input is the caller's problem: no traceback for ValueErrors
+    logger.warning('prediction failed: %s', e, exc_info=not isinstance(e, ValueError),
+                   extra={'fields': {'request': data}})
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """Score many (category, budget, platform) queries in one request"""
+    if 'user_email' not in session:
+        return jsonify({
+            'success': False,
+            'error': 'User not authenticated'
+        }), 401
+    
+    if not ensure_models_loaded():
+        return jsonify({
+            'success': False,
+            'error': MODELS_NOT_LOADED
+        }), 500
+    
+    try:
+        queries = parse_batch_request(request.json or {})
+        return jsonify(predict_batch_payload(queries))
+    except Exception as e:
+        logger.warning('batch prediction failed: %s', e, exc_info=not isinstance(e, ValueError))
         return jsonify({'success': False, 'error': str(e)}), 400
 
+def parse_batch_request(data):
+    """The list of queries in a /api/predict/batch payload; ValueError if invalid"""
+    queries = data.get('queries') if isinstance(data, dict) else None
+    
+    if not isinstance(queries, list) or not queries:
+        raise ValueError('queries must be a non-empty list')
+    
+    if len(queries) > MAX_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_BATCH_SIZE} queries per batch')
+    
+    return queries
+
+def predict_batch_payload(queries):
+    results = predict_many(queries)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('batch prediction', extra={'fields': {
+            'queries': len(queries),
+            'succeeded': sum(r['success'] for r in results)
+        }})
+    
+    return {
+        'success': True,
+        'count': len(results),
+        'results': results
+    }
+
 def generate_recommendations(discount, platform, category, budget):
     """Generate shopping recommendations based on predictions"""
     recommendations = []
@@ -448,17 +1255,51 @@ def generate_recommendations(discount, platform, category, budget):
     
     return recommendations
 
+def parse_compare_request(args):
+    """(query, sku, category, limit) from /api/compare query parameters"""
+    query = (args.get('q') or '').strip()
+    sku = (args.get('sku') or '').strip().upper()
+    if not query and not sku:
+        raise ValueError('q (product name) or sku is required')
+    
+    limit = int(args.get('limit', COMPARE_MAX_PER_PLATFORM))
+    if not 1 <= limit <= 50:
+        raise ValueError('limit must be between 1 and 50')
+    return query, sku, args.get('category') or None, limit
+
+def compare_payload(query, sku, category, limit):
+    snapshot = ensure_product_snapshot()
+    with stage('compare_search'):
+        positions = snapshot.search(query, sku, category)
+    with stage('compare_group'):
+        platforms = snapshot.compare(positions, limit)
+    return {
+        'success': True,
+        'query': query,
+        'sku': sku,
+        'matches': int(len(positions)),
+        'platforms': platforms,
+        'cheapest_platform': platforms[0]['platform'] if platforms else None,
+        'snapshot_at': snapshot.built_at
+    }
+
+@app.route('/api/compare')
+def compare_products():
+    """Price, discount, rating and stock of matching products on every platform"""
+    try:
+        return jsonify(compare_payload(*parse_compare_request(request.args)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error('compare failed: %s', e, exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/categories')
 def get_categories():
     """Get all available categories"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT category FROM products ORDER BY category")
-        categories = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        conn.close()
-        return jsonify({'success': True, 'categories': categories})
+        categories, modified_at = get_vocabulary('category')
+        return vocabulary_response('categories', categories, modified_at)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
@@ -466,15 +1307,137 @@ def get_categories():
 def get_platforms():
     """Get all available platforms"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT platform FROM products ORDER BY platform")
-        platforms = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        conn.close()
-        return jsonify({'success': True, 'platforms': platforms})
+        platforms, modified_at = get_vocabulary('platform')
+        return vocabulary_response('platforms', platforms, modified_at)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/vocabularies/check')
+def check_vocabularies():
+    """Differences between what the models accept and what products holds"""
+    ensure_models_loaded()
+    if models.label_encoders is None:
+        return jsonify({'success': False, 'error': 'Label encoders not loaded'}), 500
+    
+    try:
+        return jsonify({
+            'success': True,
+            'categories': vocabulary_differences('category'),
+            'platforms': vocabulary_differences('platform')
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.before_request
+def start_warmup_on_first_request():
+    start_warmup()
+
+@app.before_request
+def start_request_timer():
+    if metrics.enabled:
+        g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    if metrics.enabled and 'request_start' in g:
+        metrics.observe(request_seconds, time.perf_counter() - g.request_start,
+                        current_route() or 'unmatched', request.method, str(response.status_code))
+    return response
+
+def collect_gauges(labels):
+    """Model, pool and cache gauges, read at scrape time"""
+    model_set = models
+    pool = db_pool.stats()
+    lines = []
+    lines += render_gauge('app_model_info', 'Model version being served (always 1)',
+                          [({'version': model_set.version or ''}, 1)], labels)
+    lines += render_gauge('app_model_ready', 'Whether models are loaded',
+                          [({}, int(model_set.ready))], labels)
+    lines += render_gauge('app_model_loaded_timestamp_seconds', 'When the served models were loaded',
+                          [({}, model_set.loaded_at)], labels)
+    lines += render_gauge('app_db_pool_connections', 'Pooled DB connections by state',
+                          [({'state': 'in_use'}, pool['in_use']), ({'state': 'idle'}, pool['idle'])],
+                          labels)
+    lines += render_gauge('app_db_pool_size', 'Maximum connections per process',
+                          [({}, pool['size'])], labels)
+    lines += render_gauge('app_db_pool_created', 'Connections opened since start',
+                          [({}, pool['created'])], labels)
+    if prediction_cache is not None:
+        cache_stats = prediction_cache.stats()
+        lines += render_gauge('app_prediction_cache', 'Prediction cache counters',
+                              [({'stat': key}, cache_stats[key])
+                               for key in ('hits', 'misses', 'evictions', 'size')], labels)
+    return lines
+
+metrics.add_collector(collect_gauges)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics"""
+    if not metrics.enabled:
+        return jsonify({'success': False, 'error': 'Metrics are disabled'}), 404
+    return app.response_class(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/ready')
+def readiness():
+    """200 once this worker's models are loaded and warmed up, 503 until then"""
+    if WARMUP:
+        warm = warmup_state['finished_at'] is not None
+    else:
+        warm = ensure_models_loaded()
+    model_set = models
+    ready = warm and model_set.ready
+    return jsonify({
+        'success': ready,
+        'ready': ready,
+        'pid': os.getpid(),
+        'models_loaded': model_set.ready,
+        'model_version': model_set.version,
+        'warmup': warmup_state if WARMUP else None,
+        'catalog_index': catalog_index is not None,
+        'product_snapshot': product_snapshot is not None
+    }), 200 if ready else 503
+
+@app.route('/api/models')
+def model_info():
+    """Model version being served and the versions available for rollback"""
+    ensure_models_loaded()
+    return jsonify({
+        'success': True,
+        'version': models.version,
+        'loaded': models.ready,
+        'previous_version': previous_models.version if previous_models else None,
+        'registry_versions': model_registry.list_versions(),
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None,
+        'catalog_index': catalog_index.stats() if catalog_index is not None else None,
+        'product_snapshot': product_snapshot.stats() if product_snapshot is not None else None
+    })
+
+@app.route('/api/models/rollback', methods=['POST'])
+def rollback_models():
+    """Serve the previous (or a given) registry version in every worker"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        model_registry.rollback(data.get('version'))
+        
+        # Swap here right away; other workers follow via their watchers
+        with _models_lock:
+            load_models()
+        return jsonify({'success': True, 'version': models.version})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/vocabularies/invalidate', methods=['POST'])
+def invalidate_vocabularies_route():
+    """Drop cached categories/platforms after products changed"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    invalidate_vocabularies()
+    return jsonify({'success': True})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
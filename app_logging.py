@@ -0,0 +1,99 @@
+"""Structured, non-blocking logging for app.py.
+
+Records go through a QueueHandler onto an in-memory queue; a background
+QueueListener thread formats them and does the actual write, so a request
+never waits on stderr. With LOG_FORMAT=json every record is one JSON line.
+
+Per-request events are logged at DEBUG. Guard anything expensive to build
+with logger.isEnabledFor(logging.DEBUG) so it costs nothing when disabled.
+Below WARNING, records can be sampled (LOG_SAMPLE_RATE) to keep verbose
+levels affordable under load; warnings and errors are always kept.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+LOGGER_NAME = 'app'
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; extra={'fields': {...}} adds keys to it"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random `rate` fraction of records below WARNING"""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Keep the record intact (fields, exc_info) for the listener's
+        # formatter; only resolve what cannot cross threads safely
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener = None
+
+
+def _start_listener(log_queue, handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def setup_logging(level='INFO', fmt='json', sample_rate=1.0, stream=None):
+    """Configure and return the 'app' logger (idempotent)"""
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    if _listener is not None:
+        return logger
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JSONFormatter() if fmt == 'json' else
+                        logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    _start_listener(log_queue, output)
+    # The listener thread does not survive fork: start a fresh one in each
+    # gunicorn worker, and flush whatever is queued on exit
+    os.register_at_fork(after_in_child=lambda: _start_listener(log_queue, output))
+    atexit.register(lambda: _listener.stop())
+    return logger
@@ -0,0 +1,393 @@
+"""ASGI entry point: app.py's routes and JSON contracts, served asynchronously.
+
+    uvicorn asgi:application --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 asgi:application
+
+The I/O-bound JSON endpoints (login, signup, categories, platforms, predict,
+predict/batch and compare) are handled here on the event loop:
+
+- blocking MySQL work runs in a thread pool with one thread per pooled
+  connection (DB_POOL_SIZE), so a request waiting on MySQL holds a thread,
+  not the worker, and threads never queue on the connection pool itself;
+- model inference runs in a separate executor (INFERENCE_THREADS), so slow
+  scoring never starves DB-bound requests and vice versa.
+
+Everything else (HTML pages, static files, contact, admin endpoints,
+/metrics, CORS preflights) is passed unchanged to the Flask app through a
+WSGI bridge in the DB thread pool. Sessions use Flask's signed cookie, so a
+user logged in through either mode stays logged in in the other.
+"""
+import asyncio
+import contextvars
+import datetime
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from werkzeug.http import dump_cookie, http_date, parse_cookie, parse_date, parse_etags, quote_etag
+
+import app as flask_module
+from app import app as flask_app, logger
+from passwords import PasswordHasherBusy
+
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', 2))
+
+db_executor = ThreadPoolExecutor(max_workers=flask_module.DB_POOL_CONFIG['size'],
+                                 thread_name_prefix='asgi-db')
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADS,
+                                        thread_name_prefix='asgi-inference')
+# Login/signup wait on the password hasher (which bounds the actual hashing)
+# in their own threads, so a login peak never ties up the DB threads. Twice
+# the hasher's slots lets excess logins reach its backpressure and get a 503.
+auth_executor = ThreadPoolExecutor(max_workers=2 * flask_module.password_hasher.max_pending,
+                                   thread_name_prefix='asgi-auth')
+
+
+async def run_in(executor, func, *args):
+    """Run a blocking call in executor, keeping contextvars (metrics route label)"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, context.run, func, *args)
+
+
+# ---------------------------------------------------------------------------
+# Minimal request/response objects
+# ---------------------------------------------------------------------------
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope['method']
+        self.path = scope['path']
+        self.body = body
+        self.headers = {}
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').lower()
+            value = value.decode('latin-1')
+            self.headers[name] = f"{self.headers[name]}, {value}" if name in self.headers else value
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.session = load_session(self.headers.get('cookie', ''))
+
+    def json(self):
+        """Parsed JSON body; ValueError when it is not valid JSON"""
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+
+
+class Response:
+    def __init__(self, payload=None, status=200, headers=None, body=None):
+        self.status = status
+        self.headers = dict(headers or {})
+        if payload is not None:
+            # Same serialisation as flask.jsonify outside debug mode
+            body = flask_app.json.dumps(payload, separators=(',', ':')) + '\n'
+            self.headers['Content-Type'] = 'application/json'
+        self.body = body.encode() if isinstance(body, str) else (body or b'')
+        self.cookies = []
+
+    async def send(self, send):
+        headers = [(k.lower().encode('latin-1'), str(v).encode('latin-1'))
+                   for k, v in self.headers.items()]
+        headers += [(b'set-cookie', cookie.encode('latin-1')) for cookie in self.cookies]
+        headers.append((b'content-length', str(len(self.body)).encode()))
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+def error(message, status):
+    return Response({'success': False, 'error': message}, status)
+
+
+def busy():
+    return Response({'success': False, 'error': 'Server busy, please try again'}, 503,
+                    {'Retry-After': '1'})
+
+
+# ---------------------------------------------------------------------------
+# Flask-compatible sessions
+# ---------------------------------------------------------------------------
+
+SESSION_COOKIE = flask_app.config['SESSION_COOKIE_NAME']
+
+
+def load_session(cookie_header):
+    value = parse_cookie(cookie_header).get(SESSION_COOKIE)
+    if not value:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        return serializer.loads(value, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return {}
+
+
+def save_session(response, session):
+    """Set the same signed, permanent session cookie Flask would"""
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    lifetime = flask_app.permanent_session_lifetime
+    response.cookies.append(dump_cookie(
+        SESSION_COOKIE, serializer.dumps(dict(session, _permanent=True)),
+        max_age=int(lifetime.total_seconds()),
+        expires=datetime.datetime.now(datetime.timezone.utc) + lifetime,
+        path=flask_app.config['SESSION_COOKIE_PATH'] or flask_app.config['APPLICATION_ROOT'],
+        domain=flask_app.config['SESSION_COOKIE_DOMAIN'],
+        secure=flask_app.config['SESSION_COOKIE_SECURE'],
+        httponly=flask_app.config['SESSION_COOKIE_HTTPONLY'],
+        samesite=flask_app.config['SESSION_COOKIE_SAMESITE']
+    ))
+
+
+# ---------------------------------------------------------------------------
+# Native async routes (same contracts as the Flask views in app.py)
+# ---------------------------------------------------------------------------
+
+async def login(request):
+    data = request.json() or {}
+    email = data.get('email')
+    password = data.get('password')
+
+    if not email or not password:
+        return error('Email and password are required', 400)
+
+    try:
+        valid = await run_in(auth_executor, flask_module.check_credentials, email, password)
+    except PasswordHasherBusy:
+        return busy()
+
+    if valid:
+        response = Response(flask_module.login_payload(email))
+        save_session(response, {'user_email': email, 'logged_in': True})
+        return response
+    return error('Invalid email or password', 401)
+
+
+async def signup(request):
+    data = request.json() or {}
+    name = data.get('name')
+    email = data.get('email')
+    password = data.get('password')
+
+    if not name or not email or not password:
+        return error('All fields are required', 400)
+
+    try:
+        created = await run_in(auth_executor, flask_module.create_user, name, email, password)
+    except PasswordHasherBusy:
+        return busy()
+
+    if not created:
+        return error('Email already registered', 400)
+
+    response = Response({'success': True, 'message': 'Account created successfully'})
+    save_session(response, {'user_email': email, 'logged_in': True})
+    return response
+
+
+def vocabulary_route(column, key):
+    async def route(request):
+        # Vocabularies may come from the DB (or load the models) on a miss
+        values, modified_at = await run_in(db_executor, flask_module.get_vocabulary, column)
+        etag = flask_module.vocabulary_etag(values)
+        last_modified = int(modified_at)
+        headers = {'ETag': quote_etag(etag), 'Last-Modified': http_date(last_modified),
+                   'Cache-Control': 'no-cache'}
+
+        if_none_match = request.headers.get('if-none-match')
+        if_modified_since = parse_date(request.headers.get('if-modified-since'))
+        if if_none_match is not None:
+            not_modified = parse_etags(if_none_match).contains(etag)
+        else:
+            not_modified = (if_modified_since is not None and
+                            if_modified_since.timestamp() >= last_modified)
+        if not_modified:
+            return Response(status=304, headers=headers)
+        return Response({'success': True, key: values}, headers=headers)
+    return route
+
+
+async def predict(request):
+    if 'user_email' not in request.session:
+        return error('User not authenticated', 401)
+
+    if not await run_in(inference_executor, flask_module.ensure_models_loaded):
+        logger.error(flask_module.MODELS_NOT_LOADED)
+        return error(flask_module.MODELS_NOT_LOADED, 500)
+
+    data = None
+    try:
+        data = request.json()
+        return Response(await run_in(inference_executor, flask_module.predict_one, data))
+    except Exception as e:
+        flask_module.log_prediction_error(e, data)
+        return error(str(e), 400)
+
+
+async def predict_batch(request):
+    if 'user_email' not in request.session:
+        return error('User not authenticated', 401)
+
+    if not await run_in(inference_executor, flask_module.ensure_models_loaded):
+        return error(flask_module.MODELS_NOT_LOADED, 500)
+
+    try:
+        queries = flask_module.parse_batch_request(request.json() or {})
+        return Response(await run_in(inference_executor, flask_module.predict_batch_payload, queries))
+    except Exception as e:
+        logger.warning('batch prediction failed: %s', e, exc_info=not isinstance(e, ValueError))
+        return error(str(e), 400)
+
+
+async def compare(request):
+    try:
+        params = flask_module.parse_compare_request(request.args)
+    except ValueError as e:
+        return error(str(e), 400)
+    try:
+        # The first call builds the snapshot from MySQL
+        return Response(await run_in(inference_executor, flask_module.compare_payload, *params))
+    except Exception as e:
+        logger.error('compare failed: %s', e, exc_info=True)
+        return error(str(e), 500)
+
+
+ROUTES = {
+    ('POST', '/api/login'): login,
+    ('POST', '/api/signup'): signup,
+    ('GET', '/api/categories'): vocabulary_route('category', 'categories'),
+    ('GET', '/api/platforms'): vocabulary_route('platform', 'platforms'),
+    ('POST', '/api/predict'): predict,
+    ('POST', '/api/predict/batch'): predict_batch,
+    ('GET', '/api/compare'): compare,
+}
+
+
+# ---------------------------------------------------------------------------
+# WSGI bridge for every other route
+# ---------------------------------------------------------------------------
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = f'HTTP_{name}'
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_flask(environ):
+    """Run the Flask app on one request; returns (status, headers, body)"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+
+    result = flask_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return started['status'], started['headers'], body
+
+
+async def serve_with_flask(scope, body, send):
+    status, headers, body = await run_in(db_executor, call_flask, wsgi_environ(scope, body))
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# ---------------------------------------------------------------------------
+# ASGI application
+# ---------------------------------------------------------------------------
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def add_cors_headers(request, response):
+    # Same policy as flask_cors in app.py for the natively served routes
+    origin = request.headers.get('origin')
+    if origin in flask_module.CORS_ORIGINS:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Allow-Credentials'] = 'true'
+        response.headers['Vary'] = 'Origin'
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            flask_module.start_warmup()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            db_executor.shutdown(wait=False)
+            inference_executor.shutdown(wait=False)
+            auth_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    body = await read_body(receive)
+    route = ROUTES.get((scope['method'], scope['path']))
+    if route is None:
+        return await serve_with_flask(scope, body, send)
+
+    start = time.perf_counter()
+    token = flask_module.route_context.set(scope['path'])
+    try:
+        request = Request(scope, body)
+        try:
+            response = await route(request)
+        except Exception as e:
+            # The Flask views answer any failure with a 400 and the message
+            if not isinstance(e, ValueError):
+                logger.warning('request failed: %s', e, exc_info=True)
+            response = error(str(e), 400)
+        add_cors_headers(request, response)
+        await response.send(send)
+        flask_module.metrics.observe(flask_module.request_seconds, time.perf_counter() - start,
+                                     scope['path'], scope['method'], str(response.status))
+    finally:
+        flask_module.route_context.reset(token)
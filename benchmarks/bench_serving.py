@@ -0,0 +1,146 @@
+"""Benchmark the Flask routes in-process: prediction, vocabularies and login.
+
+Drives app.py through the Flask test client against a SQLite stand-in for
+MySQL (see fake_mysql.py) filled with a synthetic catalog, using the model
+files in --models-dir (the repo root, i.e. the shipped .pkl files, by
+default). Reports throughput and p50/p95/p99 latency per scenario.
+
+Usage:
+    python benchmarks/bench_serving.py [--requests 2000] [--batch-size 100]
+                                       [--catalog-rows 10000] [--json out.json]
+
+The prediction cache is off unless --cache is given, so repeated queries
+measure the models rather than the cache.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+import fake_mysql
+from catalog import synthetic_catalog
+
+BENCH_USER = ('Bench User', 'bench@example.com', 'bench-password')
+
+
+def measure(name, n_requests, send, items_per_request=1, warmup=20):
+    """Call send(i) n_requests times; send returns the response to check"""
+    for i in range(warmup):
+        send(i)
+
+    latencies = np.empty(n_requests)
+    start = time.perf_counter()
+    for i in range(n_requests):
+        t0 = time.perf_counter()
+        response = send(i)
+        latencies[i] = time.perf_counter() - t0
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        'scenario': name,
+        'requests': n_requests,
+        'requests_per_s': round(n_requests / elapsed, 1),
+        'items_per_s': round(n_requests * items_per_request / elapsed, 1),
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3)
+    }
+
+
+def random_queries(n, categories, platforms, seed=0):
+    """Prediction payloads with budgets clustered on round numbers, like real traffic"""
+    rng = np.random.default_rng(seed)
+    budgets = np.where(rng.random(n) < 0.5,
+                       rng.choice([1000, 2000, 5000, 10000, 20000, 50000], n),
+                       rng.uniform(100, 100000, n).round(2))
+    return [{
+        'category': str(rng.choice(categories)),
+        'budget': float(budget),
+        'platform': str(rng.choice(platforms)) if rng.random() < 0.3 else None
+    } for budget in budgets]
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_serving_')
+    db_path = os.path.join(workdir, 'bench.sqlite')
+    catalog = synthetic_catalog(args.catalog_rows, seed=args.seed)
+    fake_mysql.create_database(db_path, catalog, [BENCH_USER])
+    fake_mysql.install(db_path)
+
+    # app.py reads its settings at import and its models relative to the cwd
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+    os.environ.setdefault('VOCAB_STAMP_FILE', os.path.join(workdir, 'vocabulary.stamp'))
+    if not args.cache:
+        os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    os.chdir(args.models_dir)
+    import app as app_module
+
+    if not app_module.ensure_models_loaded():
+        sys.exit(f"❌ Could not load models from {args.models_dir}")
+
+    client = app_module.app.test_client()
+    login = {'email': BENCH_USER[1], 'password': BENCH_USER[2]}
+    if client.post('/api/login', json=login).status_code != 200:
+        sys.exit("❌ Login against the SQLite stand-in failed")
+
+    categories = catalog['category'].unique().tolist()
+    platforms = catalog['platform'].unique().tolist()
+    queries = random_queries(args.requests, categories, platforms, args.seed)
+    batches = [random_queries(args.batch_size, categories, platforms, args.seed + i)
+               for i in range(max(1, args.requests // 10))]
+
+    # A separate client for login, so its session does not replace the
+    # logged-in one used by the prediction scenarios
+    login_client = app_module.app.test_client()
+
+    n = args.requests
+    results = [
+        measure('predict', n,
+                lambda i: client.post('/api/predict', json=queries[i % len(queries)])),
+        measure(f'predict_batch[{args.batch_size}]', len(batches),
+                lambda i: client.post('/api/predict/batch', json={'queries': batches[i % len(batches)]}),
+                items_per_request=args.batch_size),
+        measure('categories', n, lambda i: client.get('/api/categories')),
+        measure('platforms', n, lambda i: client.get('/api/platforms')),
+        measure('login', n, lambda i: login_client.post('/api/login', json=login))
+    ]
+
+    print(f"\nModels: {app_module.models.version or 'legacy pickles'} from {args.models_dir}, "
+          f"catalog {args.catalog_rows} rows, cache {'on' if args.cache else 'off'}\n")
+    print(f"{'scenario':<22}{'req/s':>10}{'items/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r['scenario']:<22}{r['requests_per_s']:>10}{r['items_per_s']:>11}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'serving', 'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help="requests per scenario")
+    parser.add_argument('--batch-size', type=int, default=100, help="queries per batch request")
+    parser.add_argument('--catalog-rows', type=int, default=10000, help="rows in the products table")
+    parser.add_argument('--models-dir', default=REPO_ROOT, help="directory holding the model files")
+    parser.add_argument('--cache', action='store_true', help="keep the prediction cache enabled")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+    args.models_dir = os.path.abspath(args.models_dir)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    run(args)
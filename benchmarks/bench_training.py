@@ -0,0 +1,121 @@
+"""Time each stage of model/model_traning.py on synthetic catalogs.
+
+For every size, a synthetic catalog (see catalog.py) is written to a SQLite
+stand-in for MySQL and the trainer's own functions are run against it in a
+scratch directory, in the order main() runs them:
+
+    load_preprocess   iter_products + preprocess_data (chunked streaming)
+    train_discount    train_discount_model (all candidates)
+    train_platform    train_platform_model
+    save              save_models (pickles, models.bundle, parity check)
+    compile_table     compile_prediction_table + save_prediction_table
+    publish           publish_models
+
+Usage:
+    python benchmarks/bench_training.py [--sizes 10000,100000,1000000]
+                                        [--workers 1] [--json out.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'model'))
+
+import fake_mysql
+from catalog import load_sample_products, synthetic_catalog
+import model_traning as trainer
+
+
+def time_stages(args, n_rows, sample):
+    workdir = tempfile.mkdtemp(prefix=f'bench_training_{n_rows}_')
+    db_path = os.path.join(workdir, 'products.sqlite')
+    fake_mysql.create_database(db_path, synthetic_catalog(n_rows, args.seed, sample))
+    fake_mysql.install(db_path)
+
+    timings = {}
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+    @contextlib.contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = round(time.perf_counter() - start, 3)
+        print(f"  {name:<16}{timings[name]:>10.3f} s", file=sys.stderr)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with quiet:
+            with stage('load_preprocess'):
+                df, label_encoders = trainer.preprocess_data(trainer.iter_products(args.chunk_size))
+            with stage('train_discount'):
+                discount_model, discount_scaler, discount_features, discount_name, quantile_models = \
+                    trainer.train_discount_model(df, label_encoders, args.workers, args.threads)
+            with stage('train_platform'):
+                platform_model, platform_scaler, platform_features = \
+                    trainer.train_platform_model(df, label_encoders, args.threads)
+            with stage('save'):
+                model_version = trainer.save_models(
+                    discount_model, discount_scaler, discount_features, discount_name,
+                    platform_model, platform_scaler, platform_features, label_encoders,
+                    quantile_models)
+            with stage('compile_table'):
+                table = trainer.compile_prediction_table(
+                    discount_model, discount_scaler, discount_features,
+                    platform_model, platform_scaler, platform_features,
+                    label_encoders, args.table_points, quantile_models)
+                trainer.save_prediction_table(table, model_version=model_version)
+            with stage('publish'):
+                trainer.publish_models(model_version)
+    finally:
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    timings['total'] = round(sum(timings.values()), 3)
+    return {'rows': n_rows, 'discount_model': discount_name, 'seconds': timings}
+
+
+def run(args):
+    sample = load_sample_products()
+    results = []
+    for n_rows in args.sizes:
+        print(f"\n[{n_rows} rows]", file=sys.stderr)
+        results.append(time_stages(args, n_rows, sample))
+
+    stages = list(results[0]['seconds'])
+    print(f"\n{'stage (s)':<18}" + ''.join(f"{r['rows']:>12}" for r in results))
+    for name in stages:
+        print(f"{name:<18}" + ''.join(f"{r['seconds'][name]:>12.3f}" for r in results))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'training', 'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help="comma-separated catalog sizes")
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--table-points', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directories")
+    parser.add_argument('--verbose', action='store_true', help="show the trainer's own output")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(',')]
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    run(args)
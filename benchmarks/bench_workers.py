@@ -0,0 +1,207 @@
+"""Compare gunicorn with and without preloaded models: memory and throughput.
+
+Starts gunicorn twice with gunicorn.conf.py against a SQLite stand-in for
+MySQL (see fake_mysql.py), once with GUNICORN_PRELOAD=0 (every worker loads
+its own models) and once with GUNICORN_PRELOAD=1 (the master loads them
+and the workers share them). For each run it reports:
+
+    rss_mb    resident memory summed over master and workers (counts
+              shared pages once per process, so it overstates)
+    pss_mb    proportional set size summed over all processes: each shared
+              page split between the processes mapping it, i.e. what the
+              server really costs
+    uss_mb    private memory per worker (what one more worker would add)
+
+plus /api/predict throughput and latency from --clients concurrent
+keep-alive clients over --seconds seconds. Linux only (/proc/<pid>/smaps_rollup).
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 4] [--clients 16]
+                                       [--seconds 10] [--json out.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+import fake_mysql
+from catalog import synthetic_catalog
+from bench_serving import BENCH_USER, random_queries
+
+def memory_kb(pid):
+    """Rss, Pss and private (USS) kB of one process"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {'rss': values['Rss'], 'pss': values['Pss'],
+            'uss': values['Private_Clean'] + values['Private_Dirty']}
+
+def child_pids(pid):
+    pids = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            pids += [int(p) for p in f.read().split()]
+    return pids
+
+def request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                 headers={'Content-Type': 'application/json', **(headers or {})})
+    response = conn.getresponse()
+    data = response.read()
+    return response, data
+
+def wait_until_up(port, deadline):
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            request(conn, 'GET', '/api/categories')
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def login_cookie(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    response, _ = request(conn, 'POST', '/api/login',
+                          {'email': BENCH_USER[1], 'password': BENCH_USER[2]})
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"login failed: HTTP {response.status}")
+    return response.getheader('Set-Cookie').split(';')[0]
+
+def load_test(port, cookie, queries, n_clients, seconds):
+    """Keep n_clients connections busy with /api/predict for `seconds` seconds"""
+    latencies = [[] for _ in range(n_clients)]
+    errors = [0] * n_clients
+    stop_at = time.perf_counter() + seconds
+
+    def client(k):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        i = k
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            response, _ = request(conn, 'POST', '/api/predict', queries[i % len(queries)],
+                                  {'Cookie': cookie})
+            latencies[k].append(time.perf_counter() - t0)
+            errors[k] += response.status != 200
+            i += n_clients
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(n_clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = np.concatenate([np.array(l) for l in latencies])
+    p50, p99 = np.percentile(all_latencies, [50, 99]) * 1000
+    return {
+        'requests': len(all_latencies),
+        'errors': sum(errors),
+        'requests_per_s': round(len(all_latencies) / elapsed, 1),
+        'p50_ms': round(p50, 2),
+        'p99_ms': round(p99, 2)
+    }
+
+def run_server(args, preload, db_path, workdir, queries, port):
+    env = dict(os.environ,
+               BENCH_DB=db_path,
+               GUNICORN_PRELOAD='1' if preload else '0',
+               GUNICORN_WORKERS=str(args.workers),
+               GUNICORN_THREADS=str(args.threads),
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               LOG_LEVEL='WARNING',
+               MODEL_WATCH_INTERVAL='0',
+               RECOMMENDATION_COUNT='0',
+               PREDICTION_CACHE_SIZE='0',
+               VOCAB_STAMP_FILE=os.path.join(workdir, 'vocabulary.stamp'))
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+               '--chdir', args.models_dir, '--pythonpath', f'{REPO_ROOT},{BENCH_DIR}',
+               'bench_wsgi:app']
+    log = open(os.path.join(workdir, f"gunicorn_preload{int(preload)}.log"), 'w')
+    server = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        if not wait_until_up(port, time.time() + 120):
+            raise RuntimeError(f"gunicorn did not start, see {log.name}")
+        cookie = login_cookie(port)
+        # Warm every worker up (keep-alive off, so requests spread out)
+        for i in range(args.workers * 20):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            request(conn, 'POST', '/api/predict', queries[i], {'Cookie': cookie, 'Connection': 'close'})
+            conn.close()
+
+        results = load_test(port, cookie, queries, args.clients, args.seconds)
+
+        workers = child_pids(server.pid)
+        master = memory_kb(server.pid)
+        per_worker = [memory_kb(pid) for pid in workers]
+        results.update({
+            'mode': 'preload' if preload else 'per-worker load',
+            'workers': len(workers),
+            'rss_mb': round((master['rss'] + sum(m['rss'] for m in per_worker)) / 1024, 1),
+            'pss_mb': round((master['pss'] + sum(m['pss'] for m in per_worker)) / 1024, 1),
+            'uss_mb': round(np.mean([m['uss'] for m in per_worker]) / 1024, 1)
+        })
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        log.close()
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='bench_workers_')
+    db_path = os.path.join(workdir, 'bench.sqlite')
+    catalog = synthetic_catalog(args.catalog_rows, seed=args.seed)
+    fake_mysql.create_database(db_path, catalog, [BENCH_USER])
+    queries = random_queries(max(1000, args.workers * 20), catalog['category'].unique().tolist(),
+                             catalog['platform'].unique().tolist(), args.seed)
+
+    results = []
+    for preload in (False, True):
+        print(f"\n▶️  {'preload' if preload else 'per-worker load'}: {args.workers} workers", file=sys.stderr)
+        results.append(run_server(args, preload, db_path, workdir, queries, args.port))
+
+    print(f"\n{'mode':<18}{'workers':>8}{'RSS MB':>9}{'PSS MB':>9}{'USS/wkr':>9}"
+          f"{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for r in results:
+        print(f"{r['mode']:<18}{r['workers']:>8}{r['rss_mb']:>9}{r['pss_mb']:>9}{r['uss_mb']:>9}"
+              f"{r['requests_per_s']:>9}{r['p50_ms']:>9}{r['p99_ms']:>9}{r['errors']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'workers', 'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help="gthread threads per worker")
+    parser.add_argument('--clients', type=int, default=16, help="concurrent keep-alive clients")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--catalog-rows', type=int, default=10000)
+    parser.add_argument('--models-dir', default=REPO_ROOT, help="directory holding the model files")
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    args = parser.parse_args()
+    args.models_dir = os.path.abspath(args.models_dir)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    run(args)
@@ -0,0 +1,8 @@
+"""wsgi.py against the SQLite stand-in at $BENCH_DB, for bench_workers.py"""
+import os
+
+import fake_mysql
+
+fake_mysql.install(os.environ['BENCH_DB'])
+
+from wsgi import app
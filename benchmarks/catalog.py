@@ -0,0 +1,56 @@
+"""Synthetic products catalogs in the shape of project_smart.sql.
+
+Rows are bootstrapped from the products in project_smart.sql, so platform,
+category, discount and stock keep their joint distribution; price and
+rating get a little noise so large catalogs are not just repeated rows.
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_SQL = os.path.join(REPO_ROOT, 'project_smart.sql')
+
+PRODUCT_COLUMNS = ['product_id', 'platform', 'sku', 'product_name', 'category', 'price',
+                   'discount_percent', 'discounted_price', 'rating', 'stock']
+
+PRODUCT_ROW = re.compile(r"\((\d+), '([^']*)', '([^']*)', '([^']*)', '([^']*)', "
+                         r"([\d.]+), (\d+), ([\d.]+), ([\d.]+), (\d+)\)")
+
+
+def load_sample_products(path=SAMPLE_SQL):
+    """The products rows of a project_smart.sql dump as a DataFrame"""
+    with open(path, encoding='utf-8') as f:
+        rows = PRODUCT_ROW.findall(f.read())
+
+    df = pd.DataFrame(rows, columns=PRODUCT_COLUMNS)
+    return df.astype({'product_id': int, 'price': float, 'discount_percent': int,
+                      'discounted_price': float, 'rating': float, 'stock': int})
+
+
+def synthetic_catalog(n_rows, seed=0, sample=None):
+    """n_rows products resampled from the sample catalog (same seed, same rows)"""
+    if sample is None:
+        sample = load_sample_products()
+    rng = np.random.default_rng(seed)
+    base = sample.iloc[rng.integers(0, len(sample), n_rows)].reset_index(drop=True)
+
+    price = np.clip(base['price'].to_numpy() * rng.lognormal(0, 0.15, n_rows), 50, 99999.99).round(2)
+    discount = base['discount_percent'].to_numpy()
+    rating = np.clip(base['rating'].to_numpy() + rng.normal(0, 0.2, n_rows), 1.0, 5.0).round(1)
+    product_id = np.arange(1, n_rows + 1)
+
+    return pd.DataFrame({
+        'product_id': product_id,
+        'platform': base['platform'],
+        'sku': base['platform'].str[:2].str.upper() + pd.Series(product_id).astype(str).str.zfill(7),
+        'product_name': base['product_name'],
+        'category': base['category'],
+        'price': price,
+        'discount_percent': discount,
+        'discounted_price': (price * (1 - discount / 100)).round(2),
+        'rating': rating,
+        'stock': base['stock']
+    })
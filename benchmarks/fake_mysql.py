@@ -0,0 +1,130 @@
+"""SQLite stand-in for the parts of mysql.connector used by app.py and the trainer.
+
+install(path) replaces mysql.connector.connect so every connection opens
+the SQLite file at path instead. Queries are passed through with %s
+placeholders turned into ?, which covers the plain SELECT/INSERT statements
+in this repo. For benchmarks only: it measures our code, not MySQL.
+"""
+import contextlib
+import sqlite3
+
+import mysql.connector
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id INTEGER PRIMARY KEY,
+    platform TEXT,
+    sku TEXT,
+    product_name TEXT,
+    category TEXT,
+    price REAL,
+    discount_percent INTEGER,
+    discounted_price REAL,
+    rating REAL,
+    stock INTEGER
+);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS platforms (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+"""
+
+
+@contextlib.contextmanager
+def mysql_errors():
+    """Raise SQLite errors as the mysql.connector errors app.py handles"""
+    try:
+        yield
+    except sqlite3.IntegrityError as e:
+        raise mysql.connector.IntegrityError(msg=str(e))
+    except sqlite3.OperationalError as e:
+        # e.g. a missing table or column, as when a migration was not applied
+        raise mysql.connector.ProgrammingError(msg=str(e))
+
+
+class Cursor:
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, params=()):
+        with mysql_errors():
+            self._cursor.execute(query.replace('%s', '?'), params)
+
+    def executemany(self, query, seq_params):
+        with mysql_errors():
+            self._cursor.executemany(query.replace('%s', '?'), seq_params)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {d[0]: value for d, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, dictionary=False, buffered=None, **kwargs):
+        return Cursor(self._db.cursor(), dictionary)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self._db.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._db.close()
+
+
+def install(path):
+    """Make mysql.connector.connect(**config) open the SQLite database at path"""
+    mysql.connector.connect = lambda **config: Connection(path)
+
+
+def create_database(path, products, users=()):
+    """Create the schema at path and fill it; users is [(name, email, password), ...]"""
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    products.to_sql('products', db, if_exists='append', index=False, chunksize=50000)
+    # Filled by triggers in MySQL (migration_001_indexes.sql)
+    db.execute("INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM products")
+    db.execute("INSERT OR IGNORE INTO platforms (name) SELECT DISTINCT platform FROM products")
+    db.executemany("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", list(users))
+    db.commit()
+    db.close()
@@ -0,0 +1,221 @@
+"""Caches used by app.py"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small thread-safe key -> value cache with a time-to-live.
+
+    Entries are reloaded through the loader passed to get() once they are
+    older than `ttl` seconds, or when `stamp_file` has been touched after
+    they were loaded. Touching the stamp file (see invalidate()) therefore
+    invalidates the cache in every process on the host, not just this one.
+    """
+
+    def __init__(self, ttl=3600, stamp_file=None):
+        self.ttl = ttl
+        self.stamp_file = stamp_file
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _stamp_mtime(self):
+        if not self.stamp_file:
+            return 0
+        try:
+            return os.stat(self.stamp_file).st_mtime
+        except OSError:
+            return 0
+
+    def get(self, key, loader):
+        """Return (value, modified_at) for key, calling loader() if stale.
+
+        modified_at is the wall-clock time the value last changed; a reload
+        that returns an equal value keeps the old timestamp.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            value, loaded_at, modified_at = entry
+            if now - loaded_at < self.ttl and self._stamp_mtime() <= loaded_at:
+                return value, modified_at
+
+        new_value = loader()
+        if entry is None or new_value != entry[0]:
+            modified_at = now
+        with self._lock:
+            self._entries[key] = (new_value, now, modified_at)
+        return new_value, modified_at
+
+    def invalidate(self, key=None):
+        """Mark one key (or everything) stale here and touch the shared stamp file"""
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                if k in self._entries:
+                    # Keep the old value so an unchanged reload keeps modified_at
+                    value, _, modified_at = self._entries[k]
+                    self._entries[k] = (value, float('-inf'), modified_at)
+
+        if self.stamp_file:
+            with open(self.stamp_file, 'a'):
+                os.utime(self.stamp_file, None)
+
+
+class LRUCache:
+    """Thread-safe, size-limited LRU cache whose entries expire after `ttl` seconds.
+
+    Counts hits, misses and evictions for /api/models. Values are stored as
+    given, so callers must not mutate what they put in or get back.
+    """
+
+    def __init__(self, maxsize=10000, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+class SQLiteCache(LRUCache):
+    """LRUCache stored in an SQLite file, shared by every process on the host.
+
+    Put the file on tmpfs (/dev/shm) so all gunicorn workers share one cache
+    at memory speed. Keys and values must be JSON-serialisable; values come
+    back as fresh objects. Hit/miss counters are per process. The cache is
+    best effort: a locked or broken database counts as a miss and is never
+    raised to the caller.
+    """
+
+    # Expired and least recently used entries are deleted every PRUNE_EVERY
+    # writes, so the file can briefly hold a few more than maxsize entries
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, maxsize=10000, ttl=600):
+        super().__init__(maxsize, ttl)
+        self.path = path
+        self._local = threading.local()
+        self._sets = 0
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, value TEXT NOT NULL,
+                expires_at REAL NOT NULL, used_at REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)")
+
+    def _connect(self):
+        # One connection per thread and per process (sqlite handles must
+        # not cross threads or survive fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        now = time.time()
+        try:
+            conn = self._connect()
+            k = json.dumps(key)
+            row = conn.execute("SELECT value FROM entries WHERE key = ? AND expires_at > ?",
+                               (k, now)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, k))
+        except sqlite3.Error:
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                         (json.dumps(key), json.dumps(value), now + self.ttl, now))
+            with self._lock:
+                self._sets += 1
+                prune = self._sets % self.PRUNE_EVERY == 0
+            if prune:
+                self._prune(conn, now)
+        except sqlite3.Error:
+            pass
+
+    def _prune(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        excess = len(self) - self.maxsize
+        if excess > 0:
+            conn.execute("DELETE FROM entries WHERE key IN "
+                         "(SELECT key FROM entries ORDER BY used_at LIMIT ?)", (excess,))
+            with self._lock:
+                self.evictions += excess
+
+    def clear(self):
+        try:
+            self._connect().execute("DELETE FROM entries")
+        except sqlite3.Error:
+            pass
+
+    def __len__(self):
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({'backend': 'sqlite', 'path': self.path})
+        return stats
@@ -0,0 +1,138 @@
+"""In-memory index of in-stock products for recommending real listings.
+
+For every category, and every (category, platform) pair, products are sorted
+by discounted_price. Walking that order with a bounded heap of the K best
+scores gives the top K of every price prefix; it only changes when a better
+product enters the heap, which happens about K * ln(n / K) times for n
+products, so just those snapshots are stored. The top K products within a
+budget are the snapshot in effect at the last product that fits the
+budget: one binary search on discounted_price and one on the snapshot
+positions, no SQL and no scan per request.
+
+An index is never modified once built; app.py builds a new one and swaps
+the reference, as it does with ModelSet.
+"""
+import heapq
+import time
+
+import numpy as np
+
+# Columns CatalogIndex is built from, and the ones it returns per product
+INDEX_COLUMNS = ('product_id', 'category', 'platform', 'discounted_price',
+                 'discount_percent', 'rating')
+DETAIL_COLUMNS = ('product_id', 'sku', 'product_name', 'platform', 'category',
+                  'price', 'discount_percent', 'discounted_price', 'rating')
+
+# Product score: mostly rating (out of 5), plus discount (capped at 50%)
+RATING_WEIGHT = 0.7
+DISCOUNT_WEIGHT = 0.3
+
+def product_scores(rating, discount_percent):
+    return (RATING_WEIGHT * np.asarray(rating, dtype=float) / 5 +
+            DISCOUNT_WEIGHT * np.minimum(np.asarray(discount_percent, dtype=float), 50) / 50)
+
+def prefix_top_k(scores, k):
+    """Positions where the top k of scores[:pos + 1] changes, and the top k
+    (positions, best first) from each of those on.
+
+    Among equal scores the earlier, i.e. cheaper, product wins.
+    """
+    heap = []
+    positions = []
+    snapshots = []
+    for pos, score in enumerate(scores.tolist()):
+        if len(heap) < k:
+            heapq.heappush(heap, (score, -pos))
+        elif (score, -pos) > heap[0]:
+            heapq.heapreplace(heap, (score, -pos))
+        else:
+            continue
+        positions.append(pos)
+        snapshots.append([-p for _, p in sorted(heap, reverse=True)])
+    return positions, snapshots
+
+class CatalogIndex:
+    def __init__(self, rows, k=5):
+        """rows: (product_id, category, platform, discounted_price, discount_percent, rating) tuples"""
+        start = time.perf_counter()
+        self.k = k
+        self.built_at = time.time()
+        self._groups = {}
+        self._details = {}
+
+        rows = [r for r in rows if None not in r]
+        self.n_products = len(rows)
+        if not rows:
+            self._product_ids = np.empty(0, dtype=np.int64)
+            self.build_seconds = time.perf_counter() - start
+            return
+
+        product_ids, categories, platforms, prices, discounts, ratings = zip(*rows)
+        self._product_ids = np.array(product_ids, dtype=np.int64)
+        prices = np.array(prices, dtype=float)
+        scores = product_scores(ratings, discounts)
+        category_names, category_codes = np.unique(np.array(categories, dtype=object), return_inverse=True)
+        platform_names, platform_codes = np.unique(np.array(platforms, dtype=object), return_inverse=True)
+
+        # Category-wide groups, then category/platform groups
+        self._add_groups(category_codes, prices, scores,
+                         lambda code: (category_names[code], None))
+        n_platforms = len(platform_names)
+        self._add_groups(category_codes * n_platforms + platform_codes, prices, scores,
+                         lambda code: (category_names[code // n_platforms],
+                                       platform_names[code % n_platforms]))
+        self.build_seconds = time.perf_counter() - start
+
+    def _add_groups(self, codes, prices, scores, group_key):
+        # Rows ordered by group, then price (then product_id, for stable ties)
+        order = np.lexsort((self._product_ids, prices, codes))
+        starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+        for start, end in zip(starts, np.append(starts[1:], len(order))):
+            rows = order[start:end]
+            positions, snapshots = prefix_top_k(scores[rows], self.k)
+            matrix = np.full((len(snapshots), self.k), -1, dtype=np.int64)
+            for s, snapshot in enumerate(snapshots):
+                matrix[s, :len(snapshot)] = rows[snapshot]
+            self._groups[group_key(codes[rows[0]])] = (prices[rows], np.array(positions), matrix)
+
+    def product_ids(self):
+        """Ids of every product some lookup can return (the ones needing details)"""
+        rows = np.unique(np.concatenate([m.ravel() for _, _, m in self._groups.values()] or [[]]))
+        return self._product_ids[rows[rows >= 0].astype(np.int64)].tolist()
+
+    def set_details(self, details):
+        """Attach the DETAIL_COLUMNS dicts returned by top_k"""
+        for detail in details:
+            self._details[detail['product_id']] = {
+                key: float(value) if key in ('price', 'discounted_price', 'rating') else value
+                for key, value in detail.items()
+            }
+
+    def top_k(self, category, budget, platform=None, k=None):
+        """Best-scoring products of category (on platform) with discounted_price <= budget"""
+        group = self._groups.get((category, platform or None))
+        if group is None:
+            return []
+        prices, positions, matrix = group
+
+        # Products [0, end) fit the budget; the snapshot in effect at end - 1
+        end = np.searchsorted(prices, budget, side='right')
+        if end == 0:
+            return []
+        snapshot = matrix[np.searchsorted(positions, end - 1, side='right') - 1]
+
+        products = []
+        for row in snapshot[:k or self.k]:
+            detail = self._details.get(int(self._product_ids[row])) if row >= 0 else None
+            if detail is not None:
+                products.append(detail)
+        return products
+
+    def stats(self):
+        return {
+            'products': self.n_products,
+            'groups': len(self._groups),
+            'snapshots': sum(len(positions) for _, positions, _ in self._groups.values()),
+            'built_at': self.built_at,
+            'build_seconds': round(self.build_seconds, 3)
+        }
@@ -0,0 +1,206 @@
+"""MySQL connection pool shared by every route in app.py"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class TimedCursor:
+    """Cursor wrapper that reports execute/fetch durations to observer(stage, seconds)"""
+
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, stage, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._observer(stage, time.perf_counter() - start)
+
+    def execute(self, *args, **kwargs):
+        return self._timed('db_query', self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed('db_query', self._cursor.executemany, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed('db_fetch', self._cursor.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed('db_fetch', self._cursor.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed('db_fetch', self._cursor.fetchall)
+
+
+class PooledConnection:
+    """A borrowed connection; close() hands it back to the pool instead of closing it"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if self._pool.observer is not None:
+            return TimedCursor(cursor, self._pool.observer)
+        return cursor
+
+    def close(self):
+        if self._conn is not None:
+            self._pool._release(self._conn)
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of mysql.connector connections.
+
+    - size: connections this process may hold open at once
+    - timeout: seconds to wait for a free connection before raising PoolError
+    - health_check: ping idle connections when they are borrowed
+    - recycle: close connections that have been idle longer than this (seconds)
+    - observer: optional observer(stage, seconds) called with the time spent
+      borrowing a connection ('db_connect') and in cursor execute/fetch
+      calls ('db_query', 'db_fetch')
+
+    Connections are opened lazily. The pool notices when it is used in a
+    forked child (gunicorn worker) and starts empty there, so workers never
+    share the parent's sockets.
+    """
+
+    def __init__(self, config, size=5, timeout=10, health_check=True, recycle=3600,
+                 observer=None):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.recycle = recycle
+        self.observer = observer
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = deque()
+        self._in_use = 0
+        self._created = 0
+
+    def _check_fork(self):
+        # Connections inherited from the parent process belong to the parent;
+        # drop them without closing so the parent's sessions stay intact
+        if self._pid != os.getpid():
+            self._reset()
+
+    def get_connection(self):
+        """Borrow a connection, waiting up to `timeout` seconds for a free slot"""
+        # Imported here so importing app.py does not pay for mysql.connector
+        import mysql.connector
+        from mysql.connector.errors import PoolError
+        
+        self._check_fork()
+        start = time.perf_counter()
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(f"No free database connection after {self.timeout}s "
+                            f"(pool size {self.size})")
+
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = mysql.connector.connect(**self.config)
+                with self._lock:
+                    self._created += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        if self.observer is not None:
+            self.observer('db_connect', time.perf_counter() - start)
+        return PooledConnection(self, conn)
+
+    def _take_idle(self):
+        """Pop the most recently used healthy idle connection, if any"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, idle_since = self._idle.pop()
+
+            if time.monotonic() - idle_since > self.recycle:
+                self._discard(conn)
+                continue
+
+            if self.health_check:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._discard(conn)
+                    continue
+
+            return conn
+
+    def _release(self, conn):
+        if self._pid != os.getpid():
+            return
+
+        # End any implicit transaction so the next borrower does not see a
+        # stale snapshot; a connection that cannot do that is dropped
+        try:
+            conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+
+        if not healthy:
+            self._discard(conn)
+        self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """Close every idle connection (borrowed ones are closed on return)"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Current pool usage for this process"""
+        self._check_fork()
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created
+            }
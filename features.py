@@ -0,0 +1,82 @@
+"""Feature engineering shared by model/model_traning.py and app.py.
+
+Every derived feature is computed here, once, with NumPy so the trainer and
+the API bin values identically. Functions take scalars or arrays of any
+length, so the same code serves single predictions and batch scoring.
+
+Bins are right-closed like pd.cut: a price of exactly 1000 is in (0, 1000],
+price_range 0. Values outside the outer edges fall into the first/last bin.
+"""
+import numpy as np
+
+PRICE_RANGE_BINS = [0, 1000, 5000, 15000, 30000, 100000]
+RATING_BINS = [0, 3.5, 4.0, 4.5, 5.0]
+STOCK_BINS = [0, 50, 150, 300, 500]
+HIGH_DISCOUNT_THRESHOLD = 20
+
+# Inputs the API does not ask the user for; the compiled prediction table
+# is built from the same values
+RATING_PREFERENCE = 4.0
+STOCK_ESTIMATE = 200
+DISCOUNT_ESTIMATE = 15
+DISCOUNT_EFFECTIVENESS = 0.15
+
+
+def bin_codes(values, bins):
+    """pd.cut(values, bins, labels=False) via searchsorted, clamped to the outer bins"""
+    codes = np.searchsorted(bins, values, side='left') - 1
+    return np.clip(codes, 0, len(bins) - 2).astype(np.int8)
+
+
+def price_range(price):
+    return bin_codes(price, PRICE_RANGE_BINS)
+
+
+def rating_category(rating):
+    return bin_codes(rating, RATING_BINS)
+
+
+def stock_status(stock):
+    return bin_codes(stock, STOCK_BINS)
+
+
+def discount_effectiveness(price, discounted_price):
+    price = np.asarray(price, dtype=float)
+    return (price - discounted_price) / price
+
+
+def high_discount(discount_percent):
+    return (np.asarray(discount_percent) > HIGH_DISCOUNT_THRESHOLD).astype(np.int8)
+
+
+def serving_columns(category_encoded, budgets, platform_encoded=None):
+    """Feature columns for queries that only give category, budget and platform.
+
+    The budget stands in for the price; everything else the models expect
+    comes from the serving defaults above, binned like the training data.
+    """
+    return {
+        'platform_encoded': platform_encoded,
+        'category_encoded': category_encoded,
+        'price': budgets,
+        'price_range': price_range(budgets),
+        'discount_percent': DISCOUNT_ESTIMATE,
+        'rating': RATING_PREFERENCE,
+        'stock': STOCK_ESTIMATE,
+        'discount_effectiveness': DISCOUNT_EFFECTIVENESS,
+        'rating_category': rating_category(RATING_PREFERENCE),
+        'stock_status': stock_status(STOCK_ESTIMATE)
+    }
+
+
+def feature_matrix(features, columns, n_rows):
+    """Float matrix with one column per name in features, in that order.
+
+    columns maps feature names to arrays of n_rows values or to scalars,
+    which are broadcast. Using the feature list saved with each model keeps
+    the column order identical to training.
+    """
+    X = np.empty((n_rows, len(features)))
+    for j, name in enumerate(features):
+        X[:, j] = columns[name]
+    return X
@@ -0,0 +1,43 @@
+"""Production gunicorn settings.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker wsgi:application
+
+With preload_app the master imports wsgi.py once, which loads the models
+before any worker is forked, so every worker shares the same read-only
+model pages (and the numpy/sklearn/xgboost imports) instead of loading its
+own copy. GUNICORN_PRELOAD=0 gives the old behaviour of each worker
+loading the models itself.
+
+Settings can be overridden with the environment variables below or the
+usual gunicorn command-line flags.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', os.cpu_count() or 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Request threads per worker: they mostly wait on MySQL, so more than one
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# BLAS/OpenMP pools size themselves to every core by default, so N workers
+# would each start N threads for one matrix product. Give each worker an
+# equal share of the cores instead. This has to happen before numpy is
+# imported, which is why it lives here and not in app.py.
+NATIVE_THREADS = str(max(1, (os.cpu_count() or 1) // workers))
+for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+            'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+    os.environ.setdefault(var, NATIVE_THREADS)
+
+def on_starting(server):
+    server.log.info(f"Starting {workers} x {threads} threads, preload={preload_app}, "
+                    f"{os.environ['OMP_NUM_THREADS']} BLAS/OpenMP thread(s) per worker")
+
+def post_worker_init(worker):
+    # Warm the worker up in the background; /ready reports when it is done
+    import app
+    app.start_warmup()
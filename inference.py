@@ -0,0 +1,263 @@
+"""NumPy-only inference over the flat arrays stored in models.bundle.
+
+Evaluates the exported scalers, tree ensembles and linear models without
+importing sklearn or xgboost. Results are bit-identical to the original
+estimators: inputs are cast to float32 before tree traversal exactly like
+sklearn/xgboost do, NaN follows each split's missing-value branch, and
+per-tree outputs are accumulated in the same order and precision.
+check_parity() verifies this against the pickled estimators, and so does
+tests/test_inference.py for every model kind the trainer produces.
+
+Usage:
+    python inference.py [models.bundle]     # run the parity check
+"""
+import sys
+
+import numpy as np
+
+from model_bundle import read_bundle, load_pickled_objects
+from intervals import predict_with_quantiles, tree_quantiles
+
+
+class NativeScaler:
+    """StandardScaler.transform from mean/scale arrays"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+class NativeLabelEncoder:
+    """LabelEncoder with only classes_, as stored in the bundle.
+
+    The code of a label is its position in classes_. Incremental training
+    appends new labels at the end, so classes_ is not necessarily sorted.
+    """
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+        self._index = {c: i for i, c in enumerate(self.classes_)}
+
+    def transform(self, values):
+        unseen = [v for v in values if v not in self._index]
+        if unseen:
+            raise ValueError(f"y contains previously unseen labels: {unseen}")
+        return np.asarray([self._index[v] for v in values])
+
+    def inverse_transform(self, idx):
+        return self.classes_[np.asarray(idx)]
+
+
+class NativeTreeEnsemble:
+    """Forest / boosted trees stored as concatenated node arrays.
+
+    kind is one of forest_classifier, forest_regressor, gradient_boosting
+    or xgboost (see model_bundle.export_estimator). A boosted discount model
+    may carry the trees of its quantile variants after its own: tree_output
+    says which output each tree adds to (0 = the point prediction).
+    """
+
+    def __init__(self, arrays, prefix, meta):
+        self.kind = meta['kind']
+        self.meta = meta
+        self.feature = arrays[f'{prefix}.feature']
+        self.threshold = arrays[f'{prefix}.threshold']
+        self.left = arrays[f'{prefix}.left']
+        self.right = arrays[f'{prefix}.right']
+        # Where NaN inputs go at each split (sklearn's missing_go_to_left,
+        # xgboost's default_left); bundles written before it send NaN right
+        self.missing_left = arrays.get(f'{prefix}.missing_left')
+        self.value = arrays[f'{prefix}.value']
+        self.roots = arrays[f'{prefix}.roots']
+        self.go_left_if_equal = meta['split_rule'] == 'le'
+        self.n_point_trees = meta.get('n_point_trees', len(self.roots))
+        self.tree_output = arrays.get(f'{prefix}.tree_output')
+        self.quantile_outputs = meta.get('quantile_outputs', [])
+        if self.kind == 'forest_classifier':
+            self.classes_ = np.asarray(meta['classes'])
+
+    def apply(self, X, roots=None):
+        """Leaf node index for every (row, tree), by vectorized traversal"""
+        roots = self.roots if roots is None else roots
+        # sklearn and xgboost both compare float32 inputs
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        has_nan = self.missing_left is not None and np.isnan(X).any()
+        rows = np.arange(len(X))[:, np.newaxis]
+        node = np.broadcast_to(roots, (len(X), len(roots))).copy()
+
+        while True:
+            feature = self.feature[node]
+            active = feature >= 0
+            if not active.any():
+                return node
+            x = X[rows, np.maximum(feature, 0)]
+            threshold = self.threshold[node]
+            go_left = x <= threshold if self.go_left_if_equal else x < threshold
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.missing_left[node], go_left)
+            node = np.where(active, np.where(go_left, self.left[node], self.right[node]), node)
+
+    def _accumulate(self, leaves, acc, scale=None):
+        # Add tree outputs one tree at a time, in tree order, as the
+        # original estimators do; a vectorized sum would reorder the additions
+        for t in range(leaves.shape[1]):
+            values = self.value[leaves[:, t]]
+            if scale is not None:
+                values = scale * values
+            acc += values.astype(acc.dtype, copy=False)
+        return acc
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        acc = np.zeros((len(leaves), self.value.shape[1]))
+        self._accumulate(leaves, acc)
+        acc /= leaves.shape[1]
+        return acc
+
+    def predict_with_proba(self, X):
+        """Class labels and probabilities from a single traversal"""
+        proba = self.predict_proba(X)
+        return self.classes_[proba.argmax(axis=1)], proba
+
+    def _regress(self, leaves, params):
+        """Regression output of the trees in leaves, with init/base_score from params"""
+        n = len(leaves)
+
+        if self.kind == 'forest_regressor':
+            acc = self._accumulate(leaves, np.zeros((n, 1)))
+            acc /= leaves.shape[1]
+            return acc[:, 0]
+
+        if self.kind == 'gradient_boosting':
+            acc = np.full((n, 1), params['init'])
+            self._accumulate(leaves, acc, params['learning_rate'])
+            return acc[:, 0]
+
+        if self.kind == 'xgboost':
+            # xgboost accumulates margins in float32
+            acc = np.full((n, 1), params['base_score'], dtype=np.float32)
+            self._accumulate(leaves, acc)
+            return acc[:, 0]
+
+        raise ValueError(f"Unknown tree ensemble kind {self.kind}")
+
+    def predict(self, X):
+        if self.kind == 'forest_classifier':
+            return self.predict_with_proba(X)[0]
+        return self._regress(self.apply(X, self.roots[:self.n_point_trees]), self.meta)
+
+    def predict_with_quantiles(self, X):
+        """Point predictions and quantiles (or None) from a single traversal"""
+        leaves = self.apply(X)
+        point_leaves = leaves[:, :self.n_point_trees]
+        point = self._regress(point_leaves, self.meta)
+
+        if self.kind == 'forest_regressor':
+            return point, tree_quantiles(self.value[point_leaves, 0])
+        if not self.quantile_outputs:
+            return point, None
+        return point, np.column_stack([self._regress(leaves[:, self.tree_output == output], params)
+                                       for output, params in enumerate(self.quantile_outputs, start=1)])
+
+
+class NativeLinear:
+    """LinearRegression.predict from coef/intercept arrays"""
+
+    def __init__(self, arrays, prefix):
+        self.coef_ = arrays[f'{prefix}.coef']
+        self.intercept_ = arrays[f'{prefix}.intercept'][0]
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+    def predict_with_quantiles(self, X):
+        return self.predict(X), None
+
+
+def load_estimator(arrays, prefix, meta):
+    if meta['kind'] == 'linear':
+        return NativeLinear(arrays, prefix)
+    return NativeTreeEnsemble(arrays, prefix, meta)
+
+
+def load_native_models(header, arrays):
+    """Build app.py's model objects from a bundle, without sklearn/xgboost"""
+    meta = header['metadata']
+    return {
+        'discount_model': load_estimator(arrays, 'discount', meta['discount_model']),
+        'discount_scaler': NativeScaler(arrays['discount_scaler.mean'], arrays['discount_scaler.scale']),
+        'discount_features': meta['discount_features'],
+        # Scored together with discount_model (see NativeTreeEnsemble)
+        'discount_quantile_models': None,
+        'platform_model': load_estimator(arrays, 'platform', meta['platform_model']),
+        'platform_scaler': NativeScaler(arrays['platform_scaler.mean'], arrays['platform_scaler.scale']),
+        'platform_features': meta['platform_features'],
+        'label_encoders': {key: NativeLabelEncoder(classes)
+                           for key, classes in meta['label_classes'].items()},
+        'model_metadata': {
+            'discount_model_name': meta['discount_model_name'],
+            'platform_model_name': meta['platform_model_name']
+        }
+    }
+
+
+def parity_inputs(scaler, n_rows=2000, seed=0):
+    """Random raw feature rows spread around the training distribution"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scaler.mean_, scaler.scale_ * 2, size=(n_rows, len(scaler.mean_)))
+    # Include exact training means too, they often sit on split thresholds
+    return np.vstack([X, scaler.mean_])
+
+
+def check_parity(header, arrays, n_rows=2000):
+    """Compare native and original predictions; returns a list of mismatches"""
+    import warnings
+
+    original = load_pickled_objects(arrays)
+    native = load_native_models(header, arrays)
+    failures = []
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for prefix in ('discount', 'platform'):
+            scaler, model = original[f'{prefix}_scaler'], original[f'{prefix}_model']
+            X = parity_inputs(scaler, n_rows)
+
+            X_scaled = scaler.transform(X)
+            X_native = native[f'{prefix}_scaler'].transform(X)
+            if not np.array_equal(X_scaled, X_native):
+                failures.append(f'{prefix}_scaler.transform')
+
+            if not np.array_equal(model.predict(X_scaled), native[f'{prefix}_model'].predict(X_native)):
+                failures.append(f'{prefix}_model.predict')
+
+            if hasattr(model, 'predict_proba'):
+                if not np.array_equal(model.predict_proba(X_scaled),
+                                      native[f'{prefix}_model'].predict_proba(X_native)):
+                    failures.append(f'{prefix}_model.predict_proba')
+
+        X_scaled = original['discount_scaler'].transform(parity_inputs(original['discount_scaler'], n_rows))
+        _, expected = predict_with_quantiles(original['discount_model'],
+                                             original.get('discount_quantile_models'), X_scaled)
+        _, quantiles = native['discount_model'].predict_with_quantiles(X_scaled)
+        if (expected is None) != (quantiles is None) or (
+                expected is not None and not np.array_equal(expected, quantiles)):
+            failures.append('discount quantiles')
+
+    return failures
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else 'models.bundle'
+    header, arrays = read_bundle(path)
+    failures = check_parity(header, arrays)
+    if failures:
+        print(f"❌ Native inference differs from sklearn/xgboost: {', '.join(failures)}")
+        sys.exit(1)
+    print(f"✅ Native inference matches sklearn/xgboost bit for bit ({header['model_version']})")
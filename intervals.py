@@ -0,0 +1,99 @@
+"""Discount prediction intervals (p10/p50/p90), shared by the trainer and app.py.
+
+Each interval is computed in the same pass that produces the point
+prediction:
+
+- Random Forest: the quantiles of the individual trees' predictions. Their
+  mean is the forest's prediction, so one traversal gives both.
+- Gradient Boosting / XGBoost: quantile-loss variants of the winning model
+  fitted by train_discount_model (discount_quantile_models). models.bundle
+  stores their trees next to the point model's, so inference.py scores all
+  of them in a single traversal.
+- Anything else (Linear Regression): no interval.
+
+Only the Random Forest interval is centred on the point prediction: it
+comes from the very trees whose mean is that prediction. The boosted
+quantile variants are fitted separately from the point model and can
+land on one side of it (the point model predicts a mean, they predict
+quantiles). So finish() sorts the quantiles, so they never cross, and then
+widens p10/p90 to include the point. A response therefore never quotes a
+discount outside its own range. Everything is clipped to the same 0-50 range
+as the point prediction.
+
+p50 is left as the models give it and can differ from the point
+prediction: p50 is a median, the point prediction a mean (of the forest's
+trees, or what the boosted point model was fitted to). With a skewed
+distribution the point can sit near p10 or p90.
+"""
+import numpy as np
+
+QUANTILES = (0.1, 0.5, 0.9)
+QUANTILE_NAMES = ('p10', 'p50', 'p90')
+
+# Boosted models that get quantile-loss variants, and the parameters that
+# turn a copy of the fitted point model into the variant for quantile q
+QUANTILE_PARAMS = {
+    'GradientBoostingRegressor': lambda q: {'loss': 'quantile', 'alpha': q},
+    'XGBRegressor': lambda q: {'objective': 'reg:quantileerror', 'quantile_alpha': q}
+}
+
+
+def forest_tree_predictions(model, X):
+    """(rows, trees) prediction of every tree of a RandomForestRegressor, from one apply()"""
+    leaves = model.apply(X)
+    return np.column_stack([tree.tree_.value[leaves[:, t], 0, 0]
+                            for t, tree in enumerate(model.estimators_)])
+
+
+def tree_quantiles(per_tree):
+    """QUANTILES of each row of a (rows, trees) matrix"""
+    return np.quantile(per_tree, QUANTILES, axis=1).T
+
+
+def predict_with_quantiles(model, quantile_models, X):
+    """(point predictions, (rows, len(QUANTILES)) quantiles or None).
+
+    model is a fitted sklearn/xgboost estimator or an inference.py object,
+    quantile_models the variants from train_discount_model (or None).
+    """
+    if hasattr(model, 'predict_with_quantiles'):
+        return model.predict_with_quantiles(X)
+
+    if type(model).__name__ == 'RandomForestRegressor':
+        per_tree = forest_tree_predictions(model, X)
+        # Sum tree by tree like RandomForestRegressor.predict, so the point
+        # prediction is unchanged
+        point = np.zeros(len(per_tree))
+        for t in range(per_tree.shape[1]):
+            point += per_tree[:, t]
+        point /= per_tree.shape[1]
+        return point, tree_quantiles(per_tree)
+
+    point = model.predict(X)
+    if not quantile_models:
+        return point, None
+    return point, np.column_stack([m.predict(X) for m in quantile_models])
+
+
+def finish(quantiles, point, low=0, high=50):
+    """Sort quantile rows (p10 <= p50 <= p90), clip them and the point to
+    [low, high] and widen p10/p90 to include the point; NaN rows stay NaN"""
+    quantiles = np.clip(np.sort(quantiles, axis=1), low, high)
+    point = np.clip(point, low, high)
+    # np.minimum/maximum propagate NaN, so rows without an interval stay NaN
+    quantiles[:, 0] = np.minimum(quantiles[:, 0], point)
+    quantiles[:, -1] = np.maximum(quantiles[:, -1], point)
+    return quantiles
+
+
+def interval_dict(row):
+    """{'p10': ..., 'p50': ..., 'p90': ...} for one row, or None if unknown"""
+    if row is None or np.isnan(row).any():
+        return None
+    return {name: round(float(value), 1) for name, value in zip(QUANTILE_NAMES, row)}
+
+
+def coverage(y, quantiles):
+    """Fraction of y inside [first, last] quantile, e.g. ~0.8 for p10-p90"""
+    y = np.asarray(y)
+    return float(np.mean((y >= quantiles[:, 0]) & (y <= quantiles[:, -1])))
@@ -0,0 +1,144 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Histograms are plain bucket counters behind a lock; observing a value is a
+bisect and two additions. Every gunicorn worker keeps its own numbers (each
+sample carries a pid label), so scrape each worker or sum in the query.
+
+With enabled=False, timers are no-ops and nothing is recorded.
+"""
+import bisect
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self, extra_labels=None):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+        for labels, (counts, total) in sorted(series.items()):
+            base = dict(zip(self.labelnames, labels), **(extra_labels or {}))
+            cumulative = 0
+            for edge, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket = _format_labels(dict(base, le=_format_value(edge)))
+                lines.append(f'{self.name}_bucket{bucket} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(base)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(base)} {cumulative}')
+        return lines
+
+
+def render_gauge(name, help, samples, extra_labels=None):
+    """Lines for a gauge from [(labels dict, value), ...] computed at scrape time"""
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(f'{name}{_format_labels(dict(labels, **(extra_labels or {})))} {_format_value(value)}')
+    return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """The histograms of one process plus the gauge callbacks rendered with them"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = []
+        self.collectors = []
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        histogram = Histogram(name, help, labelnames, buckets)
+        self.histograms.append(histogram)
+        return histogram
+
+    def timer(self, histogram, *labels):
+        """Context manager that observes its own duration in seconds"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(histogram, labels)
+
+    def observe(self, histogram, value, *labels):
+        if self.enabled:
+            histogram.observe(value, *labels)
+
+    def add_collector(self, collector):
+        """collector(extra_labels) returns exposition lines (see render_gauge), called per scrape"""
+        self.collectors.append(collector)
+
+    def render(self):
+        extra = {'pid': os.getpid()}
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.render(extra))
+        for collector in self.collectors:
+            lines.extend(collector(extra))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,90 @@
+-- Indexes and category/platform lookup tables.
+-- Run after project_smart.sql and User data.sql (safe to run again):
+--     mysql -u root -p < migration_001_indexes.sql
+USE project_smart;
+
+-- ALTER TABLE has no IF NOT EXISTS for columns and keys; these add them
+-- only when information_schema says they are missing
+DROP PROCEDURE IF EXISTS add_column_if_missing;
+DROP PROCEDURE IF EXISTS add_key_if_missing;
+DELIMITER //
+CREATE PROCEDURE add_column_if_missing(IN tbl VARCHAR(64), IN col VARCHAR(64), IN ddl TEXT)
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                 WHERE table_schema = DATABASE() AND table_name = tbl AND column_name = col) THEN
+    SET @ddl = ddl;
+    PREPARE stmt FROM @ddl;
+    EXECUTE stmt;
+    DEALLOCATE PREPARE stmt;
+  END IF;
+END//
+CREATE PROCEDURE add_key_if_missing(IN tbl VARCHAR(64), IN idx VARCHAR(64), IN ddl TEXT)
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM information_schema.statistics
+                 WHERE table_schema = DATABASE() AND table_name = tbl AND index_name = idx) THEN
+    SET @ddl = ddl;
+    PREPARE stmt FROM @ddl;
+    EXECUTE stmt;
+    DEALLOCATE PREPARE stmt;
+  END IF;
+END//
+DELIMITER ;
+
+-- Lookup tables app.py reads its category/platform lists from, instead of
+-- SELECT DISTINCT over every product row
+CREATE TABLE IF NOT EXISTS categories (
+  id SMALLINT AUTO_INCREMENT PRIMARY KEY,
+  name VARCHAR(100) NOT NULL,
+  UNIQUE KEY uq_categories_name (name)
+);
+
+CREATE TABLE IF NOT EXISTS platforms (
+  id SMALLINT AUTO_INCREMENT PRIMARY KEY,
+  name VARCHAR(50) NOT NULL,
+  UNIQUE KEY uq_platforms_name (name)
+);
+
+INSERT IGNORE INTO categories (name)
+  SELECT DISTINCT category FROM products WHERE category IS NOT NULL;
+INSERT IGNORE INTO platforms (name)
+  SELECT DISTINCT platform FROM products WHERE platform IS NOT NULL;
+
+-- Keep them filled as products are added or changed. Names are never
+-- removed here; delete a retired category by hand.
+DROP TRIGGER IF EXISTS trg_products_insert_category;
+CREATE TRIGGER trg_products_insert_category AFTER INSERT ON products FOR EACH ROW
+  INSERT IGNORE INTO categories (name) SELECT NEW.category FROM DUAL WHERE NEW.category IS NOT NULL;
+DROP TRIGGER IF EXISTS trg_products_update_category;
+CREATE TRIGGER trg_products_update_category AFTER UPDATE ON products FOR EACH ROW
+  INSERT IGNORE INTO categories (name) SELECT NEW.category FROM DUAL WHERE NEW.category IS NOT NULL;
+DROP TRIGGER IF EXISTS trg_products_insert_platform;
+CREATE TRIGGER trg_products_insert_platform AFTER INSERT ON products FOR EACH ROW
+  INSERT IGNORE INTO platforms (name) SELECT NEW.platform FROM DUAL WHERE NEW.platform IS NOT NULL;
+DROP TRIGGER IF EXISTS trg_products_update_platform;
+CREATE TRIGGER trg_products_update_platform AFTER UPDATE ON products FOR EACH ROW
+  INSERT IGNORE INTO platforms (name) SELECT NEW.platform FROM DUAL WHERE NEW.platform IS NOT NULL;
+
+-- products:
+--   sku            unique, so bulk loads can upsert on it
+--   category/platform  filters and per-category scans (the leading
+--                  column also serves any remaining DISTINCT by index)
+--   updated_at     lets `model_traning.py --incremental --cursor-column
+--                  updated_at` pick up changed rows by index range
+CALL add_column_if_missing('products', 'updated_at',
+  'ALTER TABLE products ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP');
+CALL add_key_if_missing('products', 'uq_products_sku',
+  'ALTER TABLE products ADD UNIQUE KEY uq_products_sku (sku)');
+CALL add_key_if_missing('products', 'idx_products_category_platform',
+  'ALTER TABLE products ADD KEY idx_products_category_platform (category, platform)');
+CALL add_key_if_missing('products', 'idx_products_platform',
+  'ALTER TABLE products ADD KEY idx_products_platform (platform)');
+CALL add_key_if_missing('products', 'idx_products_updated_at',
+  'ALTER TABLE products ADD KEY idx_products_updated_at (updated_at)');
+
+-- users needs no new key: login looks up (id, password) by email through
+-- the existing UNIQUE(email) key, a one-row read.
+
+DROP PROCEDURE add_column_if_missing;
+DROP PROCEDURE add_key_if_missing;
+
+ANALYZE TABLE products, users, categories, platforms;
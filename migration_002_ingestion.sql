@@ -0,0 +1,15 @@
+-- Let model/ingest_products.py add products without choosing ids.
+-- Run once, after migration_001_indexes.sql (which adds the unique key on
+-- sku that the ingestion upsert relies on):
+--     mysql -u root -p < migration_002_ingestion.sql
+USE project_smart;
+
+-- New listings get the next product_id; re-ingested SKUs keep theirs and
+-- bump updated_at instead
+ALTER TABLE products
+  MODIFY product_id INT NOT NULL AUTO_INCREMENT;
+
+-- This migration leaves local_infile alone. ingest_products.py loads with
+-- executemany by default; its opt-in --method load-data path needs a server
+-- that accepts LOAD DATA LOCAL, which is a server-wide security setting
+-- for the DBA to enable (and disable again) outside of migrations.
@@ -0,0 +1,310 @@
+"""Stream product feeds (CSV or JSONL, optionally .gz) into the products table.
+
+    python model/ingest_products.py amazon.csv flipkart.jsonl.gz
+                                    [--platform Amazon] [--chunk-size 50000]
+                                    [--method executemany|load-data] [--rejects bad.csv]
+
+Each feed is read --chunk-size rows at a time. A chunk is validated and
+completed with vectorised pandas operations (discounted_price is derived
+from discount_percent or the other way round), then upserted on sku: new
+SKUs get the next product_id, known SKUs are updated in place and their
+updated_at bumped, which `model_traning.py --incremental --cursor-column
+updated_at` picks up. Every chunk is committed on its own, so re-running a
+feed after a failure is safe. Needs migration_001_indexes.sql and
+migration_002_ingestion.sql.
+
+When rows were loaded, the vocabulary stamp file is touched so running
+app.py workers refresh their category/platform lists.
+
+--method load-data is an opt-in for large feeds: it bulk-loads each chunk
+with LOAD DATA LOCAL INFILE, which only works once the MySQL server has
+local_infile enabled. That lets every client read local files into the
+server, so no migration turns it on; enable it only for the duration of
+a bulk load (SET GLOBAL local_infile = 1, then back to 0) if your DBA
+agrees. The default, executemany, needs nothing beyond the migrations.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'Mehulmysql@90',
+    'database': 'project_smart'
+}
+
+VOCAB_STAMP_FILE = os.environ.get('VOCAB_STAMP_FILE', os.path.join(REPO_ROOT, 'vocabulary.stamp'))
+
+# Columns written for every product (product_id and updated_at are MySQL's)
+PRODUCT_COLUMNS = ['platform', 'sku', 'product_name', 'category', 'price',
+                   'discount_percent', 'discounted_price', 'rating', 'stock']
+NUMERIC_COLUMNS = ['price', 'discount_percent', 'discounted_price', 'rating', 'stock']
+
+# Feeds must provide these (platform may come from --platform instead);
+# discount_percent/discounted_price are derived from each other, stock defaults to 0
+REQUIRED_COLUMNS = ['sku', 'product_name', 'category', 'price', 'rating']
+
+# VARCHAR widths from project_smart.sql; longer names are truncated, longer
+# keys rejected
+MAX_LENGTHS = {'platform': 50, 'sku': 20, 'product_name': 255, 'category': 100}
+
+# discount_percent and discounted_price may disagree by this many points
+# (rounding in the feed) before a row is rejected
+DISCOUNT_TOLERANCE = 1.0
+
+UPSERT_ASSIGNMENTS = ', '.join(f"{col} = VALUES({col})" for col in PRODUCT_COLUMNS if col != 'sku')
+UPSERT_QUERY = (f"INSERT INTO products ({', '.join(PRODUCT_COLUMNS)}) "
+                f"VALUES ({', '.join(['%s'] * len(PRODUCT_COLUMNS))}) "
+                f"ON DUPLICATE KEY UPDATE {UPSERT_ASSIGNMENTS}")
+
+STAGING_TABLE = 'products_staging'
+
+def connect_to_database(method):
+    config = dict(DB_CONFIG)
+    if method == 'load-data':
+        config['allow_local_infile'] = True
+    return mysql.connector.connect(**config)
+
+def feed_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+def read_feed(path, chunk_size, fmt=None):
+    """Iterate over a feed as raw DataFrame chunks"""
+    if (fmt or feed_format(path)) == 'jsonl':
+        return pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    # Everything as text; clean_chunk parses numbers itself
+    return pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[''])
+
+def clean_chunk(chunk, platform=None):
+    """Validate one raw chunk.
+
+    Returns (rows ready for the DB in PRODUCT_COLUMNS order, rejected raw
+    rows with a 'reason' column, number of in-chunk duplicate SKUs dropped).
+    """
+    raw = chunk.rename(columns=lambda col: str(col).strip().lower())
+    if platform:
+        raw['platform'] = platform
+    missing = [col for col in REQUIRED_COLUMNS + ['platform'] if col not in raw.columns]
+    if missing:
+        raise ValueError(f"Feed is missing columns: {missing}")
+
+    df = pd.DataFrame(index=raw.index)
+    for col in MAX_LENGTHS:
+        df[col] = raw[col].astype('string').str.strip().replace('', pd.NA)
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(raw[col], errors='coerce') if col in raw.columns else np.nan
+    df['product_name'] = df['product_name'].str.slice(0, MAX_LENGTHS['product_name'])
+
+    # Derive whichever discount column is missing; a listing with neither
+    # is taken to be undiscounted
+    price = df['price']
+    given_percent = df['discount_percent']
+    no_discount = given_percent.isna() & df['discounted_price'].isna()
+    df['discount_percent'] = given_percent.mask(no_discount, 0)
+    df['discounted_price'] = df['discounted_price'].fillna(
+        (price * (1 - df['discount_percent'] / 100)).round(2))
+    implied_percent = (1 - df['discounted_price'] / price) * 100
+    df['discount_percent'] = df['discount_percent'].fillna(implied_percent.round())
+    df['stock'] = df['stock'].fillna(0)
+
+    # First failing check per row, in this order
+    checks = [
+        ('missing_sku', df['sku'].isna()),
+        ('sku_too_long', df['sku'].str.len() > MAX_LENGTHS['sku']),
+        ('missing_platform', df['platform'].isna()),
+        ('platform_too_long', df['platform'].str.len() > MAX_LENGTHS['platform']),
+        ('missing_category', df['category'].isna()),
+        ('category_too_long', df['category'].str.len() > MAX_LENGTHS['category']),
+        ('missing_name', df['product_name'].isna()),
+        ('bad_price', ~(price > 0)),
+        ('bad_discount', ~df['discount_percent'].between(0, 100)
+                         | ~df['discounted_price'].between(0, price)),
+        ('inconsistent_discount', (implied_percent - df['discount_percent']).abs() > DISCOUNT_TOLERANCE),
+        ('bad_rating', ~df['rating'].between(0, 5)),
+        ('bad_stock', ~(df['stock'] >= 0))
+    ]
+    reasons = np.select([mask.fillna(False).to_numpy(dtype=bool) for _, mask in checks],
+                        [name for name, _ in checks], default='')
+    rejected = raw[reasons != ''].assign(reason=reasons[reasons != ''])
+
+    df = df[reasons == '']
+    n_valid = len(df)
+    # Later rows of a feed win over earlier ones for the same SKU
+    df = df.drop_duplicates('sku', keep='last')
+
+    # Round before the integer cast, like the derived discount_percent above
+    df['discount_percent'] = df['discount_percent'].round()
+    df = df.astype({'price': float, 'discounted_price': float, 'rating': float,
+                    'discount_percent': np.int64, 'stock': np.int64})
+    df['price'] = df['price'].round(2)
+    df['discounted_price'] = df['discounted_price'].round(2)
+    df['rating'] = df['rating'].round(1)
+    return df[PRODUCT_COLUMNS], rejected, n_valid - len(df)
+
+def db_rows(df):
+    """Rows as tuples of plain Python values (the connector rejects numpy scalars)"""
+    return list(zip(*(df[col].tolist() for col in PRODUCT_COLUMNS)))
+
+def load_executemany(connection, df, batch_size):
+    """Upsert with executemany, which the connector sends as multi-row INSERTs"""
+    rows = db_rows(df)
+    cursor = connection.cursor()
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(UPSERT_QUERY, rows[start:start + batch_size])
+    connection.commit()
+    cursor.close()
+
+def load_data_infile(connection, df, batch_size=None):
+    """Bulk-load into a staging table with LOAD DATA LOCAL INFILE, then upsert from it"""
+    columns = ', '.join(PRODUCT_COLUMNS)
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as f:
+        df.to_csv(f, index=False, header=False, lineterminator='\n')
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} LIKE products")
+        cursor.execute(f"TRUNCATE TABLE {STAGING_TABLE}")
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {STAGING_TABLE} "
+            # to_csv quotes with "" and writes backslashes as they are
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            f"LINES TERMINATED BY '\\n' ({columns})", (f.name,))
+        cursor.execute(f"INSERT INTO products ({columns}) SELECT {columns} FROM {STAGING_TABLE} "
+                       f"ON DUPLICATE KEY UPDATE {UPSERT_ASSIGNMENTS}")
+        connection.commit()
+        cursor.close()
+    finally:
+        os.remove(f.name)
+
+LOADERS = {'executemany': load_executemany, 'load-data': load_data_infile}
+
+def touch_vocab_stamp(path=VOCAB_STAMP_FILE):
+    """Make app.py workers reload categories/platforms (see cache.TTLCache)"""
+    with open(path, 'a'):
+        os.utime(path, None)
+
+def ingest(paths, chunk_size=50000, batch_size=5000, method='executemany', platform=None,
+           fmt=None, rejects_path=None, dry_run=False):
+    """Load every feed in paths; returns a report dict with counts and timings"""
+    report = {
+        'method': 'dry-run' if dry_run else method,
+        'rows_read': 0,
+        'rows_loaded': 0,
+        'rows_rejected': 0,
+        'duplicate_skus': 0,
+        'reject_reasons': Counter(),
+        'seconds': {'read': 0.0, 'validate': 0.0, 'load': 0.0}
+    }
+    seconds = report['seconds']
+    load = LOADERS[method]
+    connection = None if dry_run else connect_to_database(method)
+    write_header = True
+    start = time.perf_counter()
+
+    try:
+        for path in paths:
+            print(f"\n📥 {path}")
+            chunks = read_feed(path, chunk_size, fmt)
+            while True:
+                t0 = time.perf_counter()
+                chunk = next(chunks, None)
+                t1 = time.perf_counter()
+                seconds['read'] += t1 - t0
+                if chunk is None:
+                    break
+
+                clean, rejected, duplicates = clean_chunk(chunk, platform)
+                t2 = time.perf_counter()
+                seconds['validate'] += t2 - t1
+
+                if not dry_run and len(clean):
+                    load(connection, clean, batch_size)
+                seconds['load'] += time.perf_counter() - t2
+
+                report['rows_read'] += len(chunk)
+                report['rows_loaded'] += len(clean)
+                report['rows_rejected'] += len(rejected)
+                report['duplicate_skus'] += duplicates
+                report['reject_reasons'].update(rejected['reason'])
+                if rejects_path and len(rejected):
+                    rejected.assign(feed=path).to_csv(rejects_path, mode='w' if write_header else 'a',
+                                                      header=write_header, index=False)
+                    write_header = False
+
+                elapsed = time.perf_counter() - start
+                print(f"   {report['rows_read']:>10,} read  {report['rows_loaded']:>10,} loaded  "
+                      f"{report['rows_rejected']:>8,} rejected  "
+                      f"({report['rows_read'] / elapsed:,.0f} rows/s)")
+    finally:
+        if connection is not None:
+            connection.close()
+
+    report['elapsed_seconds'] = time.perf_counter() - start
+    report['rows_per_second'] = report['rows_read'] / report['elapsed_seconds'] if report['elapsed_seconds'] else 0.0
+    report['reject_reasons'] = dict(report['reject_reasons'])
+
+    if not dry_run and report['rows_loaded']:
+        touch_vocab_stamp()
+    return report
+
+def print_report(report):
+    print("\n" + "="*70)
+    print("INGESTION REPORT")
+    print("="*70)
+    print(f"Method:          {report['method']}")
+    print(f"Rows read:       {report['rows_read']:,}")
+    loaded = 'Rows valid:  ' if report['method'] == 'dry-run' else 'Rows loaded: '
+    print(f"{loaded}    {report['rows_loaded']:,}")
+    print(f"Duplicate SKUs:  {report['duplicate_skus']:,} (last row kept)")
+    print(f"Rows rejected:   {report['rows_rejected']:,}")
+    for reason, count in sorted(report['reject_reasons'].items(), key=lambda item: -item[1]):
+        print(f"   - {reason}: {count:,}")
+
+    elapsed = report['elapsed_seconds']
+    print(f"\n⏱️  {elapsed:.2f} s total, {report['rows_per_second']:,.0f} rows/s")
+    for stage, stage_seconds in report['seconds'].items():
+        share = stage_seconds / elapsed * 100 if elapsed else 0.0
+        print(f"   {stage:<10}{stage_seconds:>9.2f} s  ({share:4.1f}%)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load CSV/JSONL product feeds into MySQL")
+    parser.add_argument('feeds', nargs='+', help="CSV or JSONL files (.gz allowed)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                        help="feed format (default: from the file extension)")
+    parser.add_argument('--platform', help="platform for every row (for single-platform feeds)")
+    parser.add_argument('--chunk-size', type=int, default=50000,
+                        help="rows read, validated and committed at a time")
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help="rows per executemany call")
+    parser.add_argument('--method', choices=sorted(LOADERS), default='executemany',
+                        help="load-data uses LOAD DATA LOCAL INFILE through a staging table "
+                             "(opt-in: needs local_infile enabled on the server)")
+    parser.add_argument('--rejects', help="write rejected rows and their reason to this CSV")
+    parser.add_argument('--dry-run', action='store_true', help="validate only, write nothing")
+    parser.add_argument('--json', help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        report = ingest(args.feeds, args.chunk_size, args.batch_size, args.method, args.platform,
+                        args.format, args.rejects, args.dry_run)
+    except (ValueError, OSError, mysql.connector.Error) as e:
+        sys.exit(f"❌ Ingestion failed: {e}")
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
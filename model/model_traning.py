@@ -1,6 +1,7 @@
 import mysql.connector
 import pandas as pd
 import numpy as np
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, RandomForestClassifier
@@ -8,8 +9,24 @@ from xgboost import XGBRegressor, XGBClassifier
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error, accuracy_score, classification_report
 import pickle
+import os
+import sys
+import time
+import copy
+import json
+from concurrent.futures import ProcessPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
+
+# Shared modules (model_bundle, ...) live next to app.py in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_bundle import (build_bundle, read_bundle, read_bundle_header, load_pickled_objects,
+                          export_estimator, legacy_pickles_version, LEGACY_PICKLES)
+from inference import check_parity
+from model_registry import ModelRegistry
+import features
+from intervals import QUANTILES, QUANTILE_PARAMS, predict_with_quantiles, coverage
+from prediction_lookup import lookup, off_grid_queries
  
 DB_CONFIG = {
     'host': 'localhost',
@@ -47,7 +64,141 @@ def load_data_from_db():
         print(f"❌ Error loading data: {e}")
         return None
 
+# Columns the models use; product_name, sku etc. are never read for training
+TRAINING_COLUMNS = ['platform', 'category', 'price', 'discount_percent',
+                    'discounted_price', 'rating', 'stock']
+
+# Narrow dtypes for training frames (prices fit float32 at 2 decimals)
+TRAINING_DTYPES = {
+    'price': np.float32,
+    'discounted_price': np.float32,
+    'discount_percent': np.int16,
+    'rating': np.float32,
+    'stock': np.int32,
+    'platform': 'category',
+    'category': 'category'
+}
+
+# Columns kept after preprocessing a chunk (everything the trainers read)
+PREPROCESSED_COLUMNS = ['price', 'discount_percent', 'rating', 'stock', 'price_range',
+                        'discount_effectiveness', 'high_discount', 'rating_category',
+                        'stock_status']
+
+def narrow_dtypes(df):
+    """Cast a products frame to the compact TRAINING_DTYPES"""
+    return df.astype({col: dtype for col, dtype in TRAINING_DTYPES.items() if col in df.columns})
+
+def iter_products(chunk_size=100000, columns=TRAINING_COLUMNS, where=None, params=()):
+    """Stream products as narrowed DataFrame chunks of at most chunk_size rows.
+    
+    Uses an unbuffered cursor, so MySQL streams rows as they are fetched
+    instead of the client materialising the whole result set.
+    """
+    connection = connect_to_database()
+    if connection is None:
+        return
+    
+    query = f"SELECT {', '.join(columns)} FROM products"
+    if where:
+        query += f" WHERE {where}"
+    
+    try:
+        cursor = connection.cursor(buffered=False)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield narrow_dtypes(pd.DataFrame.from_records(rows, columns=columns))
+        cursor.close()
+    finally:
+        connection.close()
+
+def add_features(df):
+    """Row-local feature engineering shared by both preprocessing paths.
+    
+    The binning lives in features.py so app.py computes exactly the same
+    values at prediction time.
+    """
+    # Feature engineering
+    df['price_range'] = features.price_range(df['price'].to_numpy())
+    
+    # Discount effectiveness
+    df['discount_effectiveness'] = features.discount_effectiveness(
+        df['price'].to_numpy(), df['discounted_price'].to_numpy())
+    
+    # High discount flag (>20%)
+    df['high_discount'] = features.high_discount(df['discount_percent'].to_numpy())
+    
+    # Rating category
+    df['rating_category'] = features.rating_category(df['rating'].to_numpy())
+    
+    # Stock status
+    df['stock_status'] = features.stock_status(df['stock'].to_numpy())
+    
+    return df
+
+def preprocess_chunks(chunks):
+    """preprocess_data() for an iterator of chunks (e.g. from iter_products).
+    
+    Each chunk is feature-engineered and reduced to PREPROCESSED_COLUMNS as
+    soon as it arrives, with platform/category held as small integer codes,
+    so the raw rows are never all in memory at once. The LabelEncoders are
+    fitted on the union of values seen, which gives the same encoding as
+    fitting them on the full table.
+    """
+    print("\n[Processing] Preprocessing data in chunks...")
+    
+    parts = []
+    vocab = {'platform': {}, 'category': {}}
+    total_rows = 0
+    
+    for chunk in chunks:
+        chunk = add_features(chunk)
+        part = chunk[PREPROCESSED_COLUMNS].astype({
+            'price_range': np.int8, 'high_discount': np.int8,
+            'rating_category': np.int8, 'stock_status': np.int8,
+            'discount_effectiveness': np.float32
+        })
+        
+        # Provisional codes in order of first appearance; remapped to the
+        # sorted LabelEncoder order once every value has been seen
+        for col in ('platform', 'category'):
+            values = chunk[col].astype('category')
+            mapping = np.array([vocab[col].setdefault(v, len(vocab[col]))
+                                for v in values.cat.categories], dtype=np.int32)
+            part[f'{col}_code'] = mapping[values.cat.codes.to_numpy()]
+        
+        parts.append(part)
+        total_rows += len(part)
+        print(f"  processed {total_rows} rows")
+    
+    if not parts:
+        return None, None
+    
+    df = pd.concat(parts, ignore_index=True)
+    del parts
+    
+    label_encoders = {}
+    for col in ('platform', 'category'):
+        encoder = LabelEncoder()
+        encoder.fit(list(vocab[col]))
+        remap = encoder.transform(list(vocab[col])).astype(np.int16)
+        df[f'{col}_encoded'] = remap[df.pop(f'{col}_code').to_numpy()]
+        label_encoders[col] = encoder
+    
+    le_platform, le_category = label_encoders['platform'], label_encoders['category']
+    print(f"✅ Preprocessing complete! Final shape: {df.shape} "
+          f"({df.memory_usage(deep=True).sum() / 1e6:.1f} MB)")
+    print(f"\nPlatform mapping: {dict(zip(le_platform.classes_, le_platform.transform(le_platform.classes_)))}")
+    print(f"Category mapping: {dict(zip(le_category.classes_, le_category.transform(le_category.classes_)))}")
+    
+    return df, label_encoders
+
 def preprocess_data(df):
+    if not isinstance(df, pd.DataFrame):
+        return preprocess_chunks(df)
+    
     print("\n[Processing] Preprocessing data...")
     
     # Create a copy to avoid modifying original
@@ -66,26 +217,7 @@ def preprocess_data(df):
     df['category_encoded'] = le_category.fit_transform(df['category'])
     label_encoders['category'] = le_category
     
-    # Feature engineering
-    df['price_range'] = pd.cut(df['price'], bins=[0, 1000, 5000, 15000, 30000, 100000], 
-                                labels=[0, 1, 2, 3, 4])
-    df['price_range'] = df['price_range'].astype(int)
-    
-    # Discount effectiveness
-    df['discount_effectiveness'] = (df['price'] - df['discounted_price']) / df['price']
-    
-    # High discount flag (>20%)
-    df['high_discount'] = (df['discount_percent'] > 20).astype(int)
-    
-    # Rating category
-    df['rating_category'] = pd.cut(df['rating'], bins=[0, 3.5, 4.0, 4.5, 5.0], 
-                                    labels=[0, 1, 2, 3])
-    df['rating_category'] = df['rating_category'].astype(int)
-    
-    # Stock status
-    df['stock_status'] = pd.cut(df['stock'], bins=[0, 50, 150, 300, 500], 
-                                 labels=[0, 1, 2, 3])
-    df['stock_status'] = df['stock_status'].astype(int)
+    df = add_features(df)
     
     print(f"✅ Preprocessing complete! Final shape: {df.shape}")
     print(f"\nPlatform mapping: {dict(zip(le_platform.classes_, le_platform.transform(le_platform.classes_)))}")
@@ -93,8 +225,85 @@ def preprocess_data(df):
     
     return df, label_encoders
 
-def train_discount_model(df, label_encoders):
-    """Train model to predict discount percentage"""
+def set_threads(model, n_threads):
+    """Let estimators that support it (n_jobs) use n_threads threads"""
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=n_threads)
+    return model
+
+def fit_candidate(name, model, X_train, y_train, X_test, y_test):
+    """Fit and score one candidate model; runs in a worker process when parallel"""
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    
+    y_pred = model.predict(X_test)
+    
+    mse = mean_squared_error(y_test, y_pred)
+    scores = {
+        'rmse': np.sqrt(mse),
+        'mae': mean_absolute_error(y_test, y_pred),
+        'r2': r2_score(y_test, y_pred),
+        'fit_seconds': fit_seconds
+    }
+    
+    # Predict single-threaded once trained: multithreaded forests add tree
+    # outputs in whatever order threads finish, which is not reproducible
+    set_threads(model, None)
+    return name, model, scores
+
+def fit_all(named_models, X_train, y_train, X_test, y_test, n_workers):
+    """fit_candidate for each (name, model), concurrently when n_workers > 1"""
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(fit_candidate, name, model, X_train, y_train, X_test, y_test)
+                       for name, model in named_models]
+            # Collect in submission order so ties resolve as in a serial run
+            return [future.result() for future in futures]
+    
+    results = []
+    for name, model in named_models:
+        print(f"\nTraining {name}...")
+        results.append(fit_candidate(name, model, X_train, y_train, X_test, y_test))
+    return results
+
+def train_quantile_models(name, model, X_train, y_train, X_test, y_test, n_workers=1, n_threads=None):
+    """Quantile-loss variants of a boosted discount model, one per QUANTILE.
+    
+    Returns None for models that need none (Random Forest intervals come from
+    its trees) or cannot have them (Linear Regression). Prints how often the
+    test discounts fall inside the resulting p10-p90 interval.
+    """
+    quantile_models = None
+    params = QUANTILE_PARAMS.get(type(model).__name__)
+    if params is not None:
+        variants = [(f"{name} (q={q})", set_threads(clone(model).set_params(**params(q)), n_threads))
+                    for q in QUANTILES]
+        n_workers = max(1, min(n_workers, len(variants)))
+        quantile_models = [variant for _, variant, _ in fit_all(variants, X_train, y_train,
+                                                                X_test, y_test, n_workers)]
+    
+    _, quantiles = predict_with_quantiles(model, quantile_models, X_test)
+    if quantiles is None:
+        print(f"\n⚠️ {name} gives no discount intervals")
+        return None
+    
+    quantiles = np.sort(quantiles, axis=1)
+    width = quantiles[:, -1] - quantiles[:, 0]
+    print(f"\n📏 Discount intervals (p{QUANTILES[0] * 100:.0f}-p{QUANTILES[-1] * 100:.0f}): "
+          f"{coverage(y_test, quantiles):.1%} of test discounts inside "
+          f"(nominal {QUANTILES[-1] - QUANTILES[0]:.0%}), median width {np.median(width):.2f} points")
+    return quantile_models
+
+def train_discount_model(df, label_encoders, n_workers=1, n_threads=None):
+    """Train model to predict discount percentage.
+    
+    With n_workers > 1 the candidates are fitted concurrently in a process
+    pool. Each estimator that supports it also gets n_threads threads
+    (default: CPU count divided by the number of workers). If a boosted
+    model wins, its quantile variants for the prediction intervals are
+    trained too (see intervals.py).
+    """
     print("\n" + "="*70)
     print("TRAINING DISCOUNT PREDICTION MODEL (Regression)")
     print("="*70)
@@ -124,36 +333,46 @@ def train_discount_model(df, label_encoders):
         'XGBoost': XGBRegressor(n_estimators=100, random_state=42, max_depth=6, learning_rate=0.1)
     }
     
+    n_workers = max(1, min(n_workers, len(models)))
+    n_threads = n_threads or max(1, (os.cpu_count() or 1) // n_workers)
+    for model in models.values():
+        set_threads(model, n_threads)
+    
+    start = time.perf_counter()
+    if n_workers > 1:
+        print(f"\nTraining {len(models)} candidates in {n_workers} processes "
+              f"({n_threads} threads each)...")
+    results = fit_all(models.items(), X_train_scaled, y_train, X_test_scaled, y_test, n_workers)
+    total_seconds = time.perf_counter() - start
+    
     best_model = None
     best_score = -float('inf')
     best_name = ""
     
-    for name, model in models.items():
-        print(f"\nTraining {name}...")
-        model.fit(X_train_scaled, y_train)
-        
-        y_pred = model.predict(X_test_scaled)
-        
-        mse = mean_squared_error(y_test, y_pred)
-        rmse = np.sqrt(mse)
-        mae = mean_absolute_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
-        
-        print(f"  RMSE: {rmse:.4f}")
-        print(f"  MAE: {mae:.4f}")
+    for name, model, scores in results:
+        r2 = scores['r2']
+        print(f"\n{name}:")
+        print(f"  RMSE: {scores['rmse']:.4f}")
+        print(f"  MAE: {scores['mae']:.4f}")
         print(f"  R² Score: {r2:.4f}")
+        print(f"  Fit time: {scores['fit_seconds']:.2f}s")
         
         if r2 > best_score:
             best_score = r2
             best_model = model
             best_name = name
     
+    print(f"\n⏱️ Candidates trained in {total_seconds:.2f}s wall time "
+          f"({sum(r[2]['fit_seconds'] for r in results):.2f}s of fitting)")
     print(f"\n🏆 Best Discount Model: {best_name} (R² = {best_score:.4f})")
     
-    return best_model, scaler, feature_cols, best_name
+    quantile_models = train_quantile_models(best_name, best_model, X_train_scaled, y_train,
+                                            X_test_scaled, y_test, n_workers, n_threads)
+    
+    return best_model, scaler, feature_cols, best_name, quantile_models
 
-def train_platform_model(df, label_encoders):
-    """Train model to predict best platform"""
+def train_platform_model(df, label_encoders, n_threads=None):
+    """Train model to predict best platform (n_threads: forest threads, default all cores)"""
     print("\n" + "="*70)
     print("TRAINING PLATFORM PREDICTION MODEL (Classification)")
     print("="*70)
@@ -176,13 +395,19 @@ def train_platform_model(df, label_encoders):
     X_test_scaled = scaler.transform(X_test)
     
     # Train Random Forest (best for multi-class classification)
-    model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10)
+    model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10,
+                                   n_jobs=n_threads or os.cpu_count())
     
     print("\nTraining Random Forest Classifier...")
+    start = time.perf_counter()
     model.fit(X_train_scaled, y_train)
+    print(f"  Fit time: {time.perf_counter() - start:.2f}s")
     
     y_pred = model.predict(X_test_scaled)
     
+    # Predict single-threaded from here on (reproducible tree summation)
+    set_threads(model, None)
+    
     accuracy = accuracy_score(y_test, y_pred)
     print(f"  Accuracy: {accuracy:.4f}")
     print(f"\nClassification Report:")
@@ -192,7 +417,8 @@ def train_platform_model(df, label_encoders):
     return model, scaler, feature_cols
 
 def save_models(discount_model, discount_scaler, discount_features, discount_name,
-                platform_model, platform_scaler, platform_features, label_encoders):
+                platform_model, platform_scaler, platform_features, label_encoders,
+                discount_quantile_models=None):
     """Save all trained models and preprocessing objects"""
     print("\n[Saving] Saving models and encoders...")
     
@@ -209,6 +435,10 @@ def save_models(discount_model, discount_scaler, discount_features, discount_nam
         pickle.dump(discount_features, f)
     print("✅ Discount features saved: discount_features.pkl")
     
+    with open('discount_quantile_models.pkl', 'wb') as f:
+        pickle.dump(discount_quantile_models, f)
+    print("✅ Discount quantile models saved: discount_quantile_models.pkl")
+    
     # Save platform prediction model
     with open('platform_model.pkl', 'wb') as f:
         pickle.dump(platform_model, f)
@@ -235,38 +465,478 @@ def save_models(discount_model, discount_scaler, discount_features, discount_nam
     with open('model_metadata.pkl', 'wb') as f:
         pickle.dump(metadata, f)
     print("✅ Model metadata saved: model_metadata.pkl")
+    
+    # Save everything again as one memory-mappable bundle (loaded by app.py)
+    model_version = build_bundle('models.bundle', discount_model, discount_scaler,
+                                 discount_features, discount_name, platform_model,
+                                 platform_scaler, platform_features, label_encoders,
+                                 discount_quantile_models)
+    print(f"✅ Model bundle saved: models.bundle (version {model_version})")
+    
+    # The app serves the bundle through inference.py; make sure it agrees
+    failures = check_parity(*read_bundle('models.bundle'))
+    if failures:
+        print(f"⚠️ Native inference differs from the trained models: {', '.join(failures)}")
+        print("   Set NATIVE_INFERENCE=0 for app.py to use the pickled models instead")
+    else:
+        print("✅ Native inference parity check passed")
+    
+    return model_version
+
+# Budget range covered by the compiled table (matches the predict form)
+TABLE_MIN_BUDGET = 100
+TABLE_MAX_BUDGET = 100000
+
+def build_budget_grid(n_points=512, breakpoints=()):
+    """Log-spaced budget grid that never interpolates across a price_range edge
+    or a model split (breakpoints, see split_budgets)"""
+    grid = np.geomspace(TABLE_MIN_BUDGET, TABLE_MAX_BUDGET, n_points)
+    edges = np.array(features.PRICE_RANGE_BINS[1:-1], dtype=float)
+    # Bins are right-closed: add each edge and the smallest value above it,
+    # so both sides of every price_range step are grid points
+    grid = np.concatenate([grid, edges, np.nextafter(edges, np.inf), breakpoints])
+    return np.unique(grid)
+
+def split_budgets(model, scaler, model_features):
+    """Budgets at which a tree model's prediction can change.
+    
+    For every split on price, the smallest budget in the table range that
+    goes to the right child once scaled and cast to float32 exactly as at
+    serving time. Found by bisection, so scaler rounding cannot misplace it.
+    Linear models (and models without a price feature) have none.
+    """
+    arrays, meta = export_estimator('model', model)
+    if meta['kind'] == 'linear' or 'price' not in model_features:
+        return np.empty(0)
+    
+    j = list(model_features).index('price')
+    thresholds = np.unique(arrays['model.threshold'][arrays['model.feature'] == j])
+    mean, scale = scaler.mean_[j], scaler.scale_[j]
+    
+    def goes_right(budget):
+        x = ((budget - mean) / scale).astype(np.float32).astype(np.float64)
+        return x > thresholds if meta['split_rule'] == 'le' else x >= thresholds
+    
+    lo = np.full(len(thresholds), float(TABLE_MIN_BUDGET))
+    hi = np.full(len(thresholds), float(TABLE_MAX_BUDGET))
+    inside = ~goes_right(lo) & goes_right(hi)
+    # Invariant: lo goes left, hi goes right; 64 halvings reach adjacent floats
+    for _ in range(64):
+        mid = lo + (hi - lo) / 2
+        right = goes_right(mid)
+        hi = np.where(right, mid, hi)
+        lo = np.where(right, lo, mid)
+    return np.unique(hi[inside])
+
+def compile_prediction_table(discount_model, discount_scaler, discount_features,
+                             platform_model, platform_scaler, platform_features,
+                             label_encoders, n_points=512, discount_quantile_models=None):
+    """Evaluate both models (and the discount intervals) over the category x platform x budget grid.
+    
+    Tree models are piecewise constant in the budget. With all their split
+    budgets on the grid, the value at the grid point at or below a budget is
+    exactly what they predict for it, so the table is looked up without
+    interpolating. Only a linear discount model is interpolated, which is
+    exact within a price_range bin.
+    """
+    print("\n[Compiling] Building prediction lookup table...")
+    
+    categories = label_encoders['category'].classes_
+    platforms = label_encoders['platform'].classes_
+    tree_models = [(model, discount_scaler, discount_features)
+                   for model in [discount_model] + list(discount_quantile_models or [])]
+    tree_models.append((platform_model, platform_scaler, platform_features))
+    budgets = build_budget_grid(n_points, np.concatenate([split_budgets(*m) for m in tree_models]))
+    n_cat, n_plat, n_budget = len(categories), len(platforms), len(budgets)
+    
+    # Platform model: one row per (category, budget)
+    platform_X = features.feature_matrix(platform_features, features.serving_columns(
+        np.repeat(np.arange(n_cat), n_budget), np.tile(budgets, n_cat)
+    ), n_cat * n_budget)
+    platform_proba = platform_model.predict_proba(platform_scaler.transform(platform_X))
+    auto_platform = platform_model.classes_[platform_proba.argmax(axis=1)]
+    auto_confidence = platform_proba.max(axis=1) * 100
+    
+    # Discount model: one row per (category, platform, budget)
+    n_rows = n_cat * n_plat * n_budget
+    discount_X = features.feature_matrix(discount_features, features.serving_columns(
+        np.repeat(np.arange(n_cat), n_plat * n_budget),
+        np.tile(budgets, n_cat * n_plat),
+        np.tile(np.repeat(np.arange(n_plat), n_budget), n_cat)
+    ), n_rows)
+    discount, quantiles = predict_with_quantiles(discount_model, discount_quantile_models,
+                                                 discount_scaler.transform(discount_X))
+    
+    table = {
+        'categories': np.asarray(categories, dtype=str),
+        'platforms': np.asarray(platforms, dtype=str),
+        'budgets': budgets,
+        'auto_platform': auto_platform.reshape(n_cat, n_budget).astype(np.int8),
+        # Kept in float64: a lookup returns the model's own values
+        'auto_confidence': auto_confidence.reshape(n_cat, n_budget),
+        'discount': discount.reshape(n_cat, n_plat, n_budget),
+        'interpolate': np.array(type(discount_model).__name__ == 'LinearRegression')
+    }
+    if quantiles is not None:
+        table['discount_quantiles'] = quantiles.reshape(n_cat, n_plat, n_budget, len(QUANTILES))
+    
+    error, platform_mismatch = measure_table_error(table, discount_model, discount_scaler, discount_features,
+                                                   platform_model, platform_scaler, platform_features)
+    # app.py refuses tables whose max error is above PREDICTION_TABLE_MAX_ERROR
+    table['interpolation_error'] = np.array([error.mean(), error.max()])
+    
+    print(f"✅ Table compiled: {n_cat} categories x {n_plat} platforms x {n_budget} budgets")
+    print(f"  Lookup error between grid points (discount %): mean {error.mean():.4f}, max {error.max():.4f}")
+    print(f"  Auto platform differs from the model for {platform_mismatch:.2%} of budgets")
+    
+    return table
+
+def measure_table_error(table, discount_model, discount_scaler, discount_features,
+                        platform_model, platform_scaler, platform_features):
+    """Compare the table lookup app.py serves with the live models between grid points.
+    
+    Returns (absolute discount error of every off-grid query, fraction of
+    queries without a platform where the table picks another platform).
+    """
+    category_encoded, budgets, platform_encoded, given = off_grid_queries(table)
+    served_platform, _, served_discount, _ = lookup(table, category_encoded, budgets, platform_encoded, given)
+    
+    # Same steps as app.score_with_models
+    auto = np.flatnonzero(~given)
+    platform_proba = platform_model.predict_proba(platform_scaler.transform(features.feature_matrix(
+        platform_features, features.serving_columns(category_encoded[auto], budgets[auto]), len(auto)
+    )))
+    live_platform = platform_encoded.copy()
+    live_platform[auto] = platform_model.classes_[platform_proba.argmax(axis=1)]
+    live_discount = discount_model.predict(discount_scaler.transform(features.feature_matrix(
+        discount_features, features.serving_columns(category_encoded, budgets, live_platform), len(budgets)
+    )))
+    
+    # Both are clipped to 0-50 before they are served
+    error = np.abs(np.clip(served_discount, 0, 50) - np.clip(live_discount, 0, 50))
+    platform_mismatch = np.mean(served_platform[auto] != live_platform[auto]) if len(auto) else 0.0
+    return error, platform_mismatch
+
+def save_prediction_table(table, path='prediction_table.npz', model_version=None):
+    """Save the compiled lookup table as plain NumPy arrays.
+    
+    model_version (the models.bundle version the table was compiled from)
+    is stored with it; app.py will not serve the table with other models.
+    """
+    if model_version is not None:
+        table = dict(table, model_version=np.array(model_version))
+    np.savez(path, **table)
+    print(f"✅ Prediction table saved: {path}")
+
+def load_saved_models():
+    """Fitted objects from models.bundle, or from the separate pickles"""
+    if os.path.exists('models.bundle'):
+        return load_pickled_objects(read_bundle('models.bundle')[1])
+    
+    objects = {}
+    for name in LEGACY_PICKLES:
+        # discount_quantile_models.pkl is missing for models saved before it existed
+        if name == 'discount_quantile_models' and not os.path.exists(f'{name}.pkl'):
+            continue
+        with open(f'{name}.pkl', 'rb') as f:
+            objects[name] = pickle.load(f)
+    return objects
+
+def compile_from_saved_models(n_points=512):
+    """Rebuild prediction_table.npz from the models already on disk"""
+    objects = load_saved_models()
+    
+    table = compile_prediction_table(
+        objects['discount_model'], objects['discount_scaler'], objects['discount_features'],
+        objects['platform_model'], objects['platform_scaler'], objects['platform_features'],
+        objects['label_encoders'], n_points, objects.get('discount_quantile_models')
+    )
+    # The version app.py checks the table against: the bundle's, or one
+    # derived from the pickles when there is no bundle
+    if os.path.exists('models.bundle'):
+        model_version = read_bundle_header('models.bundle')['model_version']
+    else:
+        model_version = legacy_pickles_version('.')
+    save_prediction_table(table, model_version=model_version)
+
+def publish_models(model_version):
+    """Publish the saved bundle and table as a new registry version"""
+    registry = ModelRegistry()
+    version = registry.publish(['models.bundle', 'prediction_table.npz'], model_version)
+    print(f"✅ Published model version {version} to {registry.root}/ "
+          f"(running app.py workers pick it up automatically)")
+    return version
+
+# Incremental training state: how far into products the models have seen
+TRAINING_STATE_FILE = 'training_state.json'
+CURSOR_COLUMNS = ('product_id', 'updated_at')
+
+def load_training_state():
+    try:
+        with open(TRAINING_STATE_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_training_state(cursor_column, high_water_mark, rows, mode):
+    state = load_training_state() or {}
+    state.update({
+        'cursor_column': cursor_column,
+        'high_water_mark': high_water_mark,
+        'last_run': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'last_mode': mode,
+        'rows_seen': state.get('rows_seen', 0) + rows if mode == 'incremental' else rows
+    })
+    with open(TRAINING_STATE_FILE, 'w') as f:
+        json.dump(state, f, indent=2)
+    print(f"✅ Training state saved: {cursor_column} high-water mark = {high_water_mark}")
+
+def track_high_water_mark(chunks, column, mark):
+    """Pass chunks through, recording the largest value of column in mark['value']"""
+    for chunk in chunks:
+        if len(chunk):
+            value = chunk[column].max()
+            value = value.isoformat(sep=' ') if hasattr(value, 'isoformat') else value.item()
+            if mark.get('value') is None or value > mark['value']:
+                mark['value'] = value
+        yield chunk
+
+def extend_label_encoder(encoder, values):
+    """Copy of a fitted LabelEncoder with unseen values appended to classes_.
+    
+    Appending (rather than re-sorting) keeps every existing code unchanged,
+    so already-trained trees keep their meaning. classes_ is then no longer
+    sorted: use the position in classes_ as the code, not encoder.transform.
+    """
+    encoder = copy.deepcopy(encoder)
+    known = set(encoder.classes_)
+    new_values = sorted(set(values) - known)
+    if new_values:
+        encoder.classes_ = np.concatenate([encoder.classes_, np.asarray(new_values, dtype=object)])
+    return encoder, new_values
 
-def main():
+def encode_with(encoder, values):
+    """Codes for values by position in encoder.classes_ (works for unsorted classes_)"""
+    index = {v: i for i, v in enumerate(encoder.classes_)}
+    return np.asarray([index[v] for v in values], dtype=np.int16)
+
+def update_model(model, X, y, extra_trees, sample_weight=None):
+    """Continue training a fitted model on new rows.
+    
+    Forests and gradient boosting grow extra_trees more trees via
+    warm_start, XGBoost continues boosting from its booster. Returns the
+    updated copy, or None for models that cannot be updated incrementally.
+    """
+    name = type(model).__name__
+    
+    if name in ('RandomForestRegressor', 'RandomForestClassifier', 'GradientBoostingRegressor'):
+        model = copy.deepcopy(model)
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_trees)
+        model.fit(X, y, sample_weight=sample_weight)
+        model.set_params(warm_start=False)
+        return model
+    
+    if name == 'XGBRegressor':
+        updated = XGBRegressor(**model.get_params())
+        updated.set_params(n_estimators=extra_trees)
+        updated.fit(X, y, sample_weight=sample_weight, xgb_model=model.get_booster())
+        return updated
+    
+    return None
+
+def pad_missing_classes(X, y, classes):
+    """X, y and sample weights with one zero-weight row for each class in classes that y lacks.
+    
+    A warm-started forest must see exactly the classes it was trained on.
+    The padding rows make fit() keep the full class set (and the leaf
+    value layout). Zero weight keeps them out of the impurity and leaf
+    values, so the new trees give the missing classes probability 0. They
+    are still counted by min_samples_split/min_samples_leaf and bootstrap
+    draws, so the new trees can differ slightly from an unpadded fit
+    (tests/test_incremental.py checks what the update relies on).
+    """
+    y = np.asarray(y)
+    missing = [c for c in classes if c not in set(y.tolist())]
+    weights = np.ones(len(y))
+    if not missing:
+        return X, y, weights
+    X = np.vstack([X, np.repeat(X[:1], len(missing), axis=0)])
+    y = np.concatenate([y, np.asarray(missing, dtype=y.dtype)])
+    return X, y, np.concatenate([weights, np.zeros(len(missing))])
+
+def report_scaler_drift(name, scaler, X, features):
+    """Print features whose mean moved noticeably, using partial_fit on a copy"""
+    updated = copy.deepcopy(scaler).partial_fit(X)
+    shift = (updated.mean_ - scaler.mean_) / scaler.scale_
+    drifted = [f"{feature} ({s:+.2f} sd)" for feature, s in zip(features, shift) if abs(s) > 0.1]
+    if drifted:
+        print(f"  ⚠️ {name} feature drift: {', '.join(drifted)} "
+              f"- consider a full retrain")
+
+def incremental_update(table_points=512, chunk_size=100000, extra_trees=10):
+    """Update the saved models with products past the stored high-water mark"""
     print("="*70)
-    print("PRODUCT DISCOUNT & PLATFORM PREDICTOR - ML MODEL TRAINING")
+    print("PRODUCT DISCOUNT & PLATFORM PREDICTOR - INCREMENTAL TRAINING")
     print("="*70)
     
-    # Step 1: Load data
-    print("\n[1/4] Loading data from database...")
-    df = load_data_from_db()
+    state = load_training_state()
+    if state is None:
+        print(f"❌ No {TRAINING_STATE_FILE} found. Run a full training first.")
+        return
+    
+    cursor_column = state['cursor_column']
+    high_water_mark = state['high_water_mark']
     
-    if df is None or len(df) == 0:
-        print("❌ No data available. Please ensure products table has data.")
+    # Step 1: Load only the new/changed rows
+    print(f"\n[1/4] Loading products with {cursor_column} > {high_water_mark}...")
+    mark = {'value': high_water_mark}
+    chunks = iter_products(chunk_size, TRAINING_COLUMNS + [cursor_column],
+                           where=f"{cursor_column} > %s", params=(high_water_mark,))
+    parts = list(track_high_water_mark(chunks, cursor_column, mark))
+    
+    if not parts:
+        print("✅ No new products since the last run, models are up to date.")
         return
     
-    print(f"Loaded {len(df)} products from database")
+    delta = add_features(pd.concat(parts, ignore_index=True))
+    print(f"Loaded {len(delta)} new/changed products")
+    
+    # Step 2: Encode with the existing encoders, appending unseen labels
+    print("\n[2/4] Encoding new rows...")
+    objects = load_saved_models()
+    label_encoders = {}
+    for col in ('platform', 'category'):
+        values = delta[col].astype(str).tolist()
+        label_encoders[col], new_values = extend_label_encoder(objects['label_encoders'][col], values)
+        delta[f'{col}_encoded'] = encode_with(label_encoders[col], values)
+        if new_values:
+            print(f"  New {col} values: {new_values}")
+    
+    # Step 3: Continue training both models on the new rows. The scalers stay
+    # fixed: existing trees split on scaled values, so changing mean/scale
+    # would silently move every learned threshold.
+    print("\n[3/4] Updating models...")
+    discount_model, discount_name = objects['discount_model'], objects['model_metadata']['discount_model_name']
+    discount_scaler, discount_features = objects['discount_scaler'], objects['discount_features']
+    platform_model, platform_scaler = objects['platform_model'], objects['platform_scaler']
+    platform_features = objects['platform_features']
+    
+    X_discount = discount_scaler.transform(delta[discount_features].to_numpy(dtype=float))
+    report_scaler_drift('Discount', discount_scaler, delta[discount_features].to_numpy(dtype=float),
+                        discount_features)
+    y_discount = delta['discount_percent']
+    mae_before = mean_absolute_error(y_discount, discount_model.predict(X_discount))
+    updated = update_model(discount_model, X_discount, y_discount, extra_trees)
+    if updated is None:
+        print(f"  ⚠️ {discount_name} cannot be updated incrementally, keeping it unchanged")
+    else:
+        discount_model = updated
+        mae_after = mean_absolute_error(y_discount, discount_model.predict(X_discount))
+        print(f"  ✅ {discount_name} updated with {len(delta)} rows "
+              f"(MAE on new rows {mae_before:.2f} -> {mae_after:.2f})")
+    
+    # Quantile variants follow the model they bracket
+    discount_quantile_models = objects.get('discount_quantile_models')
+    if discount_quantile_models and updated is not None:
+        discount_quantile_models = [update_model(model, X_discount, y_discount, extra_trees)
+                                    for model in discount_quantile_models]
+        print(f"  ✅ {len(discount_quantile_models)} discount quantile models updated")
+    
+    X_platform = platform_scaler.transform(delta[platform_features].to_numpy(dtype=float))
+    report_scaler_drift('Platform', platform_scaler, delta[platform_features].to_numpy(dtype=float),
+                        platform_features)
+    y_platform = delta['platform_encoded']
+    delta_platforms = set(np.unique(y_platform).tolist())
+    unseen = delta_platforms - set(platform_model.classes_.tolist())
+    if unseen:
+        print("  ⚠️ New rows contain platforms the model has never seen; platform model "
+              "kept unchanged (run a full training to learn new platforms)")
+    elif len(delta_platforms) < 2:
+        # Trees grown on a single class can only ever vote for it
+        print("  ⚠️ New rows cover a single platform, nothing to learn from; "
+              "platform model kept unchanged")
+    else:
+        # Deltas usually cover only some platforms (e.g. one platform's
+        # ingest): pad the others in with zero weight
+        X_padded, y_padded, weights = pad_missing_classes(X_platform, y_platform, platform_model.classes_)
+        platform_model = update_model(platform_model, X_padded, y_padded, extra_trees, weights)
+        print(f"  ✅ Platform model updated with {len(delta)} rows "
+              f"({len(delta_platforms)} of {len(platform_model.classes_)} platforms)")
+    
+    # Step 4: Save, compile and publish like a full run
+    print("\n[4/4] Saving models...")
+    model_version = save_models(discount_model, discount_scaler, discount_features, discount_name,
+                                platform_model, platform_scaler, platform_features, label_encoders,
+                                discount_quantile_models)
+    table = compile_prediction_table(discount_model, discount_scaler, discount_features,
+                                     platform_model, platform_scaler, platform_features,
+                                     label_encoders, table_points, discount_quantile_models)
+    save_prediction_table(table, model_version=model_version)
+    publish_models(model_version)
+    save_training_state(cursor_column, mark['value'], len(delta), 'incremental')
+    
+    print("\n✅ INCREMENTAL UPDATE COMPLETED")
+
+def main(table_points=512, chunk_size=100000, n_workers=1, n_threads=None,
+         cursor_column='product_id'):
+    print("="*70)
+    print("PRODUCT DISCOUNT & PLATFORM PREDICTOR - ML MODEL TRAINING")
+    print("="*70)
     
-    # Step 2: Preprocess data
-    print("\n[2/4] Preprocessing data...")
-    df, label_encoders = preprocess_data(df)
+    # Step 1: Load data
+    print("\n[1/4] Loading data from database...")
+    mark = {'value': None}
+    if chunk_size:
+        # Steps 1 and 2 together: each chunk is preprocessed as it streams in
+        chunks = iter_products(chunk_size, TRAINING_COLUMNS + [cursor_column])
+        df, label_encoders = preprocess_data(track_high_water_mark(chunks, cursor_column, mark))
+        
+        if df is None or len(df) == 0:
+            print("❌ No data available. Please ensure products table has data.")
+            return
+        
+        print(f"Loaded {len(df)} products from database")
+    else:
+        df = load_data_from_db()
+        
+        if df is None or len(df) == 0:
+            print("❌ No data available. Please ensure products table has data.")
+            return
+        
+        print(f"Loaded {len(df)} products from database")
+        list(track_high_water_mark([df], cursor_column, mark))
+        
+        # Step 2: Preprocess data
+        print("\n[2/4] Preprocessing data...")
+        df, label_encoders = preprocess_data(df)
     
     # Step 3: Train discount prediction model
     print("\n[3/4] Training discount prediction model...")
-    discount_model, discount_scaler, discount_features, discount_name = train_discount_model(df, label_encoders)
+    discount_model, discount_scaler, discount_features, discount_name, discount_quantile_models = \
+        train_discount_model(df, label_encoders, n_workers, n_threads)
     
     # Train platform prediction model
     print("\n[3/4] Training platform prediction model...")
-    platform_model, platform_scaler, platform_features = train_platform_model(df, label_encoders)
+    platform_model, platform_scaler, platform_features = train_platform_model(
+        df, label_encoders, n_threads)
     
     # Step 4: Save models
     print("\n[4/4] Saving models...")
-    save_models(discount_model, discount_scaler, discount_features, discount_name,
-                platform_model, platform_scaler, platform_features, label_encoders)
+    model_version = save_models(discount_model, discount_scaler, discount_features, discount_name,
+                                platform_model, platform_scaler, platform_features, label_encoders,
+                                discount_quantile_models)
+    
+    # Compile lookup table served by app.py
+    table = compile_prediction_table(discount_model, discount_scaler, discount_features,
+                                     platform_model, platform_scaler, platform_features,
+                                     label_encoders, table_points, discount_quantile_models)
+    save_prediction_table(table, model_version=model_version)
+    
+    # Publish bundle + table together so app.py can hot-swap them
+    publish_models(model_version)
+    
+    # Remember how far we got, for --incremental runs
+    save_training_state(cursor_column, mark['value'], len(df), 'full')
     
     # Summary
     print("\n" + "="*70)
@@ -279,13 +949,41 @@ def main():
     print(f"   - discount_model.pkl")
     print(f"   - discount_scaler.pkl")
     print(f"   - discount_features.pkl")
+    print(f"   - discount_quantile_models.pkl")
     print(f"   - platform_model.pkl")
     print(f"   - platform_scaler.pkl")
     print(f"   - platform_features.pkl")
     print(f"   - label_encoders.pkl")
     print(f"   - model_metadata.pkl")
+    print(f"   - prediction_table.npz")
+    print(f"   - models.bundle")
     print("\n✨ You can now run the Flask app with: python app.py")
 
 if __name__ == "__main__":
-
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Train discount and platform models")
+    parser.add_argument('--compile-only', action='store_true',
+                        help="only rebuild prediction_table.npz from the saved models")
+    parser.add_argument('--table-points', type=int, default=512,
+                        help="number of log-spaced budgets in the lookup table")
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help="rows per streamed chunk (0 loads the whole table at once)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="train the discount model candidates in this many processes")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="threads per estimator (default: CPU count / workers)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="update the saved models with products added since the last run")
+    parser.add_argument('--incremental-trees', type=int, default=10,
+                        help="trees/boosting rounds added per incremental update")
+    parser.add_argument('--cursor-column', choices=CURSOR_COLUMNS, default='product_id',
+                        help="column tracking new rows (updated_at also catches changed rows)")
+    args = parser.parse_args()
+    
+    if args.compile_only:
+        compile_from_saved_models(args.table_points)
+    elif args.incremental:
+        incremental_update(args.table_points, args.chunk_size, args.incremental_trees)
+    else:
+        main(args.table_points, args.chunk_size, args.workers, args.threads, args.cursor_column)
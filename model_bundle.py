@@ -0,0 +1,351 @@
+"""Single-file, memory-mappable model bundle.
+
+Layout of models.bundle:
+
+    8 bytes   magic b'SSABNDL\\0'
+    4 bytes   format version (little-endian uint32)
+    4 bytes   header length N (little-endian uint32)
+    N bytes   JSON header: metadata + {name: {dtype, shape, offset}} per array
+    ...       raw little-endian array data, each array 64-byte aligned
+
+Fitted estimators are exported as flat NumPy arrays (tree nodes, linear
+coefficients, scaler mean/scale) so the file can be np.memmap'ed: forked
+workers then share the same page-cache pages instead of each holding an
+unpickled copy; inference.py evaluates them directly. A pickle of the
+original objects is kept alongside for the parity check and for
+NATIVE_INFERENCE=0.
+"""
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import struct
+
+import numpy as np
+
+MAGIC = b'SSABNDL\0'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# The separate .pkl files older versions of the trainer wrote instead of a bundle
+LEGACY_PICKLES = ['discount_model', 'discount_scaler', 'discount_features',
+                  'platform_model', 'platform_scaler', 'platform_features',
+                  'label_encoders', 'model_metadata', 'discount_quantile_models']
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_bundle(path, arrays, metadata):
+    """Write arrays + JSON metadata to path atomically; returns the model version"""
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    digest = hashlib.sha1()
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(arrays[name].tobytes())
+    model_version = digest.hexdigest()[:12]
+
+    layout = {}
+    offset = 0
+    for name in sorted(arrays):
+        a = arrays[name]
+        layout[name] = {'dtype': a.dtype.newbyteorder('<').str, 'shape': list(a.shape),
+                        'offset': offset}
+        offset = _align(offset + a.nbytes)
+
+    header = json.dumps({
+        'model_version': model_version,
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'metadata': metadata,
+        'arrays': layout
+    }).encode()
+    data_start = _align(16 + len(header))
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<II', FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name in sorted(arrays):
+            f.seek(data_start + layout[name]['offset'])
+            f.write(arrays[name].astype(layout[name]['dtype'], copy=False).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return model_version
+
+
+def read_bundle_header(path):
+    """Read only the JSON header (cheap: no array data is touched)"""
+    with open(path, 'rb') as f:
+        if f.read(8) != MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        version, header_len = struct.unpack('<II', f.read(8))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported bundle format version {version}")
+        header = json.loads(f.read(header_len))
+    header['data_start'] = _align(16 + header_len)
+    return header
+
+
+def read_bundle(path):
+    """Memory-map a bundle; returns (header, {name: read-only array view})"""
+    header = read_bundle_header(path)
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        count = int(np.prod(info['shape'], dtype=np.int64))
+        start = header['data_start'] + info['offset']
+        arrays[name] = mm[start:start + count * dtype.itemsize].view(dtype).reshape(info['shape'])
+    return header, arrays
+
+
+def load_pickled_objects(arrays):
+    """Unpickle the original estimator objects stored in the bundle"""
+    return pickle.loads(arrays['pickle.objects'].tobytes())
+
+
+def legacy_pickles_version(directory='.'):
+    """Version for the LEGACY_PICKLES files from their names, sizes and mtimes.
+
+    app.py and the trainer derive the same value from the same files, so it
+    can stand in for a bundle's model_version (prediction cache keys, the
+    version recorded in prediction_table.npz).
+    """
+    digest = hashlib.sha1()
+    for name in LEGACY_PICKLES:
+        path = os.path.join(directory, f'{name}.pkl')
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return f'pkl-{digest.hexdigest()[:12]}'
+
+
+# ---------------------------------------------------------------------------
+# Exporting fitted estimators to flat arrays
+# ---------------------------------------------------------------------------
+
+def export_scaler(prefix, scaler):
+    """StandardScaler -> mean/scale arrays"""
+    return {
+        f'{prefix}.mean': np.asarray(scaler.mean_, dtype=np.float64),
+        f'{prefix}.scale': np.asarray(scaler.scale_, dtype=np.float64)
+    }
+
+
+def _flatten_sklearn_trees(prefix, trees, leaf_values):
+    """Concatenate sklearn Tree objects into one set of node arrays.
+
+    Child indices are rewritten to global node positions (-1 for leaves).
+    leaf_values(tree) gives the per-node output matrix stored for each tree.
+    """
+    features, thresholds, lefts, rights, missing_lefts, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        is_leaf = t.children_left == -1
+        features.append(np.where(is_leaf, -1, t.feature).astype(np.int32))
+        thresholds.append(t.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, t.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, t.children_right + offset).astype(np.int32))
+        # sklearn < 1.3 has no missing_go_to_left: NaN fails x <= threshold
+        # and goes right
+        missing_left = getattr(t, 'missing_go_to_left', None)
+        missing_lefts.append(np.zeros(t.node_count, dtype=bool) if missing_left is None
+                             else np.asarray(missing_left, dtype=bool))
+        values.append(leaf_values(t))
+        roots.append(offset)
+        offset += t.node_count
+
+    return {
+        f'{prefix}.feature': np.concatenate(features),
+        f'{prefix}.threshold': np.concatenate(thresholds),
+        f'{prefix}.left': np.concatenate(lefts),
+        f'{prefix}.right': np.concatenate(rights),
+        f'{prefix}.missing_left': np.concatenate(missing_lefts),
+        f'{prefix}.value': np.concatenate(values).astype(np.float64),
+        f'{prefix}.roots': np.asarray(roots, dtype=np.int64)
+    }
+
+
+def _tree_normalizes_proba(tree):
+    """Whether DecisionTreeClassifier.predict_proba rescales tree_.value.
+
+    Older sklearn stores class counts in tree_.value and divides by their sum
+    in predict_proba; newer versions store fractions and return them as is.
+    Probe the installed version so the exported values match it exactly.
+    """
+    X = np.random.default_rng(0).normal(size=(64, tree.n_features_in_)).astype(np.float32)
+    raw = tree.tree_.value[tree.apply(X), 0, :]
+    return not np.array_equal(tree.predict_proba(X), raw)
+
+
+def _classifier_proba(normalize):
+    def leaf_values(t):
+        proba = t.value[:, 0, :].astype(np.float64)
+        if normalize:
+            # Same normalisation predict_proba applies per row
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba = proba / normalizer
+        return proba
+    return leaf_values
+
+
+def _xgboost_trees(prefix, model):
+    """XGBoost booster -> node arrays (split rule is x < threshold)"""
+    raw = json.loads(model.get_booster().save_raw(raw_format='json'))
+    learner = raw['learner']
+    trees = learner['gradient_booster']['model']['trees']
+
+    features, thresholds, lefts, rights, missing_lefts, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        left = np.asarray(tree['left_children'], dtype=np.int64)
+        right = np.asarray(tree['right_children'], dtype=np.int64)
+        cond = np.asarray(tree['split_conditions'], dtype=np.float32)
+        is_leaf = left == -1
+        features.append(np.where(is_leaf, -1, tree['split_indices']).astype(np.int32))
+        thresholds.append(cond.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, right + offset).astype(np.int32))
+        missing_lefts.append(np.asarray(tree['default_left'], dtype=bool))
+        # Leaf outputs live in split_conditions for leaf nodes
+        values.append(np.where(is_leaf, cond, 0).astype(np.float64)[:, np.newaxis])
+        roots.append(offset)
+        offset += len(left)
+
+    base_score = learner['learner_model_param']['base_score'].strip('[]')
+    return {
+        f'{prefix}.feature': np.concatenate(features),
+        f'{prefix}.threshold': np.concatenate(thresholds),
+        f'{prefix}.left': np.concatenate(lefts),
+        f'{prefix}.right': np.concatenate(rights),
+        f'{prefix}.missing_left': np.concatenate(missing_lefts),
+        f'{prefix}.value': np.concatenate(values),
+        f'{prefix}.roots': np.asarray(roots, dtype=np.int64)
+    }, float(np.float32(base_score))
+
+
+def export_estimator(prefix, model):
+    """Export a fitted model to (arrays, metadata) understood by inference.py"""
+    name = type(model).__name__
+
+    if name == 'RandomForestClassifier':
+        normalize = _tree_normalizes_proba(model.estimators_[0])
+        arrays = _flatten_sklearn_trees(prefix, model.estimators_, _classifier_proba(normalize))
+        return arrays, {'kind': 'forest_classifier', 'split_rule': 'le',
+                        'classes': [int(c) for c in model.classes_]}
+
+    if name == 'RandomForestRegressor':
+        arrays = _flatten_sklearn_trees(prefix, model.estimators_, lambda t: t.value[:, 0, :])
+        return arrays, {'kind': 'forest_regressor', 'split_rule': 'le'}
+
+    if name == 'GradientBoostingRegressor':
+        arrays = _flatten_sklearn_trees(prefix, model.estimators_[:, 0], lambda t: t.value[:, 0, :])
+        init = float(model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0])
+        return arrays, {'kind': 'gradient_boosting', 'split_rule': 'le',
+                        'learning_rate': float(model.learning_rate), 'init': init}
+
+    if name == 'XGBRegressor':
+        arrays, base_score = _xgboost_trees(prefix, model)
+        return arrays, {'kind': 'xgboost', 'split_rule': 'lt', 'base_score': base_score}
+
+    if name == 'LinearRegression':
+        return {
+            f'{prefix}.coef': np.asarray(model.coef_, dtype=np.float64),
+            f'{prefix}.intercept': np.asarray([model.intercept_], dtype=np.float64)
+        }, {'kind': 'linear'}
+
+    raise ValueError(f"Cannot export model of type {name}")
+
+
+def _concatenate_trees(prefix, parts):
+    """Node arrays of several exported ensembles as one, renumbering children and roots"""
+    merged = {key: [] for key in ('feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots')}
+    offset = 0
+    for arrays in parts:
+        for key in ('left', 'right'):
+            children = arrays[f'{prefix}.{key}']
+            merged[key].append(np.where(children == -1, -1, children + offset).astype(np.int32))
+        for key in ('feature', 'threshold', 'missing_left', 'value'):
+            merged[key].append(arrays[f'{prefix}.{key}'])
+        merged['roots'].append(arrays[f'{prefix}.roots'] + offset)
+        offset += len(arrays[f'{prefix}.feature'])
+    return {f'{prefix}.{key}': np.concatenate(values) for key, values in merged.items()}
+
+
+def export_with_quantiles(prefix, model, quantile_models=None):
+    """Export a boosted model and its quantile variants as one tree ensemble.
+
+    The variants' trees follow the model's own and {prefix}.tree_output
+    gives the output each tree adds to (0 = model, i = quantile_models[i - 1]),
+    so inference.py scores all of them in a single traversal.
+    """
+    arrays, meta = export_estimator(prefix, model)
+    if not quantile_models:
+        return arrays, meta
+
+    parts = [arrays]
+    outputs = [np.zeros(len(arrays[f'{prefix}.roots']), dtype=np.int8)]
+    meta = dict(meta, n_point_trees=len(arrays[f'{prefix}.roots']), quantile_outputs=[])
+    for output, quantile_model in enumerate(quantile_models, start=1):
+        quantile_arrays, quantile_meta = export_estimator(prefix, quantile_model)
+        if quantile_meta['kind'] != meta['kind']:
+            raise ValueError(f"Quantile model {output} is a {quantile_meta['kind']}, not a {meta['kind']}")
+        parts.append(quantile_arrays)
+        outputs.append(np.full(len(quantile_arrays[f'{prefix}.roots']), output, dtype=np.int8))
+        meta['quantile_outputs'].append({key: quantile_meta[key] for key in ('init', 'learning_rate', 'base_score')
+                                         if key in quantile_meta})
+
+    arrays = _concatenate_trees(prefix, parts)
+    arrays[f'{prefix}.tree_output'] = np.concatenate(outputs)
+    return arrays, meta
+
+
+def build_bundle(path, discount_model, discount_scaler, discount_features, discount_name,
+                 platform_model, platform_scaler, platform_features, label_encoders,
+                 discount_quantile_models=None, include_pickles=True):
+    """Export everything app.py needs into one bundle file; returns its version"""
+    arrays = {}
+    metadata = {
+        'discount_model_name': discount_name,
+        'platform_model_name': 'Random Forest Classifier',
+        'discount_features': list(discount_features),
+        'platform_features': list(platform_features),
+        'label_classes': {key: [str(c) for c in enc.classes_]
+                          for key, enc in label_encoders.items()}
+    }
+
+    for prefix, model, scaler, quantile_models in (
+            ('discount', discount_model, discount_scaler, discount_quantile_models),
+            ('platform', platform_model, platform_scaler, None)):
+        model_arrays, model_meta = export_with_quantiles(prefix, model, quantile_models)
+        arrays.update(model_arrays)
+        arrays.update(export_scaler(f'{prefix}_scaler', scaler))
+        metadata[f'{prefix}_model'] = model_meta
+
+    if include_pickles:
+        objects = {
+            'discount_model': discount_model,
+            'discount_scaler': discount_scaler,
+            'discount_features': discount_features,
+            'discount_quantile_models': discount_quantile_models,
+            'platform_model': platform_model,
+            'platform_scaler': platform_scaler,
+            'platform_features': platform_features,
+            'label_encoders': label_encoders,
+            'model_metadata': {
+                'discount_model_name': discount_name,
+                'platform_model_name': 'Random Forest Classifier'
+            }
+        }
+        arrays['pickle.objects'] = np.frombuffer(pickle.dumps(objects), dtype=np.uint8)
+
+    return write_bundle(path, arrays, metadata)
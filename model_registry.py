@@ -0,0 +1,132 @@
+"""Versioned model registry with atomic publish and rollback.
+
+Layout:
+
+    model_registry/
+        CURRENT                     name of the version app.py should serve
+        HISTORY                     published versions, oldest first
+        versions/<name>/            models.bundle, prediction_table.npz, ...
+
+A version directory is fully written under a temporary name and renamed
+into place, then CURRENT is replaced atomically, so a reader never sees a
+half-written model. Old versions are kept (up to `keep`) for rollback.
+
+Usage:
+    python model_registry.py list
+    python model_registry.py rollback [version]
+"""
+import datetime
+import os
+import shutil
+import sys
+
+DEFAULT_REGISTRY = os.environ.get('MODEL_REGISTRY', 'model_registry')
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_REGISTRY, keep=5):
+        self.root = root
+        self.keep = keep
+        self.versions_dir = os.path.join(root, 'versions')
+        self.current_file = os.path.join(root, 'CURRENT')
+        self.history_file = os.path.join(root, 'HISTORY')
+
+    def exists(self):
+        return os.path.exists(self.current_file)
+
+    def version_dir(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def current_version(self):
+        """Version named in CURRENT, or None for an empty registry"""
+        try:
+            with open(self.current_file) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current_dir(self):
+        version = self.current_version()
+        return self.version_dir(version) if version else None
+
+    def history(self):
+        try:
+            with open(self.history_file) as f:
+                return [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def list_versions(self):
+        """Versions still on disk, oldest first"""
+        return [v for v in self.history() if os.path.isdir(self.version_dir(v))]
+
+    def publish(self, files, model_version):
+        """Copy files into a new version directory and make it current"""
+        os.makedirs(self.versions_dir, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        version = f"{stamp}-{model_version}"
+        suffix = 1
+        while os.path.exists(self.version_dir(version)):
+            suffix += 1
+            version = f"{stamp}-{model_version}-{suffix}"
+
+        staging = os.path.join(self.versions_dir, f".staging-{version}-{os.getpid()}")
+        os.makedirs(staging)
+        for path in files:
+            shutil.copy2(path, os.path.join(staging, os.path.basename(path)))
+        os.replace(staging, self.version_dir(version))
+
+        _write_atomic(self.history_file, '\n'.join(self.history() + [version]) + '\n')
+        _write_atomic(self.current_file, version + '\n')
+        self.prune()
+        return version
+
+    def activate(self, version):
+        """Point CURRENT at an already published version"""
+        if not os.path.isdir(self.version_dir(version)):
+            raise ValueError(f"Unknown model version: {version}")
+        _write_atomic(self.current_file, version + '\n')
+
+    def rollback(self, version=None):
+        """Activate `version`, or the one published before the current one"""
+        if version is None:
+            versions = self.list_versions()
+            current = self.current_version()
+            if current not in versions or versions.index(current) == 0:
+                raise ValueError("No earlier version to roll back to")
+            version = versions[versions.index(current) - 1]
+        self.activate(version)
+        return version
+
+    def prune(self):
+        """Delete the oldest versions beyond `keep`, never the current one"""
+        versions = self.list_versions()
+        current = self.current_version()
+        for version in versions[:-self.keep] if self.keep else []:
+            if version != current:
+                shutil.rmtree(self.version_dir(version), ignore_errors=True)
+
+
+if __name__ == '__main__':
+    registry = ModelRegistry()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    if command == 'list':
+        current = registry.current_version()
+        for version in registry.list_versions():
+            print(f"{'*' if version == current else ' '} {version}")
+    elif command == 'rollback':
+        version = registry.rollback(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"✅ Now serving {version}")
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
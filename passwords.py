@@ -0,0 +1,89 @@
+"""Salted scrypt password hashing on a bounded thread pool.
+
+Stored format: scrypt$<n>$<r>$<p>$<salt b64>$<key b64>. Rows written before
+hashing was introduced still hold the plaintext password; verify() accepts
+them and reports needs_rehash so app.py can upgrade the row on login. It
+does the same for hashes made with an older cost setting.
+
+hashlib.scrypt releases the GIL, so a few threads hash in parallel without
+blocking request threads. At most `max_pending` hashes may be running or
+queued at once; a caller that cannot get a slot within `timeout` seconds
+gets PasswordHasherBusy (answered with a 503) instead of piling on more
+work during a login storm.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PREFIX = 'scrypt'
+
+
+class PasswordHasherBusy(Exception):
+    """Every hashing slot is taken; retry later"""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+class PasswordHasher:
+    def __init__(self, n=2 ** 14, r=8, p=1, workers=None, max_pending=None, timeout=2.0):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.timeout = timeout
+        self._dummy_hash = None
+        self._reset()
+
+    def _reset(self):
+        # Executor threads do not survive fork; each worker builds its own
+        self._pid = os.getpid()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def _run(self, func, *args):
+        if self._pid != os.getpid():
+            self._reset()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy(f"{self.max_pending} password hashes already pending")
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _scrypt(self, password, salt, n, r, p):
+        # scrypt needs about 128 * n * r bytes; leave headroom over that
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 2 ** 20, dklen=32)
+
+    def _hash(self, password):
+        salt = os.urandom(16)
+        key = self._scrypt(password, salt, self.n, self.r, self.p)
+        return f"{PREFIX}${self.n}${self.r}${self.p}${_b64(salt)}${_b64(key)}"
+
+    def _check(self, password, stored):
+        _, n, r, p, salt, key = stored.split('$')
+        candidate = self._scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        ok = hmac.compare_digest(candidate, base64.b64decode(key))
+        return ok, (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+    def hash(self, password):
+        """Salted hash of password for storing in users.password"""
+        return self._run(self._hash, password)
+
+    def verify(self, password, stored):
+        """(matches, needs_rehash) for a stored hash or legacy plaintext value"""
+        if not stored.startswith(PREFIX + '$'):
+            return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8')), True
+        return self._run(self._check, password, stored)
+
+    def dummy_verify(self, password):
+        """Spend the same time as verify() for a user that does not exist"""
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash('dummy password')
+        self.verify(password, self._dummy_hash)
@@ -0,0 +1,65 @@
+"""Answers from the compiled prediction table, shared by the trainer and app.py.
+
+app.py serves /api/predict from prediction_table.npz (see
+model_traning.compile_prediction_table): tree models are read off the grid
+point at or below the budget, a linear discount model is interpolated
+between the two around it. The trainer measures the error of exactly this
+lookup against the live models before saving a table, and app.py refuses
+tables whose error is above PREDICTION_TABLE_MAX_ERROR.
+"""
+import numpy as np
+
+from intervals import QUANTILES
+
+
+def lookup(table, category_encoded, budgets, platform_encoded, given):
+    """(platform, confidence, discount, quantiles) for encoded queries within the grid"""
+    grid = table['budgets']
+
+    # Grid point at or below each budget; the platform model is a forest, so
+    # its answer there holds up to the next grid point
+    j = np.clip(np.searchsorted(grid, budgets, side='right') - 1, 0, len(grid) - 1)
+    platform_encoded = np.where(given, platform_encoded, table['auto_platform'][category_encoded, j])
+    platform_confidence = np.where(given, 100.0, table['auto_confidence'][category_encoded, j])
+
+    c, p = category_encoded, platform_encoded
+    discount = table['discount']
+    quantiles = table.get('discount_quantiles')
+
+    if table['interpolate']:
+        # Linear weight between the bracketing grid points
+        k = np.minimum(j, len(grid) - 2)
+        w = (budgets - grid[k]) / (grid[k + 1] - grid[k])
+        predicted_discounts = discount[c, p, k] * (1 - w) + discount[c, p, k + 1] * w
+        if quantiles is not None:
+            quantiles = quantiles[c, p, k] * (1 - w)[:, np.newaxis] + quantiles[c, p, k + 1] * w[:, np.newaxis]
+    else:
+        predicted_discounts = discount[c, p, j]
+        if quantiles is not None:
+            quantiles = quantiles[c, p, j]
+
+    # Tables of models without intervals have no discount_quantiles
+    discount_quantiles = quantiles if quantiles is not None else np.full((len(budgets), len(QUANTILES)), np.nan)
+
+    return platform_encoded, platform_confidence, predicted_discounts, discount_quantiles
+
+
+def off_grid_queries(table, seed=42):
+    """One query per grid interval for every category and platform (and with no
+    platform), at a random budget strictly between the two grid points.
+
+    Returns (category_encoded, budgets, platform_encoded, given).
+    """
+    grid = table['budgets']
+    n_cat, n_plat = len(table['categories']), len(table['platforms'])
+    n_intervals = len(grid) - 1
+
+    # Platform n_plat stands for "no preferred platform"
+    category_encoded = np.repeat(np.arange(n_cat), (n_plat + 1) * n_intervals)
+    platform_encoded = np.tile(np.repeat(np.arange(n_plat + 1), n_intervals), n_cat)
+    k = np.tile(np.arange(n_intervals), n_cat * (n_plat + 1))
+
+    u = np.random.default_rng(seed).uniform(0.01, 0.99, len(k))
+    budgets = grid[k] + u * (grid[k + 1] - grid[k])
+    given = platform_encoded < n_plat
+    return category_encoded, budgets, np.where(given, platform_encoded, 0), given
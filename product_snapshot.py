@@ -0,0 +1,233 @@
+"""Columnar in-memory copy of products for /api/compare.
+
+Every column is a NumPy array; platform and category are stored as small
+integer codes. product_name is searched through an inverted index from
+each lowercase alphanumeric token to the sorted positions of the rows that
+contain it, and SKUs through a sorted array for prefix (SKU family) lookups.
+A search intersects posting lists instead of scanning names.
+
+A snapshot is never modified. apply_changes() returns a new snapshot with
+changed rows appended and their old versions marked dead, sharing the
+posting lists that did not change; app.py swaps the module-level reference,
+so readers always see one consistent snapshot. Dead rows are compacted away
+once they make up COMPACT_FRACTION of the arrays.
+"""
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# Columns read from products, in order; updated_at is optional and lets
+# refreshes fetch only the rows that changed
+SNAPSHOT_COLUMNS = ('product_id', 'platform', 'sku', 'product_name', 'category',
+                    'price', 'discount_percent', 'discounted_price', 'rating', 'stock')
+CHANGE_COLUMN = 'updated_at'
+
+NUMERIC_DTYPES = {
+    'product_id': np.int64,
+    'price': np.float64,
+    'discount_percent': np.float32,
+    'discounted_price': np.float64,
+    'rating': np.float32,
+    'stock': np.int32
+}
+
+COMPACT_FRACTION = 0.25
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_EMPTY = np.empty(0, dtype=np.int64)
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower()) if text else []
+
+def encode(values, names):
+    """Integer codes for values, extending the names list with new ones"""
+    index = {name: i for i, name in enumerate(names)}
+    codes = np.empty(len(values), dtype=np.int16)
+    for i, value in enumerate(values):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(names)
+            names.append(value)
+        codes[i] = code
+    return codes
+
+def later(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+def ids_at(rows, mark):
+    """product_ids of the rows whose updated_at equals mark"""
+    return {row[0] for row in rows if row[-1] == mark} if mark is not None else set()
+
+def build_postings(names, offset=0):
+    """token -> sorted positions (offset + row) of the names containing it"""
+    postings = defaultdict(list)
+    for row, name in enumerate(names):
+        for token in set(tokenize(name)):
+            postings[token].append(offset + row)
+    return {token: np.array(rows, dtype=np.int64) for token, rows in postings.items()}
+
+class ProductSnapshot:
+    def __init__(self, columns, platforms, categories, alive, postings, high_water_mark):
+        self.columns = columns
+        self.platforms = platforms
+        self.categories = categories
+        self.alive = alive
+        self.postings = postings
+        self.high_water_mark = high_water_mark
+        # Rows already applied at high_water_mark, which the next refresh
+        # (updated_at >= high_water_mark) returns again
+        self.ids_at_mark = set()
+        self.built_at = time.time()
+
+        # SKUs of live rows, sorted, for prefix searches
+        live = np.flatnonzero(alive)
+        skus = columns['sku'][live]
+        order = np.argsort(skus, kind='stable')
+        self.sku_sorted = skus[order]
+        self.sku_positions = live[order]
+
+    @staticmethod
+    def _columns(rows, platforms, categories):
+        """Column arrays for rows in SNAPSHOT_COLUMNS (+ CHANGE_COLUMN) order"""
+        values = list(zip(*rows)) if rows else [()] * (len(SNAPSHOT_COLUMNS) + 1)
+        columns = {}
+        for name, column in zip(SNAPSHOT_COLUMNS, values):
+            if name in NUMERIC_DTYPES:
+                columns[name] = np.array([np.nan if v is None else v for v in column],
+                                         dtype=np.float64).astype(NUMERIC_DTYPES[name])
+            elif name == 'platform':
+                columns['platform_code'] = encode(column, platforms)
+            elif name == 'category':
+                columns['category_code'] = encode(column, categories)
+            else:
+                columns[name] = np.array([v or '' for v in column], dtype=object)
+        changed_at = values[len(SNAPSHOT_COLUMNS)] if len(values) > len(SNAPSHOT_COLUMNS) else ()
+        return columns, max((v for v in changed_at if v is not None), default=None)
+
+    @classmethod
+    def from_rows(cls, rows, has_change_column=True):
+        """Build from (SNAPSHOT_COLUMNS..., updated_at) tuples; without updated_at
+        every refresh has to be a full rebuild"""
+        platforms, categories = [], []
+        if not has_change_column:
+            rows = [tuple(r) + (None,) for r in rows]
+        columns, high_water_mark = cls._columns(rows, platforms, categories)
+        alive = np.ones(len(rows), dtype=bool)
+        snapshot = cls(columns, platforms, categories, alive,
+                       build_postings(columns['product_name']),
+                       high_water_mark if has_change_column else None)
+        snapshot.ids_at_mark = ids_at(rows, snapshot.high_water_mark)
+        return snapshot
+
+    def apply_changes(self, rows):
+        """New snapshot with rows (new or updated products, with updated_at) applied"""
+        mark = self.high_water_mark
+        new_rows = [row for row in rows if not (row[-1] == mark and row[0] in self.ids_at_mark)]
+        if not new_rows:
+            return self
+        platforms, categories = list(self.platforms), list(self.categories)
+        new_columns, new_mark = self._columns(new_rows, platforms, categories)
+        n_old = len(self.alive)
+
+        # Old versions of the changed products stay in place but are dead
+        alive = self.alive & ~np.isin(self.columns['product_id'], new_columns['product_id'])
+        alive = np.concatenate([alive, np.ones(len(new_rows), dtype=bool)])
+        columns = {name: np.concatenate([self.columns[name], new_columns[name]]) for name in self.columns}
+
+        if (~alive).sum() > COMPACT_FRACTION * len(alive):
+            live = np.flatnonzero(alive)
+            columns = {name: values[live] for name, values in columns.items()}
+            alive = np.ones(len(live), dtype=bool)
+            postings = build_postings(columns['product_name'])
+        else:
+            postings = dict(self.postings)
+            for token, positions in build_postings(new_columns['product_name'], n_old).items():
+                old = postings.get(token)
+                postings[token] = positions if old is None else np.concatenate([old, positions])
+
+        snapshot = ProductSnapshot(columns, platforms, categories, alive, postings, later(mark, new_mark))
+        snapshot.ids_at_mark = ids_at(rows, snapshot.high_water_mark)
+        if snapshot.high_water_mark == mark:
+            snapshot.ids_at_mark |= self.ids_at_mark
+        return snapshot
+
+    def search(self, query=None, sku=None, category=None):
+        """Sorted positions of live rows whose name has every token of query,
+        whose SKU starts with sku, and (optionally) in category; empty when
+        none of the three narrows the search"""
+        result = None
+        # A query without any tokens (e.g. '---') does not filter at all
+        tokens = set(tokenize(query))
+        if tokens:
+            lists = [self.postings.get(token, _EMPTY) for token in tokens]
+            for positions in sorted(lists, key=len):
+                result = positions if result is None else np.intersect1d(result, positions, assume_unique=True)
+
+        if sku:
+            lo = np.searchsorted(self.sku_sorted, sku, side='left')
+            hi = np.searchsorted(self.sku_sorted, sku + chr(0x10FFFF), side='left')
+            positions = np.sort(self.sku_positions[lo:hi])
+            result = positions if result is None else np.intersect1d(result, positions, assume_unique=True)
+
+        if result is None:
+            if category is None:
+                return _EMPTY
+            result = np.flatnonzero(self.alive)
+        else:
+            result = result[self.alive[result]]
+        if category is not None:
+            if category not in self.categories:
+                return _EMPTY
+            result = result[self.columns['category_code'][result] == self.categories.index(category)]
+        return result
+
+    def product(self, position):
+        columns = self.columns
+        return {
+            'product_id': int(columns['product_id'][position]),
+            'sku': columns['sku'][position],
+            'product_name': columns['product_name'][position],
+            'category': self.categories[columns['category_code'][position]],
+            'price': round(float(columns['price'][position]), 2),
+            'discount_percent': round(float(columns['discount_percent'][position]), 1),
+            'discounted_price': round(float(columns['discounted_price'][position]), 2),
+            'rating': round(float(columns['rating'][position]), 1),
+            'stock': int(columns['stock'][position])
+        }
+
+    def compare(self, positions, limit=5):
+        """Per-platform summary of the matched rows, cheapest platform first"""
+        columns = self.columns
+        codes = columns['platform_code'][positions]
+        prices = columns['discounted_price'][positions]
+        # Cheapest first within each platform
+        order = np.lexsort((prices, codes))
+        positions, codes, prices = positions[order], codes[order], prices[order]
+
+        platforms = []
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+        for start, end in zip(starts, np.append(starts[1:], len(codes))):
+            group = positions[start:end]
+            in_stock = columns['stock'][group] > 0
+            platforms.append({
+                'platform': self.platforms[codes[start]],
+                'matches': int(end - start),
+                'in_stock': int(in_stock.sum()),
+                'lowest_price': round(float(prices[start]), 2),
+                'average_discount': round(float(columns['discount_percent'][group].mean()), 1),
+                'average_rating': round(float(columns['rating'][group].mean()), 1),
+                'products': [self.product(p) for p in group[:limit]]
+            })
+        platforms.sort(key=lambda p: p['lowest_price'])
+        return platforms
+
+    def stats(self):
+        return {
+            'products': int(self.alive.sum()),
+            'rows': len(self.alive),
+            'tokens': len(self.postings),
+            'built_at': self.built_at,
+            'high_water_mark': str(self.high_water_mark) if self.high_water_mark is not None else None
+        }
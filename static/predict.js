@@ -2,12 +2,14 @@
 const form = document.getElementById('predictionForm');
 const resultsSection = document.getElementById('resultsSection');
 const discountValue = document.getElementById('discountValue');
+const discountRange = document.getElementById('discountRange');
 const platformBadge = document.getElementById('platformBadge');
 const confidenceValue = document.getElementById('confidenceValue');
 const originalPrice = document.getElementById('originalPrice');
 const discountedPrice = document.getElementById('discountedPrice');
 const savingsAmount = document.getElementById('savingsAmount');
 const recommendationsList = document.getElementById('recommendationsList');
+const productsList = document.getElementById('productsList');
 const modelName = document.getElementById('modelName');
 const predictBtn = document.getElementById('predictBtn');
 
@@ -92,6 +94,9 @@ form.addEventListener('submit', async (e) => {
       
       // Update discount
       discountValue.textContent = data.predicted_discount + '%';
+      // p10-p90: a wide range means waiting for a sale could pay off
+      const interval = data.discount_interval;
+      discountRange.textContent = interval ? `${interval.p10}% - ${interval.p90}%` : '-';
       
       // Update platform
       platformBadge.textContent = data.best_platform;
@@ -114,6 +119,21 @@ form.addEventListener('submit', async (e) => {
           recommendationsList.appendChild(li);
         });
       }
+
+      // Update matching products
+      productsList.innerHTML = '';
+      if (data.products && data.products.length > 0) {
+        data.products.forEach(product => {
+          const li = document.createElement('li');
+          li.textContent = `${product.product_name} on ${product.platform} - ₹${product.discounted_price.toFixed(2)} ` +
+            `(${product.discount_percent}% off, ⭐ ${product.rating})`;
+          productsList.appendChild(li);
+        });
+      } else {
+        const li = document.createElement('li');
+        li.textContent = 'No products found within this budget yet';
+        productsList.appendChild(li);
+      }
       
       // Scroll to results after a delay
       setTimeout(() => {
@@ -0,0 +1,59 @@
+"""Incremental updates of the platform classifier (model_traning.update_model)"""
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import model_traning as trainer
+
+N_PLATFORMS = 3
+
+
+def platform_data(n_rows, platforms, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 4))
+    y = rng.choice(platforms, n_rows)
+    # Make the platforms learnable
+    X[:, 0] += y
+    return X, y
+
+
+@pytest.mark.parametrize('params', [
+    {'max_depth': 10},
+    {'max_depth': 10, 'min_samples_leaf': 3, 'bootstrap': True}
+], ids=['trainer', 'min_samples_leaf'])
+def test_delta_with_some_platforms_keeps_the_others(params):
+    X, y = platform_data(600, np.arange(N_PLATFORMS), seed=0)
+    model = RandomForestClassifier(n_estimators=20, random_state=42, **params).fit(X, y)
+    old_trees = [tree.tree_.__getstate__() for tree in model.estimators_]
+
+    # A delta from two of the three platforms
+    X_delta, y_delta = platform_data(80, np.array([0, 2]), seed=1)
+    X_padded, y_padded, weights = trainer.pad_missing_classes(X_delta, y_delta, model.classes_)
+    assert sorted(set(y_padded[weights == 0])) == [1]
+
+    updated = trainer.update_model(model, X_padded, y_padded, 10, weights)
+
+    np.testing.assert_array_equal(updated.classes_, model.classes_)
+    assert len(updated.estimators_) == 30
+
+    # The old trees are untouched, in the update and in the model it was copied from
+    for before, original, copied in zip(old_trees, model.estimators_, updated.estimators_):
+        for key in ('nodes', 'values'):
+            np.testing.assert_array_equal(original.tree_.__getstate__()[key], before[key])
+            np.testing.assert_array_equal(copied.tree_.__getstate__()[key], before[key])
+
+    # The new trees learned nothing about the missing platform
+    X_test, _ = platform_data(500, np.arange(N_PLATFORMS), seed=2)
+    for tree in updated.estimators_[20:]:
+        proba = tree.predict_proba(X_test)
+        assert proba.shape[1] == N_PLATFORMS
+        assert (proba[:, 1] == 0).all()
+        np.testing.assert_allclose(proba.sum(axis=1), 1)
+    assert not np.isnan(updated.predict_proba(X_test)).any()
+
+
+def test_delta_with_every_platform_is_not_padded():
+    X, y = platform_data(50, np.arange(N_PLATFORMS), seed=3)
+    X_padded, y_padded, weights = trainer.pad_missing_classes(X, y, np.arange(N_PLATFORMS))
+    assert len(X_padded) == len(X)
+    assert (weights == 1).all()
@@ -0,0 +1,146 @@
+"""Parity of inference.py with the estimators it replaces.
+
+Fits small models of every kind train_discount_model/train_platform_model
+can produce, round-trips them through build_bundle/read_bundle and checks
+that the native engine gives bit-identical results.
+"""
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from xgboost import XGBRegressor
+
+from inference import check_parity, load_native_models
+from intervals import QUANTILE_PARAMS, QUANTILES
+from model_bundle import build_bundle, read_bundle
+
+N_FEATURES = 4
+
+
+def synthetic_data(seed=0, n_rows=400):
+    rng = np.random.default_rng(seed)
+    X = rng.normal([5000, 3, 0, 10], [2000, 1, 1, 5], size=(n_rows, N_FEATURES))
+    # Repeated values put split thresholds halfway between float32 neighbours
+    X[:, 1] = np.round(X[:, 1], 1)
+    discount = np.clip(20 + 5 * X[:, 2] - X[:, 1] + rng.normal(0, 2, n_rows), 0, 50)
+    platform = (X[:, 2] > 0).astype(int) + (X[:, 3] > 12)
+    return X, discount, platform
+
+
+def quantile_variants(model, X, y):
+    name = type(model).__name__
+    return [type(model)(**{**model.get_params(), **QUANTILE_PARAMS[name](q)}).fit(X, y)
+            for q in QUANTILES]
+
+
+DISCOUNT_MODELS = {
+    'linear': lambda: LinearRegression(),
+    'random_forest': lambda: RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0),
+    'gradient_boosting': lambda: GradientBoostingRegressor(n_estimators=20, max_depth=3, random_state=0),
+    'xgboost': lambda: XGBRegressor(n_estimators=20, max_depth=4, random_state=0, n_jobs=1)
+}
+
+
+@pytest.fixture(scope='module', params=sorted(DISCOUNT_MODELS))
+def bundle(request, tmp_path_factory):
+    """(original objects, header, arrays) for one discount model kind"""
+    X, discount, platform = synthetic_data()
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+
+    discount_model = DISCOUNT_MODELS[request.param]().fit(X_scaled, discount)
+    quantile_models = None
+    if type(discount_model).__name__ in QUANTILE_PARAMS:
+        quantile_models = quantile_variants(discount_model, X_scaled, discount)
+    platform_model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X_scaled, platform)
+
+    features = [f'f{i}' for i in range(N_FEATURES)]
+    label_encoders = {'category': LabelEncoder().fit(['Books', 'Electronics']),
+                      'platform': LabelEncoder().fit(['Amazon', 'Flipkart', 'Myntra'])}
+    path = str(tmp_path_factory.mktemp('bundle') / 'models.bundle')
+    build_bundle(path, discount_model, scaler, features, request.param,
+                 platform_model, scaler, features, label_encoders,
+                 discount_quantile_models=quantile_models)
+
+    header, arrays = read_bundle(path)
+    original = {'discount_model': discount_model, 'platform_model': platform_model,
+                'discount_quantile_models': quantile_models}
+    return original, header, arrays
+
+
+def split_edge_inputs(arrays, prefix, n_rows=400, seed=1):
+    """Rows with one feature exactly at a split threshold or one float32 step either side"""
+    feature = arrays[f'{prefix}.feature']
+    splits = np.flatnonzero(feature >= 0)
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(splits, size=n_rows)
+
+    threshold = arrays[f'{prefix}.threshold'][picked].astype(np.float32)
+    edges = np.concatenate([threshold,
+                            np.nextafter(threshold, np.float32(-np.inf)),
+                            np.nextafter(threshold, np.float32(np.inf))])
+    X = rng.normal(size=(len(edges), N_FEATURES)).astype(np.float32)
+    X[np.arange(len(edges)), np.tile(feature[picked], 3)] = edges
+    return X.astype(np.float64)
+
+
+def nan_inputs(n_rows=200, seed=2):
+    """Rows with NaN in one or more features"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, N_FEATURES))
+    X[rng.random(X.shape) < 0.3] = np.nan
+    X[:N_FEATURES, :] = np.nan
+    return X
+
+
+def assert_same_predictions(original, native, X):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = original.predict(X)
+    np.testing.assert_array_equal(native.predict(X), expected)
+    if hasattr(original, 'predict_proba'):
+        np.testing.assert_array_equal(native.predict_proba(X), original.predict_proba(X))
+
+
+def test_check_parity_passes(bundle):
+    _, header, arrays = bundle
+    assert check_parity(header, arrays) == []
+
+
+@pytest.mark.parametrize('prefix', ['discount', 'platform'])
+def test_split_threshold_edges(bundle, prefix):
+    original, header, arrays = bundle
+    if f'{prefix}.feature' not in arrays:
+        pytest.skip('linear model has no splits')
+    native = load_native_models(header, arrays)
+    assert_same_predictions(original[f'{prefix}_model'], native[f'{prefix}_model'],
+                            split_edge_inputs(arrays, prefix))
+
+
+@pytest.mark.parametrize('prefix', ['discount', 'platform'])
+def test_nan_inputs(bundle, prefix):
+    original, header, arrays = bundle
+    model = original[f'{prefix}_model']
+    X = nan_inputs()
+    try:
+        model.predict(X)
+    except ValueError:
+        pytest.skip(f'{type(model).__name__} does not accept NaN')
+    native = load_native_models(header, arrays)
+    assert_same_predictions(model, native[f'{prefix}_model'], X)
+
+
+def test_quantiles_match_the_quantile_models(bundle):
+    original, header, arrays = bundle
+    quantile_models = original['discount_quantile_models']
+    if not quantile_models:
+        pytest.skip('no quantile variants')
+    native = load_native_models(header, arrays)['discount_model']
+    X = split_edge_inputs(arrays, 'discount')
+
+    point, quantiles = native.predict_with_quantiles(X)
+    np.testing.assert_array_equal(point, original['discount_model'].predict(X))
+    np.testing.assert_array_equal(quantiles, np.column_stack([m.predict(X) for m in quantile_models]))
@@ -0,0 +1,38 @@
+"""intervals.finish: what every response's discount_interval is made of"""
+import numpy as np
+
+from intervals import QUANTILES, finish, interval_dict
+
+
+def test_interval_includes_the_point():
+    rng = np.random.default_rng(0)
+    quantiles = rng.uniform(-10, 60, size=(2800, len(QUANTILES)))
+    point = rng.uniform(-10, 60, 2800)
+
+    finished = finish(quantiles, point)
+
+    clipped = np.clip(point, 0, 50)
+    assert (finished[:, 0] <= clipped).all()
+    assert (clipped <= finished[:, -1]).all()
+    assert (np.diff(finished, axis=1) >= 0).all()
+    assert ((finished >= 0) & (finished <= 50)).all()
+
+
+def test_crossing_quantiles_are_sorted_and_p50_is_kept():
+    finished = finish(np.array([[12.0, 10.0, 9.0]]), np.array([8.5]))
+    # p50 is the models' median, not the point prediction
+    np.testing.assert_array_equal(finished, [[8.5, 10.0, 12.0]])
+
+
+def test_out_of_range_points_are_clipped_first():
+    finished = finish(np.array([[5.0, 10.0, 20.0], [5.0, 10.0, 20.0]]), np.array([-3.0, 75.0]))
+    np.testing.assert_array_equal(finished, [[0.0, 10.0, 20.0], [5.0, 10.0, 50.0]])
+
+
+def test_rows_without_an_interval_stay_nan():
+    quantiles = np.array([[np.nan] * len(QUANTILES), [5.0, 10.0, 20.0]])
+    finished = finish(quantiles, np.array([12.0, 30.0]))
+
+    assert np.isnan(finished[0]).all()
+    assert interval_dict(finished[0]) is None
+    assert interval_dict(finished[1]) == {'p10': 5.0, 'p50': 10.0, 'p90': 30.0}
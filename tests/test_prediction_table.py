@@ -0,0 +1,194 @@
+"""prediction_table.npz: compiled by the trainer, looked up by app.py.
+
+Looking a query up in the table must give what the models give for it, for
+budgets between grid points too, and app.py must only serve a table compiled
+for the models it has loaded.
+"""
+import os
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from xgboost import XGBRegressor
+
+import app
+import features
+import model_traning as trainer
+from intervals import QUANTILE_PARAMS, QUANTILES
+from model_bundle import LEGACY_PICKLES, export_estimator
+
+DISCOUNT_FEATURES = ['platform_encoded', 'category_encoded', 'price', 'rating', 'stock',
+                     'price_range', 'rating_category', 'stock_status']
+PLATFORM_FEATURES = ['category_encoded', 'price', 'discount_percent', 'rating', 'stock',
+                     'price_range', 'discount_effectiveness']
+
+DISCOUNT_MODELS = {
+    'linear': lambda: LinearRegression(),
+    'random_forest': lambda: RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0),
+    'gradient_boosting': lambda: GradientBoostingRegressor(n_estimators=20, max_depth=3, random_state=0),
+    'xgboost': lambda: XGBRegressor(n_estimators=20, max_depth=4, random_state=0, n_jobs=1)
+}
+
+
+def synthetic_products(n_rows=600, seed=0):
+    rng = np.random.default_rng(seed)
+    price = np.exp(rng.uniform(np.log(50), np.log(150000), n_rows))
+    category = rng.integers(0, 3, n_rows)
+    platform = np.where(price > 20000, 2, (category + (price > 3000)) % 2)
+    columns = {
+        'platform_encoded': platform,
+        'category_encoded': category,
+        'price': price,
+        'price_range': features.price_range(price),
+        'discount_percent': rng.uniform(0, 40, n_rows),
+        'rating': rng.uniform(3, 5, n_rows),
+        'stock': rng.integers(0, 500, n_rows),
+        'discount_effectiveness': rng.uniform(0, 0.4, n_rows)
+    }
+    columns['rating_category'] = features.rating_category(columns['rating'])
+    columns['stock_status'] = features.stock_status(columns['stock'])
+    discount = np.clip(10 + 3 * np.log(price) - 4 * category + 2 * platform + rng.normal(0, 2, n_rows), 0, 50)
+    return columns, discount, platform
+
+
+def train_models(kind):
+    """Model objects as saved by the trainer, for a discount model of the given kind"""
+    columns, discount, platform = synthetic_products()
+    n_rows = len(discount)
+
+    discount_X = features.feature_matrix(DISCOUNT_FEATURES, columns, n_rows)
+    discount_scaler = StandardScaler().fit(discount_X)
+    discount_model = DISCOUNT_MODELS[kind]().fit(discount_scaler.transform(discount_X), discount)
+    quantile_models = None
+    name = type(discount_model).__name__
+    if name in QUANTILE_PARAMS:
+        quantile_models = [type(discount_model)(**{**discount_model.get_params(), **QUANTILE_PARAMS[name](q)})
+                           .fit(discount_scaler.transform(discount_X), discount) for q in QUANTILES]
+
+    platform_X = features.feature_matrix(PLATFORM_FEATURES, columns, n_rows)
+    platform_scaler = StandardScaler().fit(platform_X)
+    platform_model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(
+        platform_scaler.transform(platform_X), platform)
+
+    return {
+        'discount_model': discount_model,
+        'discount_scaler': discount_scaler,
+        'discount_features': DISCOUNT_FEATURES,
+        'discount_quantile_models': quantile_models,
+        'platform_model': platform_model,
+        'platform_scaler': platform_scaler,
+        'platform_features': PLATFORM_FEATURES,
+        'label_encoders': {'category': LabelEncoder().fit(['Books', 'Electronics', 'Fashion']),
+                           'platform': LabelEncoder().fit(['Amazon', 'Flipkart', 'Myntra'])},
+        'model_metadata': {'discount_model_name': kind, 'platform_model_name': 'Random Forest Classifier'}
+    }
+
+
+def compile_table(objects, n_points=32):
+    return trainer.compile_prediction_table(
+        objects['discount_model'], objects['discount_scaler'], objects['discount_features'],
+        objects['platform_model'], objects['platform_scaler'], objects['platform_features'],
+        objects['label_encoders'], n_points, objects['discount_quantile_models'])
+
+
+@pytest.fixture(scope='module', params=sorted(DISCOUNT_MODELS))
+def compiled(request):
+    objects = train_models(request.param)
+    return app.ModelSet(objects), compile_table(objects)
+
+
+def off_grid_queries(table, n_rows=3000, seed=7):
+    """Random queries over the table's budget range, none of them on a grid point"""
+    rng = np.random.default_rng(seed)
+    grid = table['budgets']
+    budgets = np.exp(rng.uniform(np.log(grid[0]), np.log(grid[-1]), n_rows))
+    budgets = budgets[~np.isin(budgets, grid)]
+    category_encoded = rng.integers(0, len(table['categories']), len(budgets))
+    platform_encoded = rng.integers(0, len(table['platforms']), len(budgets))
+    given = rng.random(len(budgets)) < 0.5
+    return category_encoded, budgets, platform_encoded, given
+
+
+def test_lookup_matches_models_between_grid_points(compiled):
+    model_set, table = compiled
+    model_set.prediction_table = table
+    queries = off_grid_queries(table)
+
+    platform, confidence, discount, quantiles = app.lookup_prediction_table(model_set, *queries)
+    live_platform, live_confidence, live_discount, live_quantiles = app.score_with_models(model_set, *queries)
+
+    np.testing.assert_array_equal(platform, live_platform)
+    np.testing.assert_array_equal(confidence, live_confidence)
+    # Tree models are read off the grid exactly, a linear model interpolated
+    np.testing.assert_allclose(discount, live_discount, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(quantiles, live_quantiles, rtol=0, atol=1e-9)
+
+
+def test_recorded_error_is_within_the_serving_limit(compiled):
+    _, table = compiled
+    mean_error, max_error = table['interpolation_error']
+    assert 0 <= mean_error <= max_error <= app.PREDICTION_TABLE_MAX_ERROR
+
+
+def test_split_budgets_are_the_first_budgets_past_a_split():
+    objects = train_models('gradient_boosting')
+    model, scaler = objects['discount_model'], objects['discount_scaler']
+    budgets = trainer.split_budgets(model, scaler, DISCOUNT_FEATURES)
+    assert len(budgets)
+
+    j = DISCOUNT_FEATURES.index('price')
+    arrays, _ = export_estimator('model', model)
+    thresholds = np.sort(arrays['model.threshold'][arrays['model.feature'] == j])
+
+    def scaled(budget):
+        return ((budget - scaler.mean_[j]) / scaler.scale_[j]).astype(np.float32)
+
+    # sklearn goes left while x <= threshold: some threshold lies in [x below, x at)
+    at, below = scaled(budgets), scaled(np.nextafter(budgets, 0))
+    first_not_below = np.searchsorted(thresholds, below, side='left')
+    assert (thresholds[first_not_below] < at).all()
+
+
+def save_table(tmp_path, table, model_version='v1'):
+    path = str(tmp_path / 'prediction_table.npz')
+    trainer.save_prediction_table(table, path, model_version=model_version)
+    return path
+
+
+def test_table_above_the_error_limit_is_refused(compiled, tmp_path):
+    model_set, table = compiled
+    encoders = model_set.label_encoders
+    assert app.load_prediction_table(save_table(tmp_path, table), encoders, 'v1') is not None
+
+    inaccurate = dict(table, interpolation_error=np.array([0.1, app.PREDICTION_TABLE_MAX_ERROR + 1]))
+    assert app.load_prediction_table(save_table(tmp_path, inaccurate), encoders, 'v1') is None
+
+    unmeasured = {key: value for key, value in table.items() if key != 'interpolation_error'}
+    assert app.load_prediction_table(save_table(tmp_path, unmeasured), encoders, 'v1') is None
+
+
+def test_table_for_other_models_is_refused(compiled, tmp_path):
+    model_set, table = compiled
+    path = save_table(tmp_path, table, 'v1')
+    assert app.load_prediction_table(path, model_set.label_encoders, 'v2') is None
+
+
+def test_legacy_pickles_table_follows_the_pickles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name, value in train_models('random_forest').items():
+        if name in LEGACY_PICKLES:
+            with open(f'{name}.pkl', 'wb') as f:
+                pickle.dump(value, f)
+
+    trainer.compile_from_saved_models(n_points=32)
+    assert app.load_model_set().prediction_table is not None
+
+    # Retrained pickles without a recompiled table: the stale table is not served
+    stat = os.stat('discount_model.pkl')
+    os.utime('discount_model.pkl', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    model_set = app.load_model_set()
+    assert model_set.ready
+    assert model_set.prediction_table is None
@@ -0,0 +1,26 @@
+"""WSGI/ASGI entry point for gunicorn (settings in gunicorn.conf.py).
+
+Importing this module loads the models eagerly. Under preload_app that
+happens once in the gunicorn master; the objects created so far are then
+moved out of the garbage collector's reach with gc.freeze(), so collections
+in the workers do not write to (and thereby un-share) the pages holding
+them.
+"""
+import gc
+import os
+
+# Collecting while the models load only fragments the heap that the workers
+# are about to share
+gc.disable()
+
+import app as flask_module
+from app import app
+
+if os.environ.get('PRELOAD_MODELS', '1') == '1' and not flask_module.preload():
+    print(f"⚠️ {flask_module.MODELS_NOT_LOADED}")
+
+# For -k uvicorn.workers.UvicornWorker (wsgi:application)
+from asgi import application
+
+gc.freeze()
+gc.enable()